@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django import forms
 
 from django.contrib.admin.helpers import ActionForm
@@ -6,7 +6,8 @@ from django.contrib.admin.helpers import ActionForm
 
 
 
-from .models import Order, OrderItem
+from .confirmation import confirm_orders, error_messages
+from .models import ConfirmationJob, Order, OrderItem
 from setting.models import Warehouse
 from sale.models import SaleInvoice
 from finance.models import PaymentTerm
@@ -59,10 +60,16 @@ class OrderAdmin(admin.ModelAdmin):
                 form.data.get("payment_method")
                 or SaleInvoice.PAYMENT_CHOICES[0][0]
             )
-        for order in queryset:
-            order.confirm(
-                    warehouse=warehouse, payment_method=payment_method,payment_terms=payment_terms
-            )
+        results = confirm_orders(
+            list(queryset.values_list("pk", flat=True)), warehouse, payment_method, payment_terms
+        )
+        confirmed = sum(result["status"] == "confirmed" for result in results)
+        self.message_user(request, f"Confirmed {confirmed} of {len(results)} order(s).")
+        for result in results:
+            if result["status"] == "error":
+                self.message_user(
+                    request, f"{result['order_no']}: {'; '.join(error_messages(result['errors']))}", messages.ERROR
+                )
         # if form.is_valid():
             
 
@@ -71,11 +78,20 @@ class OrderAdmin(admin.ModelAdmin):
         previous_status = None
         if change:
             previous_status = Order.objects.get(pk=obj.pk).status
+        confirming = obj.status == "Confirmed" and previous_status != "Confirmed"
+        if confirming:
+            # confirm() only takes pending orders and sets the status itself
+            obj.status = previous_status or "Pending"
         super().save_model(request, obj, form, change)
-        if obj.status == "Confirmed" and previous_status != "Confirmed":
+        if confirming:
             warehouse = form.cleaned_data.get("warehouse") or Warehouse.objects.first()
             payment_method = form.cleaned_data.get("payment_method") or "Cash"
             payment_terms = form.cleaned_data.get("payment_terms")
             if warehouse:
                 obj.confirm(warehouse, payment_method,payment_terms)
 
+
+@admin.register(ConfirmationJob)
+class ConfirmationJobAdmin(admin.ModelAdmin):
+    list_display = ["id", "order", "warehouse", "status", "attempts", "created_at", "finished_at"]
+    list_filter = ["status", "warehouse"]
@@ -0,0 +1,113 @@
+"""Turning pending orders into sale invoices.
+
+:func:`confirm_orders` confirms any number of orders for one warehouse in a
+single transaction. The orders and their items are read with two queries,
+and the invoices go through :func:`utils.invoice_import.import_sale_invoices`.
+That path locks all candidate batches once, allocates them first-expiry-
+first-out and writes invoices, items, stock movements, party balances,
+payment schedules and journal entries in bulk. Credit limits are enforced
+as for a single invoice.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from utils.invoice_import import import_sale_invoices
+
+from .models import Order
+
+
+def _invoice_payload(order, warehouse, payment_method, payment_term):
+    return {
+        "invoice_no": order.order_no,
+        "date": order.date.isoformat(),
+        "customer": order.customer_id,
+        "warehouse": getattr(warehouse, "pk", warehouse),
+        "payment_method": payment_method,
+        "payment_term": getattr(payment_term, "pk", payment_term),
+        "paid_amount": order.paid_amount,
+        "total_amount": order.total_amount,
+        "items": [
+            {
+                "product": item.product_id,
+                "quantity": item.quantity,
+                "rate": item.price,
+                "amount": item.amount,
+                "net_amount": item.amount,
+            }
+            for item in order.items.all()
+        ],
+    }
+
+
+@transaction.atomic
+def confirm_orders(order_ids, warehouse, payment_method, payment_term=None):
+    """Confirm the pending orders in ``order_ids`` from ``warehouse``.
+
+    Returns one dict per requested id, in order::
+
+        {"order": 3, "order_no": "SO-3", "status": "confirmed", "invoice": 12, "errors": {}}
+
+    ``status`` is ``"error"`` when the invoice was rejected (stock, credit
+    limit, ...) and ``"skipped"`` when the order does not exist or is not
+    pending. Orders are locked, so a concurrent confirm skips them.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    orders = list(
+        Order.objects.select_for_update()
+        .filter(pk__in=order_ids, status="Pending", sale_invoice__isnull=True)
+        .prefetch_related("items")
+        .order_by("date", "pk")
+    )
+    results = import_sale_invoices(
+        [_invoice_payload(order, warehouse, payment_method, payment_term) for order in orders],
+        check_credit_limits=True,
+    )
+
+    confirmed = []
+    by_order = {}
+    for order, result in zip(orders, results):
+        if result["status"] == "created":
+            order.status = "Confirmed"
+            order.sale_invoice_id = result["id"]
+            confirmed.append(order)
+        by_order[order.pk] = {
+            "order": order.pk,
+            "order_no": order.order_no,
+            "status": "confirmed" if result["status"] == "created" else "error",
+            "invoice": result["id"],
+            "errors": result["errors"],
+        }
+    Order.objects.bulk_update(confirmed, ["status", "sale_invoice"])
+
+    skipped = {"status": "skipped", "invoice": None, "errors": {"order": "Order is not pending."}}
+    return [by_order.get(pk) or {"order": pk, "order_no": None, **skipped} for pk in order_ids]
+
+
+def error_messages(errors, prefix=""):
+    """Flatten a nested result ``errors`` structure into ``"field: message"`` strings."""
+    if isinstance(errors, dict):
+        return [
+            message
+            for field, value in errors.items()
+            for message in error_messages(value, f"{prefix}{field}.")
+        ]
+    if isinstance(errors, list):
+        return [
+            message
+            for index, value in enumerate(errors)
+            for message in error_messages(value, f"{prefix}{index}." if isinstance(value, dict) else prefix)
+        ]
+    return [f"{prefix.rstrip('.')}: {errors}" if prefix else str(errors)]
+
+
+def confirm_order(order, warehouse, payment_method, payment_term=None):
+    """Confirm one order and return its invoice; raises ``ValidationError`` otherwise."""
+    result = confirm_orders([order.pk], warehouse, payment_method, payment_term)[0]
+    if result["status"] != "confirmed":
+        raise ValidationError(error_messages(result["errors"]))
+    order.refresh_from_db(fields=["status", "sale_invoice"])
+    return order.sale_invoice
+
+
+__all__ = ["confirm_order", "confirm_orders", "error_messages"]
@@ -0,0 +1,216 @@
+"""Asynchronous order confirmation.
+
+Confirming an order posts stock, balances, schedules and a journal entry,
+which is too much work for a request on a sync gunicorn worker. Instead
+:func:`enqueue_confirmation` stores a
+:class:`~ecommerce.models.ConfirmationJob` and the API answers 202 with the
+job id. Clients poll the job or get a ``Notification`` when it finishes.
+
+Workers (``manage.py process_order_confirmations``) claim jobs with
+``SELECT ... FOR UPDATE SKIP LOCKED``. A claim takes up to ``batch_size``
+pending jobs of one warehouse and confirms them together through
+:func:`~ecommerce.confirmation.confirm_orders`. At most
+``ORDER_CONFIRM_WAREHOUSE_CONCURRENCY`` claims run per warehouse at once.
+Those claims compete for the same batch rows, so more workers would only
+wait on each other's locks. The limit holds across processes because the
+warehouse row is locked while a claim is counted and taken.
+"""
+
+import logging
+import uuid
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from setting.models import Warehouse
+
+from .confirmation import confirm_orders, error_messages
+from .models import ConfirmationJob, Order
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+WAREHOUSE_CONCURRENCY = getattr(settings, "ORDER_CONFIRM_WAREHOUSE_CONCURRENCY", 1)
+#: a RUNNING claim older than this belonged to a worker that died
+STALE_AFTER = timedelta(seconds=getattr(settings, "ORDER_CONFIRM_STALE_AFTER", 600))
+
+OUTCOME_FIELDS = ["status", "claim", "sale_invoice", "error", "finished_at"]
+
+
+def enqueue_confirmation(order, warehouse, payment_method, payment_term=None, user=None):
+    """Queue the confirmation of ``order`` and return its job.
+
+    An order that already has a pending or running job gets that job back,
+    so a double click does not queue it twice.
+    """
+    with transaction.atomic():
+        type(order).objects.select_for_update().only("pk").get(pk=order.pk)
+        job = order.confirmation_jobs.filter(status__in=("PENDING", "RUNNING")).first()
+        if job is None:
+            job = ConfirmationJob.objects.create(
+                order=order,
+                warehouse=warehouse,
+                payment_method=payment_method or "",
+                payment_term=payment_term,
+                requested_by=user if getattr(user, "is_authenticated", False) else None,
+            )
+    return job
+
+
+def _requeue_stale():
+    stale = ConfirmationJob.objects.filter(status="RUNNING", started_at__lt=timezone.now() - STALE_AFTER)
+    stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status="FAILED", claim=None, error={"detail": "Worker stopped while confirming."}, finished_at=timezone.now()
+    )
+    stale.update(status="PENDING", claim=None)
+
+
+def _running_claims(warehouse_ids):
+    return Counter(
+        dict(
+            ConfirmationJob.objects.filter(status="RUNNING", warehouse_id__in=warehouse_ids)
+            .values("warehouse_id")
+            .annotate(claims=Count("claim", distinct=True))
+            .values_list("warehouse_id", "claims")
+        )
+    )
+
+
+def claim_jobs(batch_size=DEFAULT_BATCH_SIZE):
+    """Claim pending jobs of the first warehouse with a free slot.
+
+    Returns the claimed jobs, now RUNNING, or an empty list.
+    """
+    _requeue_stale()
+    waiting = list(
+        ConfirmationJob.objects.filter(status="PENDING")
+        .values("warehouse_id")
+        .annotate(first=Min("id"))
+        .order_by("first")
+        .values_list("warehouse_id", flat=True)
+    )
+    running = _running_claims(waiting)
+    for warehouse_id in waiting:
+        if running[warehouse_id] >= WAREHOUSE_CONCURRENCY:
+            continue
+        with transaction.atomic():
+            # serializes claims per warehouse; another worker holding it skips ahead
+            if not list(Warehouse.objects.select_for_update(skip_locked=True).filter(pk=warehouse_id).values_list("pk")):
+                continue
+            if _running_claims([warehouse_id])[warehouse_id] >= WAREHOUSE_CONCURRENCY:
+                continue
+            jobs = list(
+                ConfirmationJob.objects.select_for_update(skip_locked=True)
+                .filter(status="PENDING", warehouse_id=warehouse_id)
+                .order_by("id")[:batch_size]
+            )
+            if not jobs:
+                continue
+            claim, now = uuid.uuid4(), timezone.now()
+            for job in jobs:
+                job.status, job.claim, job.started_at = "RUNNING", claim, now
+                job.attempts += 1
+            ConfirmationJob.objects.bulk_update(jobs, ["status", "claim", "started_at", "attempts"])
+            return jobs
+    return []
+
+
+def _finish(job, status, invoice_id=None, error=None):
+    job.status = status
+    job.claim = None
+    job.sale_invoice_id = invoice_id
+    job.error = error
+    job.finished_at = timezone.now()
+
+
+def _notify(jobs):
+    if not apps.is_installed("notification"):
+        return
+    Notification = apps.get_model("notification", "Notification")
+    Notification.objects.bulk_create(
+        [
+            Notification(
+                user_id=job.requested_by_id,
+                title=f"Order {job.order.order_no} {'confirmed' if job.status == 'DONE' else 'not confirmed'}",
+                message=(
+                    f"Sale invoice {job.sale_invoice.invoice_no} has been posted."
+                    if job.status == "DONE"
+                    else "; ".join(error_messages(job.error))
+                ),
+            )
+            for job in jobs
+            if job.requested_by_id and job.status in ("DONE", "FAILED")
+        ]
+    )
+
+
+def run_jobs(jobs):
+    """Confirm claimed ``jobs`` and record each outcome."""
+    groups = OrderedDict()
+    for job in jobs:
+        groups.setdefault((job.payment_method, job.payment_term_id), []).append(job)
+
+    for (payment_method, payment_term_id), group in groups.items():
+        try:
+            results = confirm_orders(
+                [job.order_id for job in group], group[0].warehouse_id, payment_method or None, payment_term_id
+            )
+        except DatabaseError as exc:
+            logger.warning("Order confirmation failed (attempt %s): %s", group[0].attempts, exc)
+            for job in group:
+                if job.attempts >= MAX_ATTEMPTS:
+                    _finish(job, "FAILED", error={"detail": str(exc)})
+                else:
+                    job.status, job.claim = "PENDING", None
+            continue
+        except Exception as exc:  # a bad job must not wedge the queue
+            logger.exception("Order confirmation crashed")
+            for job in group:
+                _finish(job, "FAILED", error={"detail": str(exc)})
+            continue
+        # a retried claim whose earlier run committed finds its order already invoiced
+        invoiced = dict(
+            Order.objects.filter(
+                pk__in=[result["order"] for result in results if result["status"] == "skipped"],
+                sale_invoice__isnull=False,
+            ).values_list("pk", "sale_invoice_id")
+        )
+        for job, result in zip(group, results):
+            if result["status"] == "confirmed":
+                _finish(job, "DONE", invoice_id=result["invoice"])
+            elif job.order_id in invoiced:
+                _finish(job, "DONE", invoice_id=invoiced[job.order_id])
+            else:
+                _finish(job, "FAILED", error=result["errors"])
+
+    ConfirmationJob.objects.bulk_update(jobs, OUTCOME_FIELDS)
+    done = [job for job in jobs if job.status in ("DONE", "FAILED")]
+    if done:
+        _notify(ConfirmationJob.objects.filter(pk__in=[job.pk for job in done]).select_related("order", "sale_invoice"))
+
+
+def process_pending(batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """Claim and run jobs until none is claimable; return ``{"done", "failed", "retry"}``."""
+    totals = {"done": 0, "failed": 0, "retry": 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        jobs = claim_jobs(batch_size)
+        if not jobs:
+            break
+        batches += 1
+        run_jobs(jobs)
+        for job in jobs:
+            totals["done" if job.status == "DONE" else "failed" if job.status == "FAILED" else "retry"] += 1
+        if all(job.status == "PENDING" for job in jobs):
+            # Only transient failures left; let the next run retry them.
+            break
+    return totals
+
+
+__all__ = ["claim_jobs", "enqueue_confirmation", "process_pending", "run_jobs"]
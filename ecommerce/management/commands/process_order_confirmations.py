@@ -0,0 +1,48 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ecommerce.jobs import DEFAULT_BATCH_SIZE, process_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Confirm queued orders. Several workers may run at once; each warehouse is limited "
+        "to ORDER_CONFIRM_WAREHOUSE_CONCURRENCY concurrent claims."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--workers", type=int, default=1, help="Worker threads in this process.")
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling instead of exiting once the queue is empty.",
+        )
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds between polls with --loop.")
+
+    def _work(self, options):
+        try:
+            while True:
+                totals = process_pending(batch_size=options["batch_size"])
+                if any(totals.values()):
+                    self.stdout.write(
+                        f"done={totals['done']} failed={totals['failed']} retry={totals['retry']}"
+                    )
+                if not options["loop"]:
+                    break
+                time.sleep(options["sleep"])
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        threads = [
+            threading.Thread(target=self._work, args=(options,), daemon=True)
+            for _ in range(max(options["workers"], 1))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
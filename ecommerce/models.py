@@ -1,7 +1,7 @@
-from django.db import models, transaction
+from django.conf import settings
+from django.db import models
 
-from inventory.models import Party, Product, Batch
-from sale.models import SaleInvoice, SaleInvoiceItem
+from inventory.models import Party, Product
 from hr.models import Employee
 
 class Order(models.Model):
@@ -25,43 +25,12 @@ class Order(models.Model):
         return self.order_no
 
     def confirm(self, warehouse, payment_method,payment_terms=None):
-        with transaction.atomic():
-            invoice = SaleInvoice.objects.create(
-                invoice_no=self.order_no,
-                date=self.date,
-                customer=self.customer,
-                warehouse=warehouse,
-                total_amount=self.total_amount,
-                payment_method=payment_method,
-                paid_amount=self.paid_amount,
-                payment_term=payment_terms,
-            )
-
-            for item in self.items.all():
-                batch = (
-                    Batch.objects.filter(
-                        product=item.product,
-                        warehouse=warehouse,
-                        quantity__gt=0,
-                    )
-                    .order_by("-expiry_date")
-                    .first()
-                )
-
-                SaleInvoiceItem.objects.create(
-                    invoice=invoice,
-                    product=item.product,
-                    batch=batch,
-                    quantity=item.quantity,
-                    rate=item.price,
-                    amount=item.amount,
-                    net_amount=item.amount,
-                )
-
-            self.status = "Confirmed"
-            self.sale_invoice = invoice
-            self.save(update_fields=["status", "sale_invoice"])
+        """Create the sale invoice for this order, drawing stock FEFO."""
+        from .confirmation import confirm_order
 
+        invoice = confirm_order(self, warehouse, payment_method, payment_terms)
+        self.status = "Confirmed"
+        self.sale_invoice = invoice
         return invoice
 
 
@@ -72,3 +41,37 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     bid_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+class ConfirmationJob(models.Model):
+    """A queued request to confirm one order; see ``ecommerce.jobs``."""
+
+    STATUS_CHOICES = (
+        ("PENDING", "Pending"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+    )
+
+    order = models.ForeignKey(Order, related_name="confirmation_jobs", on_delete=models.CASCADE)
+    warehouse = models.ForeignKey("setting.Warehouse", on_delete=models.CASCADE)
+    payment_method = models.CharField(max_length=20, blank=True)
+    payment_term = models.ForeignKey("finance.PaymentTerm", null=True, blank=True, on_delete=models.SET_NULL)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="PENDING")
+    # jobs claimed together by one worker share a claim id
+    claim = models.UUIDField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    sale_invoice = models.ForeignKey("sale.SaleInvoice", null=True, blank=True, on_delete=models.SET_NULL)
+    error = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "warehouse", "id"], name="confirmation_job_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"Confirm {self.order} ({self.status})"
@@ -1,7 +1,9 @@
 from rest_framework import serializers
 
-from .models import Order, OrderItem
+from .models import ConfirmationJob, Order, OrderItem
 from inventory.models import Product
+from inventory.pricing import ORDER_ITEM_FIELDS, apply_prices
+from utils.credit import CreditLimitExceeded, check_credit
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -23,6 +25,8 @@ class OrderItemSerializer(serializers.ModelSerializer):
             "bid_price",
             "amount",
         ]
+        # left out, they are filled from the customer's price list
+        extra_kwargs = {"price": {"required": False}, "amount": {"required": False}}
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
@@ -48,9 +52,35 @@ class OrderSerializer(serializers.ModelSerializer):
             "items",
         ]
 
+    def validate(self, data):
+        if self.instance is None:
+            try:
+                check_credit(data["customer"], data["total_amount"] - (data.get("paid_amount") or 0))
+            except CreditLimitExceeded as exc:
+                raise serializers.ValidationError({"customer": exc.messages})
+        return data
+
     def create(self, validated_data):
-        items_data = validated_data.pop("items", [])
+        items_data = apply_prices(validated_data["customer"], validated_data.pop("items", []), ORDER_ITEM_FIELDS)
         order = Order.objects.create(**validated_data)
         for item_data in items_data:
             OrderItem.objects.create(order=order, **item_data)
         return order
+
+
+class ConfirmationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ConfirmationJob
+        fields = [
+            "id",
+            "order",
+            "warehouse",
+            "status",
+            "attempts",
+            "sale_invoice",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
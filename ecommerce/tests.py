@@ -0,0 +1,130 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ecommerce.confirmation import confirm_orders
+from ecommerce.jobs import claim_jobs, enqueue_confirmation, process_pending
+from ecommerce.models import ConfirmationJob, Order, OrderItem
+from inventory.models import Batch, Party
+from notification.models import Notification
+from sale.models import SaleInvoice
+from sale.tests import User, setup_basic_entities
+from utils.stock import rebuild_stock_balances, stock_balance_drift
+
+
+class OrderTestCase(TestCase):
+    def setUp(self):
+        data = setup_basic_entities()
+        self.warehouse = data["warehouse"]
+        self.product = data["product"]
+        self.customer = data["customer"]
+        Batch.objects.create(
+            product=self.product,
+            batch_number="B1",
+            expiry_date=date.today() + timedelta(days=30),
+            purchase_price=5,
+            sale_price=10,
+            quantity=10,
+            warehouse=self.warehouse,
+        )
+        rebuild_stock_balances()
+
+    def _order(self, number, quantity):
+        amount = Decimal(10 * quantity)
+        order = Order.objects.create(
+            order_no=number, date=date.today(), customer=self.customer, total_amount=amount
+        )
+        OrderItem.objects.create(order=order, product=self.product, quantity=quantity, price=10, amount=amount)
+        return order
+
+
+class ConfirmOrdersTests(OrderTestCase):
+    def test_confirms_orders_into_invoices(self):
+        first, second = self._order("SO-1", 3), self._order("SO-2", 2)
+        results = confirm_orders([first.pk, second.pk], self.warehouse, "Credit")
+
+        self.assertEqual([r["status"] for r in results], ["confirmed", "confirmed"])
+        first.refresh_from_db()
+        self.assertEqual(first.status, "Confirmed")
+        self.assertEqual(first.sale_invoice_id, results[0]["invoice"])
+        invoice = SaleInvoice.objects.get(pk=results[0]["invoice"])
+        self.assertEqual(invoice.invoice_no, "SO-1")
+        self.assertEqual(invoice.items.get().quantity, 3)
+        self.assertEqual(Batch.objects.get(batch_number="B1").quantity, 5)
+        self.assertEqual(stock_balance_drift(), [])
+
+    def test_stock_shortage_leaves_the_order_pending(self):
+        short, fine = self._order("SO-1", 11), self._order("SO-2", 4)
+        results = confirm_orders([short.pk, fine.pk], self.warehouse, "Credit")
+
+        self.assertEqual([r["status"] for r in results], ["error", "confirmed"])
+        self.assertEqual(results[0]["errors"]["items"], ["Insufficient stock for P1"])
+        short.refresh_from_db()
+        self.assertEqual(short.status, "Pending")
+        self.assertIsNone(short.sale_invoice_id)
+        self.assertEqual(Batch.objects.get(batch_number="B1").quantity, 6)
+
+    def test_credit_limit_rejects_the_order(self):
+        Party.objects.filter(pk=self.customer.pk).update(credit_limit=50)
+        within, over = self._order("SO-1", 4), self._order("SO-2", 2)
+        results = confirm_orders([within.pk, over.pk], self.warehouse, "Credit")
+
+        self.assertEqual([r["status"] for r in results], ["confirmed", "error"])
+        self.assertIn("Credit limit", results[1]["errors"]["customer"])
+        self.assertFalse(SaleInvoice.objects.filter(invoice_no="SO-2").exists())
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_balance, Decimal("40"))
+
+    def test_confirming_again_skips_the_order(self):
+        order = self._order("SO-1", 3)
+        first = confirm_orders([order.pk], self.warehouse, "Credit")[0]
+        again = confirm_orders([order.pk], self.warehouse, "Credit")[0]
+
+        self.assertEqual(first["status"], "confirmed")
+        self.assertEqual(again["status"], "skipped")
+        self.assertEqual(again["errors"], {"order": "Order is not pending."})
+        self.assertEqual(SaleInvoice.objects.filter(invoice_no="SO-1").count(), 1)
+        self.assertEqual(Batch.objects.get(batch_number="B1").quantity, 7)
+
+
+class ConfirmationJobTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.get(email="admin@example.com")
+
+    def _enqueue(self, order):
+        return enqueue_confirmation(order, self.warehouse, "Credit", user=self.user)
+
+    def test_workers_confirm_queued_orders(self):
+        fine, short = self._order("SO-1", 3), self._order("SO-2", 11)
+        jobs = [self._enqueue(fine), self._enqueue(short)]
+        self.assertEqual(self._enqueue(fine), jobs[0])
+
+        self.assertEqual(process_pending(), {"done": 1, "failed": 1, "retry": 0})
+        done, failed = ConfirmationJob.objects.order_by("pk")
+        fine.refresh_from_db()
+        self.assertEqual(done.status, "DONE")
+        self.assertEqual(done.sale_invoice_id, fine.sale_invoice_id)
+        self.assertEqual(failed.status, "FAILED")
+        self.assertEqual(failed.error["items"], ["Insufficient stock for P1"])
+        self.assertEqual(
+            sorted(Notification.objects.filter(user=self.user).values_list("title", flat=True)),
+            ["Order SO-1 confirmed", "Order SO-2 not confirmed"],
+        )
+
+    def test_retry_after_a_committed_confirmation_finishes_the_job(self):
+        order = self._order("SO-1", 3)
+        job = self._enqueue(order)
+        # the worker confirmed the order, then died before recording the outcome
+        self.assertEqual(claim_jobs(), [job])
+        invoice_id = confirm_orders([order.pk], self.warehouse, "Credit")[0]["invoice"]
+        ConfirmationJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(process_pending(), {"done": 1, "failed": 0, "retry": 0})
+        job.refresh_from_db()
+        self.assertEqual(job.status, "DONE")
+        self.assertEqual(job.sale_invoice_id, invoice_id)
+        self.assertIsNone(job.error)
+        self.assertEqual(SaleInvoice.objects.filter(invoice_no="SO-1").count(), 1)
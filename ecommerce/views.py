@@ -1,9 +1,16 @@
-from rest_framework import viewsets
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from rest_framework import status as http_status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from .models import Order
-from .serializers import OrderSerializer
+from .confirmation import confirm_orders
+from .jobs import enqueue_confirmation
+from .models import ConfirmationJob, Order
+from .serializers import ConfirmationJobSerializer, OrderSerializer
+from finance.models import PaymentTerm
 from sale.serializers import SaleInvoiceSerializer
 from setting.models import Warehouse
 
@@ -70,13 +77,54 @@ class OrderViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["post"])
     def confirm(self, request, pk=None):
+        """
+        Queue the order for confirmation and answer 202 with the job; poll
+        confirmation-jobs/<id>/ or wait for the notification. With
+        ORDER_CONFIRM_ASYNC = False (or ?sync=1) the invoice is created in
+        the request and returned as before.
+        """
         order = self.get_object()
         warehouse = Warehouse.objects.get(pk=request.data.get("warehouse"))
         payment_method = request.data.get("payment_method")
         payment_terms = request.data.get("payment_terms")
-        invoice = order.confirm(warehouse, payment_method,payment_terms)
+        if getattr(settings, "ORDER_CONFIRM_ASYNC", True) and request.query_params.get("sync") != "1":
+            if order.status != "Pending":
+                return Response({"detail": "Order is not pending."}, status=http_status.HTTP_400_BAD_REQUEST)
+            term = get_object_or_404(PaymentTerm, pk=payment_terms) if payment_terms else None
+            job = enqueue_confirmation(order, warehouse, payment_method, term, request.user)
+            return Response(ConfirmationJobSerializer(job).data, status=http_status.HTTP_202_ACCEPTED)
+        try:
+            invoice = order.confirm(warehouse, payment_method,payment_terms)
+        except ValidationError as exc:
+            return Response({"detail": exc.messages}, status=http_status.HTTP_400_BAD_REQUEST)
         serializer = SaleInvoiceSerializer(invoice)
         return Response(serializer.data)
+
+    @action(detail=False, methods=["post"], url_path="confirm")
+    def confirm_many(self, request):
+        """
+        Confirm many pending orders from one warehouse in a single transaction.
+        Body: {"orders": [1, 2, ...], "warehouse": 1, "payment_method": "Credit", "payment_terms": null}
+        Returns one result per order: confirmed (with its invoice id), error or skipped.
+        """
+        order_ids = request.data.get("orders") or []
+        if not isinstance(order_ids, list) or not all(str(pk).isdigit() for pk in order_ids):
+            return Response({"detail": "orders must be a list of ids"}, status=http_status.HTTP_400_BAD_REQUEST)
+        warehouse = get_object_or_404(Warehouse, pk=request.data.get("warehouse"))
+        results = confirm_orders(
+            [int(pk) for pk in order_ids],
+            warehouse,
+            request.data.get("payment_method"),
+            request.data.get("payment_terms"),
+        )
+        return Response({"results": results})
+
+    @action(detail=False, methods=["get"], url_path=r"confirmation-jobs/(?P<job_id>[0-9]+)")
+    def confirmation_job(self, request, job_id=None):
+        """Status of a queued confirmation: PENDING, RUNNING, DONE (with sale_invoice) or FAILED (with error)."""
+        job = get_object_or_404(ConfirmationJob, pk=job_id)
+        return Response(ConfirmationJobSerializer(job).data)
+
     @action(detail=True, methods=["post", "patch"], url_path="status")
     def set_status(self, request, pk=None):
         """
@@ -73,6 +73,9 @@ INSTALLED_APPS = [
     'user',
     'finance',
     'hr',
+    'ecommerce',
+    'report',
+    'syncqueue',
     'django_ledger',
     'corsheaders',
 
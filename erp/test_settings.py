@@ -40,6 +40,9 @@ INSTALLED_APPS = [
     'finance',
     'django_ledger',
     'notification',
+    'ecommerce',
+    'report',
+    'syncqueue',
 ]
 
 DATABASES = {
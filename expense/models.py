@@ -1,16 +1,15 @@
 from django.db import models
-from datetime import datetime, time
 
-from django.utils import timezone
 from django_ledger.models import (
     AccountModel,
     JournalEntryModel,
     TransactionModel,
 )
-from utils.ledger import get_or_create_default_ledger
+from setting.models import SyncTrackedModel
+from utils.ledger import create_journal_entry
 
 
-class ExpenseCategory(models.Model):
+class ExpenseCategory(SyncTrackedModel):
     """Represents a grouping for expenses tied to an account."""
     name = models.CharField(max_length=100, unique=True)
     chart_of_account = models.ForeignKey(AccountModel, on_delete=models.PROTECT)
@@ -39,38 +38,26 @@ class Expense(models.Model):
         super().save(*args, **kwargs)
 
         if is_new and self.category.chart_of_account and self.payment_account:
-            ledger = get_or_create_default_ledger()
-            if not ledger:
-                return
-
-            timestamp = timezone.make_aware(
-                datetime.combine(self.date, time.min)
-            )
-
-            je = JournalEntryModel.objects.create(
-                ledger=ledger,
-                timestamp=timestamp,
-                description=self.description or f"Expense for {self.category.name}",
-            )
-
-            TransactionModel.objects.bulk_create(
+            je = create_journal_entry(
+                self.date,
+                self.description or f"Expense for {self.category.name}",
                 [
-                    TransactionModel(
-                        journal_entry=je,
-                        account=self.category.chart_of_account,
-                        tx_type=TransactionModel.DEBIT,
-                        amount=self.amount,
-                        description=f"Expense - {self.category.name}",
-                    ),
-                    TransactionModel(
-                        journal_entry=je,
-                        account=self.payment_account,
-                        tx_type=TransactionModel.CREDIT,
-                        amount=self.amount,
-                        description="Payment",
-                    ),
-                ]
+                    {
+                        "account": self.category.chart_of_account,
+                        "type": TransactionModel.DEBIT,
+                        "amount": self.amount,
+                        "description": f"Expense - {self.category.name}",
+                    },
+                    {
+                        "account": self.payment_account,
+                        "type": TransactionModel.CREDIT,
+                        "amount": self.amount,
+                        "description": "Payment",
+                    },
+                ],
             )
+            if not je:
+                return
 
             self.journal_entry = je
             super().save(update_fields=["journal_entry"])
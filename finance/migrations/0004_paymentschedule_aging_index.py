@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentschedule',
+            index=models.Index(fields=['status', 'due_date'], name='payment_schedule_aging_idx'),
+        ),
+    ]
@@ -57,6 +57,13 @@ class PaymentSchedule(models.Model):
     STATUS_CHOICES = (("Pending", "Pending"), ("Paid", "Paid"))
 
     term = models.ForeignKey(PaymentTerm, on_delete=models.CASCADE)
+    purchase_invoice = models.ForeignKey(
+        'purchase.PurchaseInvoice',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='payment_schedules',
+    )
     sale_invoice = models.ForeignKey(
         'sale.SaleInvoice',
         on_delete=models.CASCADE,
@@ -74,7 +81,13 @@ class PaymentSchedule(models.Model):
         blank=True,
     )
 
+    class Meta:
+        indexes = [
+            # aging buckets: overdue and due-this-week installments
+            models.Index(fields=["status", "due_date"], name="payment_schedule_aging_idx"),
+        ]
+
     def __str__(self):  # pragma: no cover - display helper
-        invoice = self.sale_invoice
+        invoice = self.sale_invoice or self.purchase_invoice
         return f"Schedule for {invoice} due {self.due_date}" if invoice else "Schedule"
 
@@ -21,7 +21,7 @@ class PaymentScheduleSerializer(serializers.ModelSerializer):
     def get_journal_entry(self, obj):
         if obj.journal_entry:
             return {
-                "id": obj.journal_entry.id,
+                "id": obj.journal_entry.pk,
                 "timestamp": obj.journal_entry.timestamp,
                 "description": obj.journal_entry.description,
             }
@@ -1,28 +1,45 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import permissions, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from .models import FinancialYear, PaymentSchedule
 from .serializers import FinancialYearSerializer, PaymentScheduleSerializer
+from utils.balances import adjust_party_balance
 from utils.ledger import post_simple_entry
+from utils.schedules import overdue_schedules, schedules_due_within
 
 
 class PaymentScheduleViewSet(viewsets.ModelViewSet):
     queryset = PaymentSchedule.objects.all()
     serializer_class = PaymentScheduleSerializer
 
+    def get_queryset(self):
+        """``?aging=overdue`` or ``?aging=week`` for the collections buckets."""
+        qs = super().get_queryset()
+        aging = self.request.query_params.get("aging")
+        if aging == "overdue":
+            qs = overdue_schedules(timezone.localdate(), qs)
+        elif aging == "week":
+            qs = schedules_due_within(timezone.localdate(), 7, qs)
+        return qs
+
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def mark_paid(self, request, pk=None):
         schedule = self.get_object()
-        if schedule.status != "Paid":
+        # claim the schedule so a repeated request cannot recover it twice
+        if PaymentSchedule.objects.filter(pk=schedule.pk).exclude(status="Paid").update(status="Paid"):
             schedule.status = "Paid"
-            schedule.save(update_fields=["status"])
             invoice = schedule.purchase_invoice or schedule.sale_invoice
             if invoice:
                 invoice.paid_amount = (invoice.paid_amount or 0) + schedule.amount
                 if invoice.paid_amount >= invoice.grand_total:
                     invoice.status = "Paid"
                 invoice.save(update_fields=["paid_amount", "status"])
+                # the recovered amount no longer counts towards the party's exposure
+                adjust_party_balance(invoice.supplier if schedule.purchase_invoice else invoice.customer, -schedule.amount)
 
                 if schedule.purchase_invoice:
                     je = post_simple_entry(
@@ -5,13 +5,14 @@ from .models import (
 )
 from django.utils.html import format_html
 from django.utils.timezone import now
-from datetime import timedelta
 from django.db.models import Sum
 from django.contrib import messages
 from django.http import HttpResponse
 from django.template.loader import render_to_string
 from xhtml2pdf import pisa
 
+from .payroll import run_payroll
+
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
     list_display = ('name', 'phone', 'active')
@@ -86,41 +87,8 @@ class PayrollSlipAdmin(admin.ModelAdmin):
     pdf_link.short_description = "PDF Slip"
 
     def generate_payroll(self, request, queryset):
-        today = now().date()
-        month_start = today.replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-
-        employees = Employee.objects.filter(active=True)
-        created = 0
-        for emp in employees:
-            if PayrollSlip.objects.filter(employee=emp, month=month_start).exists():
-                continue
-
-            # Auto calculation
-            total_attendance = Attendance.objects.filter(employee=emp, date__range=[month_start, month_end])
-            present = total_attendance.exclude(is_absent=True).count()
-            absent = total_attendance.filter(is_absent=True).count()
-
-            try:
-                contract = EmployeeContract.objects.filter(employee=emp).latest('start_date')
-            except EmployeeContract.DoesNotExist:
-                continue
-
-            daily_salary = contract.salary / 30
-            deduction = daily_salary * absent
-            net = contract.salary - deduction
-
-            PayrollSlip.objects.create(
-                employee=emp,
-                month=month_start,
-                base_salary=contract.salary,
-                present_days=present,
-                absent_days=absent,
-                deductions=deduction,
-                net_salary=net,
-            )
-            created += 1
-        self.message_user(request, f"{created} payroll slips generated.")
+        result = run_payroll(now().date())
+        self.message_user(request, f"{len(result['slips'])} payroll slips generated.")
     generate_payroll.short_description = "Generate Payroll for Current Month"
 
 @admin.register(DeliveryAssignment)
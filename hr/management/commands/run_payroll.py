@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from hr.payroll import run_payroll
+
+
+class Command(BaseCommand):
+    help = "Create payroll slips for every active employee and post one consolidated journal entry."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", help="Payroll month as YYYY-MM (default: current month).")
+        parser.add_argument(
+            "--breakdown",
+            action="store_true",
+            help="Post one debit/credit pair per employee in the journal entry instead of totals.",
+        )
+
+    def handle(self, *args, **options):
+        if options["month"]:
+            try:
+                month = datetime.strptime(options["month"], "%Y-%m").date()
+            except ValueError:
+                raise CommandError("--month must be YYYY-MM.")
+        else:
+            month = timezone.localdate()
+        try:
+            result = run_payroll(month, breakdown=options["breakdown"])
+        except ValidationError as exc:
+            raise CommandError(" ".join(exc.messages))
+        for employee_id, reason in result["skipped"].items():
+            if reason != "already paid":
+                self.stdout.write(self.style.WARNING(f"employee={employee_id} skipped: {reason}"))
+        je = result["journal_entry"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(result['slips'])} payroll slip(s) for {result['month']:%B %Y}, total {result['total']}"
+                + (f", journal entry {je.je_number}." if je else ".")
+            )
+        )
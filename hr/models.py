@@ -4,9 +4,8 @@ from django.contrib.contenttypes.models import ContentType
 from user.models import CustomUser
 from decimal import Decimal
 from setting.models import Company
-from django_ledger.models.journal_entry import JournalEntryModel
-from django_ledger.models.transactions import TransactionModel
-from django_ledger.models.ledger import LedgerModel
+from django.utils import timezone
+from utils.ledger import post_payroll_entry
 
 
 class EmployeeRole(models.TextChoices):
@@ -142,6 +141,14 @@ class LeaveBalance(models.Model):
 
 
 
+def compute_net_salary(base_salary, present_days, absent_days, leaves_paid=0, deductions=0):
+    """Base salary less unpaid absent days (pro rata over recorded days) and ``deductions``."""
+    total_days = present_days + absent_days
+    per_day = (base_salary / total_days) if total_days else Decimal('0')
+    unpaid_absent = max(absent_days - leaves_paid, 0)
+    return (base_salary - (per_day * unpaid_absent) - deductions).quantize(Decimal('0.01'))
+
+
 class PayrollSlip(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
     month = models.DateField(help_text="1st of the payroll month")
@@ -161,35 +168,22 @@ class PayrollSlip(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
-        total_days = self.present_days + self.absent_days
-        per_day = (self.base_salary / total_days) if total_days else Decimal('0')
-        unpaid_absent = max(self.absent_days - self.leaves_paid, 0)
-        self.net_salary = self.base_salary - (per_day * unpaid_absent) - self.deductions
+        self.net_salary = compute_net_salary(
+            Decimal(self.base_salary), self.present_days, self.absent_days, self.leaves_paid, Decimal(self.deductions)
+        )
         super().save(*args, **kwargs)
 
         if not self.journal_entry:
             company = Company.objects.first()
             if company and company.payroll_expense_account and company.payroll_payment_account:
-                ledger = LedgerModel.objects.first()
-                if ledger:
-                    je = JournalEntryModel.objects.create(
-                        ledger=ledger,
-                        description=f"Payroll for {self.employee.name} - {self.month.strftime('%B %Y')}",
-                    )
-                    TransactionModel.objects.create(
-                        journal_entry=je,
-                        account=company.payroll_expense_account,
-                        tx_type=TransactionModel.DEBIT,
-                        amount=self.net_salary,
-                        description="Payroll expense",
-                    )
-                    TransactionModel.objects.create(
-                        journal_entry=je,
-                        account=company.payroll_payment_account,
-                        tx_type=TransactionModel.CREDIT,
-                        amount=self.net_salary,
-                        description="Payroll payment",
-                    )
+                je = post_payroll_entry(
+                    timezone.localdate(),
+                    company.payroll_expense_account,
+                    company.payroll_payment_account,
+                    self.net_salary,
+                    narration=f"Payroll for {self.employee.name} - {self.month.strftime('%B %Y')}",
+                )
+                if je:
                     self.journal_entry = je
                     super().save(update_fields=['journal_entry'])
 
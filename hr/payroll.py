@@ -0,0 +1,166 @@
+"""Monthly payroll runs.
+
+:func:`run_payroll` creates the month's :class:`~hr.models.PayrollSlip` for
+every active employee that has none yet. The work takes a fixed number of
+queries, however many employees there are:
+
+* one grouped query counts present and absent ``Attendance`` days;
+* one query reads the approved ``LeaveRequest`` rows overlapping the month;
+* one query reads the contracts in force;
+* a single ``bulk_create`` writes the slips.
+
+Approved leave pays for absent days, up to the number of leave days in the
+month. The run posts one consolidated journal entry: debit payroll expense,
+credit payroll payment. With ``breakdown=True`` that entry has one pair of
+lines per employee instead of one pair in total. A run that has slips to
+create but no company payroll accounts is refused rather than leaving slips
+without an entry, which later runs would treat as paid.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django_ledger.models import TransactionModel
+
+from setting.models import Company
+from utils.ledger import create_journal_entry
+
+from .models import Attendance, Employee, EmployeeContract, LeaveRequest, PayrollSlip, compute_net_salary
+
+
+def month_bounds(month):
+    """First and last day of the month containing ``month``."""
+    start = month.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start, end
+
+
+def attendance_days(employee_ids, start, end):
+    """``{employee_id: (present, absent)}`` from one grouped query."""
+    rows = (
+        Attendance.objects.filter(employee_id__in=employee_ids, date__range=(start, end))
+        .values("employee_id")
+        .annotate(present=Count("id", filter=Q(is_absent=False)), absent=Count("id", filter=Q(is_absent=True)))
+    )
+    return {row["employee_id"]: (row["present"], row["absent"]) for row in rows}
+
+
+def approved_leave_days(employee_ids, start, end):
+    """``{employee_id: days}`` of approved leave falling inside ``start``..``end``."""
+    days = {}
+    leaves = LeaveRequest.objects.filter(
+        employee_id__in=employee_ids, status="APPROVED", start_date__lte=end, end_date__gte=start
+    ).values_list("employee_id", "start_date", "end_date")
+    for employee_id, leave_start, leave_end in leaves:
+        overlap = (min(leave_end, end) - max(leave_start, start)).days + 1
+        days[employee_id] = days.get(employee_id, 0) + overlap
+    return days
+
+
+def current_contracts(employee_ids, start, end):
+    """``{employee_id: contract}``: the latest contract in force during the month."""
+    contracts = {}
+    in_force = (
+        EmployeeContract.objects.filter(employee_id__in=employee_ids, start_date__lte=end)
+        .filter(Q(end_date__isnull=True) | Q(end_date__gte=start))
+        .order_by("employee_id", "-start_date", "-pk")
+    )
+    for contract in in_force:
+        contracts.setdefault(contract.employee_id, contract)
+    return contracts
+
+
+def _payroll_transactions(slips, names, expense_account, payment_account, breakdown):
+    if breakdown:
+        groups = [(f"Payroll - {names[slip.employee_id]}", slip.net_salary) for slip in slips]
+    else:
+        groups = [("Payroll", sum((slip.net_salary for slip in slips), Decimal("0")))]
+    return [
+        tx
+        for description, amount in groups
+        if amount
+        for tx in (
+            {"account": expense_account, "type": TransactionModel.DEBIT, "amount": amount, "description": description},
+            {"account": payment_account, "type": TransactionModel.CREDIT, "amount": amount, "description": description},
+        )
+    ]
+
+
+def run_payroll(month, breakdown=False, entry_date=None):
+    """Create the payroll slips of ``month`` and post their journal entry.
+
+    Employees that already have a slip for the month are left alone, so a
+    run can be repeated after adding contracts. Returns::
+
+        {"month": date, "slips": [...], "journal_entry": je or None,
+         "total": Decimal, "skipped": {employee_id: reason}}
+
+    Raises ``ValidationError`` when there are slips to create and the
+    company has no payroll expense or payment account.
+    """
+    start, end = month_bounds(month)
+    with transaction.atomic():
+        # locked so two runs for the same month cannot both create slips
+        employees = dict(
+            Employee.objects.select_for_update().filter(active=True).order_by("pk").values_list("pk", "name")
+        )
+        paid = set(
+            PayrollSlip.objects.filter(employee_id__in=employees, month=start).values_list("employee_id", flat=True)
+        )
+        pending = [pk for pk in employees if pk not in paid]
+        contracts = current_contracts(pending, start, end)
+        attendance = attendance_days(pending, start, end)
+        leaves = approved_leave_days(pending, start, end)
+
+        skipped = {pk: "already paid" for pk in paid}
+        slips = []
+        for employee_id in pending:
+            contract = contracts.get(employee_id)
+            if contract is None:
+                skipped[employee_id] = "no contract"
+                continue
+            present, absent = attendance.get(employee_id, (0, 0))
+            leaves_paid = min(leaves.get(employee_id, 0), absent)
+            slips.append(
+                PayrollSlip(
+                    employee_id=employee_id,
+                    month=start,
+                    base_salary=contract.salary,
+                    present_days=present,
+                    absent_days=absent,
+                    leaves_paid=leaves_paid,
+                    net_salary=compute_net_salary(contract.salary, present, absent, leaves_paid),
+                )
+            )
+
+        total = sum((slip.net_salary for slip in slips), Decimal("0"))
+        je = None
+        company = Company.objects.select_related("payroll_expense_account", "payroll_payment_account").first()
+        if slips:
+            if not (company and company.payroll_expense_account and company.payroll_payment_account):
+                raise ValidationError("Set the company's payroll expense and payment accounts before running payroll.")
+            je = create_journal_entry(
+                entry_date or timezone.localdate(),
+                f"Payroll - {start.strftime('%B %Y')}",
+                _payroll_transactions(
+                    slips, employees, company.payroll_expense_account, company.payroll_payment_account, breakdown
+                ),
+            )
+            for slip in slips:
+                slip.journal_entry = je
+        PayrollSlip.objects.bulk_create(slips)
+
+    return {"month": start, "slips": slips, "journal_entry": je, "total": total, "skipped": skipped}
+
+
+__all__ = [
+    "approved_leave_days",
+    "attendance_days",
+    "current_contracts",
+    "month_bounds",
+    "run_payroll",
+]
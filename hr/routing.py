@@ -0,0 +1,178 @@
+"""Delivery route planning.
+
+A delivery employee's stops for a day are the customers of the sale
+invoices assigned to them; several invoices for one customer make one stop.
+Stops are ordered with a nearest-neighbour tour improved by 2-opt over
+great-circle (haversine) distances between the customers'
+``latitude``/``longitude``.
+Customers without coordinates cannot be placed and are returned apart.
+
+Distances between customers of the same area are kept per area in an LRU
+cache and reused across plans. Re-planning after one new order therefore
+computes only that customer's distances. A customer whose coordinates
+changed has its cached distances dropped.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from utils.cache import LRUCache
+from utils.geocode import haversine_km
+
+from .models import DeliveryAssignment
+
+ROUTE_AREA_CACHE_SIZE = getattr(settings, "ROUTE_AREA_CACHE_SIZE", 500)
+#: 2-opt stops once a full pass improves the tour by less than this (km)
+MIN_IMPROVEMENT_KM = 1e-6
+
+_areas = LRUCache(ROUTE_AREA_CACHE_SIZE)
+_lock = threading.Lock()
+
+
+def _area_entry(area_id, coords):
+    """Return the cached ``{"coords", "pairs"}`` of ``area_id``, refreshed for ``coords``."""
+    entry = _areas.get(area_id, None)
+    if entry is None:
+        entry = {"coords": {}, "pairs": {}}
+        _areas.set(area_id, entry)
+    moved = {pk for pk, point in coords.items() if entry["coords"].get(pk, point) != point}
+    if moved:
+        entry["pairs"] = {pair: km for pair, km in entry["pairs"].items() if not moved.intersection(pair)}
+    entry["coords"].update(coords)
+    return entry
+
+
+def distance_matrix(stops):
+    """Square matrix of km between ``stops`` (dicts with ``key``, ``area``, ``point``).
+
+    Pairs of stops in the same area come from, and are added to, that
+    area's cache; other pairs are computed directly.
+    """
+    n = len(stops)
+    matrix = [[0.0] * n for _ in range(n)]
+    with _lock:
+        entries = {}
+        for area_id in {stop["area"] for stop in stops if stop["area"] is not None}:
+            coords = {stop["key"]: stop["point"] for stop in stops if stop["area"] == area_id}
+            entries[area_id] = _area_entry(area_id, coords)
+        for i in range(n):
+            for j in range(i + 1, n):
+                a, b = stops[i], stops[j]
+                entry = entries.get(a["area"]) if a["area"] == b["area"] else None
+                if entry is None:
+                    km = haversine_km(a["point"], b["point"])
+                else:
+                    pair = (a["key"], b["key"]) if a["key"] < b["key"] else (b["key"], a["key"])
+                    km = entry["pairs"].get(pair)
+                    if km is None:
+                        km = entry["pairs"][pair] = haversine_km(a["point"], b["point"])
+                matrix[i][j] = matrix[j][i] = km
+    return matrix
+
+
+def nearest_neighbour(matrix, start=0):
+    """Greedy open tour over all nodes of ``matrix`` from ``start``."""
+    tour = [start]
+    left = set(range(len(matrix))) - {start}
+    while left:
+        row = matrix[tour[-1]]
+        nxt = min(left, key=lambda j: (row[j], j))
+        tour.append(nxt)
+        left.remove(nxt)
+    return tour
+
+
+def two_opt(tour, matrix, fixed_start=True):
+    """Improve an open ``tour`` by reversing segments while that shortens it."""
+    tour = list(tour)
+    n = len(tour)
+    first = 1 if fixed_start else 0
+    improved = True
+    while improved:
+        improved = False
+        for i in range(first, n - 1):
+            for j in range(i + 1, n):
+                a = tour[i - 1] if i > 0 else None
+                b, c = tour[i], tour[j]
+                d = tour[j + 1] if j + 1 < n else None
+                before = (matrix[a][b] if a is not None else 0) + (matrix[c][d] if d is not None else 0)
+                after = (matrix[a][c] if a is not None else 0) + (matrix[b][d] if d is not None else 0)
+                if after < before - MIN_IMPROVEMENT_KM:
+                    tour[i : j + 1] = reversed(tour[i : j + 1])
+                    improved = True
+    return tour
+
+
+def tour_length(tour, matrix):
+    return sum(matrix[a][b] for a, b in zip(tour, tour[1:]))
+
+
+def plan_route(stops, start=None):
+    """Order ``stops`` (dicts with ``key``, ``area``, ``point``) into a short route.
+
+    With ``start`` (a ``(lat, lon)`` point, e.g. the warehouse) the route
+    leaves from there. Returns ``(ordered stops, leg km per stop, total km)``.
+    """
+    if not stops:
+        return [], [], 0.0
+    nodes = list(stops)
+    if start is not None:
+        nodes.insert(0, {"key": None, "area": None, "point": start})
+    matrix = distance_matrix(nodes)
+    tour = two_opt(nearest_neighbour(matrix), matrix, fixed_start=start is not None)
+    legs = [0.0] + [matrix[a][b] for a, b in zip(tour, tour[1:])]
+    if start is not None:
+        tour, legs = tour[1:], legs[1:]
+    return [nodes[i] for i in tour], legs, sum(legs)
+
+
+def delivery_route(employee_id, date, start=None):
+    """Plan the route of ``employee_id``'s open assignments for ``date``.
+
+    Returns ``{"stops": [...], "unrouted": [...], "distance_km": float}``.
+    Each stop carries the customer and the assignment and invoice ids it
+    covers, in delivery order.
+    """
+    assignments = (
+        DeliveryAssignment.objects.filter(employee_id=employee_id, assigned_date=date, status="ASSIGNED")
+        .select_related("sale__customer")
+        .order_by("id")
+    )
+    customers = OrderedDict()
+    for assignment in assignments:
+        party = assignment.sale.customer
+        stop = customers.setdefault(
+            party.pk,
+            {
+                "key": party.pk,
+                "area": party.area_id,
+                "party": party,
+                "point": (
+                    (float(party.latitude), float(party.longitude))
+                    if party.latitude is not None and party.longitude is not None
+                    else None
+                ),
+                "assignments": [],
+                "invoices": [],
+            },
+        )
+        stop["assignments"].append(assignment.pk)
+        stop["invoices"].append(assignment.sale_id)
+
+    placed = [stop for stop in customers.values() if stop["point"] is not None]
+    unrouted = [stop for stop in customers.values() if stop["point"] is None]
+    ordered, legs, total = plan_route(placed, start)
+    return {"stops": list(zip(ordered, legs)), "unrouted": unrouted, "distance_km": total}
+
+
+__all__ = [
+    "delivery_route",
+    "distance_matrix",
+    "haversine_km",
+    "nearest_neighbour",
+    "plan_route",
+    "tour_length",
+    "two_opt",
+]
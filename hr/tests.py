@@ -0,0 +1,160 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django_ledger.models import TransactionModel
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from hr.models import Attendance, DeliveryAssignment, Employee, EmployeeContract, LeaveRequest, PayrollSlip
+from hr.payroll import run_payroll
+from hr.routing import _areas, nearest_neighbour, tour_length, two_opt
+from hr.views import DeliveryAssignmentViewSet, PayrollSlipViewSet
+from inventory.models import Party
+from sale.models import SaleInvoice
+from setting.models import Company
+from sale.tests import User, setup_basic_entities
+
+
+class DeliveryRouteTests(TestCase):
+    def setUp(self):
+        data = setup_basic_entities()
+        self.user = User.objects.get()
+        self.driver = Employee.objects.create(name="Driver", phone="1", role="DELIVERY")
+        area = data["customer"].area
+        # three customers along the equator, assigned out of order, one without coordinates
+        self.parties = {}
+        for name, lon in (("far", "0.03"), ("near", "0.01"), ("mid", "0.02"), ("nowhere", None)):
+            self.parties[name] = Party.objects.create(
+                name=name,
+                address="a",
+                phone="1",
+                party_type="customer",
+                area=area,
+                latitude="0" if lon else None,
+                longitude=lon,
+            )
+            invoice = SaleInvoice.objects.create(
+                invoice_no=f"INV-{name}",
+                date=date.today(),
+                customer=self.parties[name],
+                warehouse=data["warehouse"],
+                total_amount=0,
+                payment_method="Cash",
+            )
+            DeliveryAssignment.objects.create(employee=self.driver, sale=invoice)
+        _areas.clear()
+
+    def _route(self, **params):
+        request = APIRequestFactory().get("/", {"employee": self.driver.pk, **params})
+        force_authenticate(request, self.user)
+        return DeliveryAssignmentViewSet.as_view({"get": "route"})(request).data
+
+    def test_route_orders_stops_from_start(self):
+        data = self._route(startLat=0, startLon=0)
+        self.assertEqual([stop["name"] for stop in data["stops"]], ["near", "mid", "far"])
+        self.assertAlmostEqual(data["distanceKm"], 3.336, places=2)
+        self.assertEqual([stop["name"] for stop in data["unrouted"]], ["nowhere"])
+
+        # distances within the area are cached; a moved customer drops only its own
+        pairs = next(iter(_areas._data.values()))["pairs"]
+        self.assertEqual(len(pairs), 3)
+        Party.objects.filter(pk=self.parties["far"].pk).update(longitude="0.005")
+        data = self._route(startLat=0, startLon=0)
+        self.assertEqual([stop["name"] for stop in data["stops"]], ["far", "near", "mid"])
+
+    def test_two_opt_removes_crossing(self):
+        points = [(0, 0), (0, 2), (0, 1), (0, 3)]
+        matrix = [[abs(a[1] - b[1]) for b in points] for a in points]
+        tour = two_opt([0, 1, 2, 3], matrix)
+        self.assertEqual(tour, [0, 2, 1, 3])
+        self.assertLessEqual(tour_length(tour, matrix), tour_length(nearest_neighbour(matrix), matrix))
+
+
+class PayrollRunTests(TestCase):
+    def setUp(self):
+        data = self.data = setup_basic_entities()
+        self.user = User.objects.get()
+        Company.objects.update(
+            payroll_expense_account=data["sales_account"], payroll_payment_account=data["cash_account"]
+        )
+        self.month = date(2024, 2, 1)
+        self.employees = {}
+        for name, salary in (("ali", "3000"), ("sara", "2000"), ("new", None)):
+            employee = self.employees[name] = Employee.objects.create(name=name, phone="1")
+            if salary:
+                EmployeeContract.objects.create(employee=employee, start_date=date(2023, 1, 1), salary=salary)
+        # ali: 8 present, 2 absent, one of them on approved leave; sara: all present
+        for day in range(10):
+            Attendance.objects.create(
+                employee=self.employees["ali"], date=self.month + timedelta(days=day), is_absent=day < 2
+            )
+            Attendance.objects.create(employee=self.employees["sara"], date=self.month + timedelta(days=day))
+        LeaveRequest.objects.create(
+            employee=self.employees["ali"],
+            leave_type="SICK",
+            start_date=date(2024, 1, 30),
+            end_date=self.month,
+            status="APPROVED",
+        )
+        Employee.objects.create(name="gone", phone="1", active=False)
+
+    def test_run_creates_slips_with_one_entry(self):
+        result = run_payroll(self.month, breakdown=True)
+
+        slips = {slip.employee.name: slip for slip in PayrollSlip.objects.select_related("employee")}
+        self.assertEqual(set(slips), {"ali", "sara"})
+        ali = slips["ali"]
+        self.assertEqual((ali.present_days, ali.absent_days, ali.leaves_paid), (8, 2, 1))
+        self.assertEqual(ali.net_salary, Decimal("2700.00"))
+        self.assertEqual(slips["sara"].net_salary, Decimal("2000.00"))
+        self.assertEqual(result["total"], Decimal("4700.00"))
+        self.assertEqual(result["skipped"], {self.employees["new"].pk: "no contract"})
+
+        je = result["journal_entry"]
+        self.assertEqual({slip.journal_entry_id for slip in slips.values()}, {je.pk})
+        lines = TransactionModel.objects.filter(journal_entry=je)
+        self.assertEqual(lines.count(), 4)
+        self.assertEqual(
+            sum(tx.amount for tx in lines if tx.tx_type == TransactionModel.DEBIT),
+            sum(tx.amount for tx in lines if tx.tx_type == TransactionModel.CREDIT),
+        )
+
+        # a second run only picks up employees without a slip
+        EmployeeContract.objects.create(employee=self.employees["new"], start_date=self.month, salary="1000")
+        result = run_payroll(self.month)
+        self.assertEqual([slip.employee_id for slip in result["slips"]], [self.employees["new"].pk])
+        self.assertEqual(TransactionModel.objects.filter(journal_entry=result["journal_entry"]).count(), 2)
+
+    def test_run_without_payroll_accounts_is_refused(self):
+        Company.objects.update(payroll_expense_account=None)
+        with self.assertRaises(ValidationError):
+            run_payroll(self.month)
+        self.assertFalse(PayrollSlip.objects.exists())
+
+        # once the accounts are set, the same employees are paid and posted
+        Company.objects.update(payroll_expense_account=self.data["sales_account"])
+        result = run_payroll(self.month)
+        self.assertEqual(len(result["slips"]), 2)
+        self.assertIsNotNone(result["journal_entry"])
+
+    def _run(self, data):
+        request = APIRequestFactory().post("/", data, format="json")
+        force_authenticate(request, self.user)
+        return PayrollSlipViewSet.as_view({"post": "run"})(request)
+
+    def test_run_endpoint_rejects_bad_months_and_missing_accounts(self):
+        self.assertEqual(self._run({"month": "2026-02-30"}).status_code, 400)
+        self.assertEqual(self._run({"month": "Feb"}).status_code, 400)
+        Company.objects.update(payroll_payment_account=None)
+        response = self._run({"month": "2024-02-15"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("payroll", response.data["detail"][0])
+
+    def test_run_endpoint(self):
+        request = APIRequestFactory().post("/", {"month": "2024-02-15"}, format="json")
+        force_authenticate(request, self.user)
+        response = PayrollSlipViewSet.as_view({"post": "run"})(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["slips"]), 2)
+        self.assertEqual(response.data["total"], Decimal("4700.00"))
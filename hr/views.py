@@ -1,4 +1,7 @@
-from rest_framework import permissions, viewsets
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
@@ -13,6 +16,8 @@ from .models import (
     SalesTarget,
     Task,
 )
+from .payroll import run_payroll
+from .routing import delivery_route
 from .serializers import (
     AttendanceSerializer,
     DeliveryAssignmentSerializer,
@@ -99,6 +104,53 @@ class DeliveryAssignmentViewSet(BaseViewSet):
     queryset = DeliveryAssignment.objects.all()
     serializer_class = DeliveryAssignmentSerializer
 
+    @action(detail=False, methods=["get"])
+    def route(self, request):
+        """
+        Ordered delivery route for one employee's open assignments of a day.
+        Query params: employee (required), date (YYYY-MM-DD, default today),
+        startLat/startLon (optional starting point, e.g. the warehouse).
+        """
+        employee_id = request.query_params.get("employee")
+        if not (employee_id or "").isdigit():
+            return Response({"detail": "employee is required"}, status=status.HTTP_400_BAD_REQUEST)
+        day = parse_date(request.query_params.get("date") or "") or timezone.localdate()
+        start = None
+        try:
+            if request.query_params.get("startLat") and request.query_params.get("startLon"):
+                start = (float(request.query_params["startLat"]), float(request.query_params["startLon"]))
+        except ValueError:
+            return Response({"detail": "startLat/startLon must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        plan = delivery_route(int(employee_id), day, start)
+
+        def stop_data(stop):
+            party = stop["party"]
+            return {
+                "partyId": party.pk,
+                "name": party.name,
+                "address": party.address,
+                "phone": party.phone,
+                "areaId": party.area_id,
+                "latitude": float(party.latitude) if party.latitude is not None else None,
+                "longitude": float(party.longitude) if party.longitude is not None else None,
+                "assignments": stop["assignments"],
+                "invoices": stop["invoices"],
+            }
+
+        return Response(
+            {
+                "employee": int(employee_id),
+                "date": day,
+                "distanceKm": round(plan["distance_km"], 3),
+                "stops": [
+                    {"sequence": n, "legKm": round(leg, 3), **stop_data(stop)}
+                    for n, (stop, leg) in enumerate(plan["stops"], start=1)
+                ],
+                "unrouted": [stop_data(stop) for stop in plan["unrouted"]],
+            }
+        )
+
 
 class LeaveBalanceViewSet(BaseViewSet):
     queryset = LeaveBalance.objects.all()
@@ -108,3 +160,38 @@ class LeaveBalanceViewSet(BaseViewSet):
 class PayrollSlipViewSet(BaseViewSet):
     queryset = PayrollSlip.objects.all()
     serializer_class = PayrollSlipSerializer
+
+    @action(detail=False, methods=["post"])
+    def run(self, request):
+        """
+        Create this month's slips for all active employees in one pass.
+        Body: month (YYYY-MM-DD, any day of the month; default today),
+        breakdown (bool, per-employee lines in the journal entry).
+        """
+        month = request.data.get("month")
+        if month:
+            try:
+                month = parse_date(str(month))
+            except ValueError:
+                # well formed but not a real date, e.g. 2026-02-30
+                month = None
+            if month is None:
+                return Response({"month": "Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = run_payroll(
+                month or timezone.localdate(),
+                breakdown=str(request.data.get("breakdown", "")).lower() in ("1", "true", "yes"),
+            )
+        except ValidationError as exc:
+            return Response({"detail": exc.messages}, status=status.HTTP_400_BAD_REQUEST)
+        je = result["journal_entry"]
+        return Response(
+            {
+                "month": result["month"],
+                "total": result["total"],
+                "journalEntry": str(je.pk) if je else None,
+                "slips": self.get_serializer(result["slips"], many=True).data,
+                "skipped": [{"employee": pk, "reason": reason} for pk, reason in result["skipped"].items()],
+            },
+            status=status.HTTP_201_CREATED,
+        )
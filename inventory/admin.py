@@ -1,7 +1,10 @@
 # inventory/admin.py
+from collections import defaultdict
+
 from django.contrib import admin
 
-from .models import Product, Party, Batch, StockMovement, PriceList, PriceListItem
+from .models import Product, Party, Batch, StockBalance, StockMovement, PriceList, PriceListItem
+from utils.stock import apply_balance_deltas
 
 
 from .forms import PartyForm
@@ -36,6 +39,31 @@ class BatchAdmin(admin.ModelAdmin):
     list_filter = ('product', 'expiry_date')
     search_fields = ('batch_number', 'product__name')
 
+    # Manual edits bypass utils.stock, so keep StockBalance in step here.
+    def save_model(self, request, obj, form, change):
+        previous = None
+        if change:
+            previous = Batch.objects.filter(pk=obj.pk).values(
+                'product_id', 'warehouse_id', 'quantity'
+            ).first()
+        super().save_model(request, obj, form, change)
+        deltas = defaultdict(int)
+        if previous:
+            deltas[(previous['product_id'], previous['warehouse_id'])] -= previous['quantity']
+        deltas[(obj.product_id, obj.warehouse_id)] += obj.quantity
+        apply_balance_deltas(deltas)
+
+    def delete_model(self, request, obj):
+        apply_balance_deltas({(obj.product_id, obj.warehouse_id): -obj.quantity})
+        super().delete_model(request, obj)
+
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_display = ('product', 'warehouse', 'quantity', 'updated_at')
+    list_filter = ('warehouse',)
+    search_fields = ('product__name',)
+
 @admin.register(StockMovement)
 class StockMovementAdmin(admin.ModelAdmin):
     list_display = ('batch', 'movement_type', 'quantity', 'timestamp', 'reason')
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        from .barcodes import connect_barcode_cache
+        from .pricing import connect_price_cache
+        from .search import connect_search_index
+
+        connect_barcode_cache()
+        connect_price_cache()
+        connect_search_index()
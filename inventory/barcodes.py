@@ -0,0 +1,133 @@
+"""In-process barcode lookup for POS-style scanning.
+
+Each worker keeps a ``barcode -> product`` map (product fields plus its
+price-list prices). Saving or deleting a :class:`~inventory.models.Product`
+or :class:`~inventory.models.PriceListItem` bumps a version number in the
+Django cache once the transaction commits. A worker that sees a new version
+drops its map. The map is also dropped after ``BARCODE_CACHE_TTL`` seconds,
+because with a per-process cache backend other workers never see the bump.
+
+Stock changes on every sale, so it is never cached: each scan costs one
+indexed query on :class:`~inventory.models.StockBalance`.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+
+from utils.cache import VersionKey
+
+from .models import PriceListItem, Product, StockBalance
+from .pricing import resolve_prices
+
+BARCODE_CACHE_TTL = getattr(settings, "BARCODE_CACHE_TTL", 300)
+BARCODE_CACHE_MAX_ENTRIES = 20000
+_version = VersionKey("inventory:barcodes:version")
+
+PRODUCT_FIELDS = (
+    "id",
+    "name",
+    "barcode",
+    "packing",
+    "trade_price",
+    "retail_price",
+    "sales_tax_ratio",
+    "fed_tax_ratio",
+    "disable_sale_purchase",
+)
+
+_lock = threading.Lock()
+_entries = {}
+_state = {"version": None, "loaded_at": 0.0}
+
+
+def invalidate_barcode_cache():
+    """Make every worker's barcode map stale by bumping the cache version."""
+    _version.bump()
+
+
+def _on_change(sender, **kwargs):
+    transaction.on_commit(invalidate_barcode_cache)
+
+
+def connect_barcode_cache():
+    for model in (Product, PriceListItem):
+        uid = f"barcode_cache_{model._meta.label_lower}"
+        post_save.connect(_on_change, sender=model, dispatch_uid=uid)
+        post_delete.connect(_on_change, sender=model, dispatch_uid=uid)
+
+
+def _load(code):
+    product = Product.objects.filter(barcode=code).order_by("pk").values(*PRODUCT_FIELDS).first()
+    if product is None:
+        return None
+    product["prices"] = dict(
+        PriceListItem.objects.filter(product_id=product["id"]).values_list("price_list_id", "custom_price")
+    )
+    return product
+
+
+def get_barcode_entry(code):
+    """Return the cached product dict for ``code`` (``None`` if unknown)."""
+    version = _version.current()
+    now = time.monotonic()
+    with _lock:
+        stale = now - _state["loaded_at"] > BARCODE_CACHE_TTL
+        if _state["version"] != version or stale or len(_entries) > BARCODE_CACHE_MAX_ENTRIES:
+            _entries.clear()
+            _state.update(version=version, loaded_at=now)
+        if code in _entries:
+            return _entries[code]
+
+    entry = _load(code)
+    with _lock:
+        if _state["version"] == version:
+            _entries[code] = entry
+    return entry
+
+
+def lookup_barcode(code, warehouse_id=None, price_list_id=None, party_id=None):
+    """Return the scan payload for ``code``, or ``None`` if no product has it.
+
+    The price is the ``PriceListItem`` price of ``price_list_id`` when there
+    is one, else the trade price. Without ``price_list_id`` the party's price
+    is resolved by :func:`~inventory.pricing.resolve_prices`, as at checkout.
+    ``stock`` is summed over ``warehouse_id`` or all warehouses.
+    """
+    entry = get_barcode_entry(code)
+    if entry is None:
+        return None
+
+    if price_list_id is None and party_id:
+        rule = resolve_prices([(party_id, entry["id"])]).get((party_id, entry["id"]))
+        price_list_id = rule.price_list_id if rule else None
+        custom_price = rule.rate if price_list_id is not None else None
+    else:
+        custom_price = entry["prices"].get(price_list_id)
+
+    balances = StockBalance.objects.filter(product_id=entry["id"])
+    if warehouse_id:
+        balances = balances.filter(warehouse_id=warehouse_id)
+    stock = balances.aggregate(total=Sum("quantity"))["total"] or 0
+
+    return {
+        "id": entry["id"],
+        "name": entry["name"],
+        "barcode": entry["barcode"],
+        "packing": entry["packing"],
+        "tradePrice": float(entry["trade_price"]),
+        "retailPrice": float(entry["retail_price"]),
+        "salesTaxRatio": float(entry["sales_tax_ratio"]),
+        "fedTaxRatio": float(entry["fed_tax_ratio"]),
+        "disableSalePurchase": entry["disable_sale_purchase"],
+        "stock": stock,
+        "priceListId": price_list_id if custom_price is not None else None,
+        "price": float(custom_price if custom_price is not None else entry["trade_price"]),
+    }
+
+
+__all__ = ["connect_barcode_cache", "get_barcode_entry", "invalidate_barcode_cache", "lookup_barcode"]
@@ -0,0 +1,17 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from inventory.search import SEARCH_FIELDS, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SQLite FTS search tables for products and parties (PostgreSQL needs nothing)."
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            self.stdout.write("Search uses pg_trgm indexes on this database; nothing to rebuild.")
+            return
+        for label in SEARCH_FIELDS:
+            rebuild_search_index(apps.get_model(label))
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt search index for {label}."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from utils.stock import rebuild_stock_balances, stock_balance_drift
+
+
+class Command(BaseCommand):
+    help = "Rebuild the StockBalance table from Batch quantities, or report drift with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report rows where StockBalance disagrees with the Batch sums.",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            drift = stock_balance_drift()
+            for row in drift:
+                self.stdout.write(
+                    f"product={row['product_id']} warehouse={row['warehouse_id']} "
+                    f"balance={row['balance']} batches={row['batches']}"
+                )
+            if drift:
+                self.stdout.write(self.style.WARNING(f"{len(drift)} balance(s) out of sync."))
+            else:
+                self.stdout.write(self.style.SUCCESS("Stock balances are in sync."))
+            return
+
+        count = rebuild_stock_balances()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} stock balance row(s)."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from utils.balances import reconcile_party_balances
+
+
+class Command(BaseCommand):
+    help = "Rebuild Party.current_balance from each party's ledger account, or report drift with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report parties whose stored balance disagrees with the ledger.",
+        )
+
+    def handle(self, *args, **options):
+        drift, skipped = reconcile_party_balances(fix=not options["check"])
+        for row in drift:
+            self.stdout.write(
+                f"party={row['party_id']} ({row['name']}) stored={row['stored']} ledger={row['ledger']}"
+            )
+        if skipped:
+            self.stdout.write(
+                self.style.WARNING(f"{len(skipped)} party(ies) share a ledger account and were skipped.")
+            )
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Party balances match the ledger."))
+        elif options["check"]:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} balance(s) out of sync."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Corrected {len(drift)} party balance(s)."))
@@ -0,0 +1,40 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_stock_balances(apps, schema_editor):
+    Batch = apps.get_model('inventory', 'Batch')
+    StockBalance = apps.get_model('inventory', 'StockBalance')
+    totals = Batch.objects.values('product_id', 'warehouse_id').annotate(total=Sum('quantity')).order_by()
+    StockBalance.objects.bulk_create(
+        [
+            StockBalance(product_id=row['product_id'], warehouse_id=row['warehouse_id'], quantity=row['total'] or 0)
+            for row in totals
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_initial'),
+        ('setting', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_balances', to='inventory.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_balances', to='setting.warehouse')),
+            ],
+            options={
+                'unique_together': {('product', 'warehouse')},
+            },
+        ),
+        migrations.RunPython(fill_stock_balances, migrations.RunPython.noop),
+    ]
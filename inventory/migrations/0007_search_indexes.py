@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+TRIGRAM_INDEXES = [
+    ('inventory_product', 'name'),
+    ('inventory_product', 'barcode'),
+    ('inventory_party', 'name'),
+    ('inventory_party', 'phone'),
+    ('inventory_party', 'proprietor'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # icontains compiles to UPPER(col::text) LIKE UPPER(%s); index that expression.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm '
+            f'ON {table} USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['barcode'], name='inventory_product_barcode_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
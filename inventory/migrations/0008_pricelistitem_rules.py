@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricelistitem',
+            name='discount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='pricelistitem',
+            name='bonus_per',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pricelistitem',
+            name='bonus_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
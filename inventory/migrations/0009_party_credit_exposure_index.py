@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_pricelistitem_rules'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='party',
+            index=models.Index(
+                models.F('current_balance') - models.F('credit_limit'),
+                condition=models.Q(('credit_limit__gt', 0), ('party_type', 'customer')),
+                name='party_credit_exposure_idx',
+            ),
+        ),
+    ]
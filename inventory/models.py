@@ -1,9 +1,10 @@
 from django.db import models
-from setting.models import Company, Group, Distributor
+from django.db.models import F, Q
+from setting.models import Company, Group, Distributor, SyncTrackedModel
 from user.models import CustomUser
 from django_ledger.models.accounts import AccountModel
 # Master Product
-class Product(models.Model):
+class Product(SyncTrackedModel):
     name = models.CharField(max_length=255)
     barcode = models.CharField(max_length=100, blank=True)
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
@@ -30,8 +31,15 @@ class Product(models.Model):
 
     @property
     def stock(self):
-        """Total available quantity across all batches."""
-        return self.batch_set.aggregate(total=models.Sum('quantity'))['total'] or 0
+        """Total available quantity across all warehouses.
+
+        Read from the materialized :class:`StockBalance` rows; when those were
+        prefetched (``prefetch_related("stock_balances")``) no query is issued.
+        """
+        prefetched = getattr(self, "_prefetched_objects_cache", {})
+        if "stock_balances" in prefetched:
+            return sum(balance.quantity for balance in prefetched["stock_balances"])
+        return self.stock_balances.aggregate(total=models.Sum('quantity'))['total'] or 0
     @stock.setter
     def stock(self, value):
         self.stock = value
@@ -42,9 +50,15 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["name", "id"], name="inventory_product_name_id_idx"),
+            models.Index(fields=["barcode"], name="inventory_product_barcode_idx"),
+        ]
+
 
 # Batch per product
-class Batch(models.Model):
+class Batch(SyncTrackedModel):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     batch_number = models.CharField(max_length=100)
     expiry_date = models.DateField()
@@ -75,6 +89,22 @@ class Batch(models.Model):
         return f"{self.product.name} - {self.batch_number}"
 
 
+# Materialized on-hand quantity per product and warehouse
+class StockBalance(models.Model):
+    """Running stock total kept in step with ``Batch`` by ``utils.stock``."""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_balances")
+    warehouse = models.ForeignKey('setting.Warehouse', on_delete=models.CASCADE, related_name="stock_balances")
+    quantity = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('product', 'warehouse')
+
+    def __str__(self):
+        return f"{self.product} @ {self.warehouse}: {self.quantity}"
+
+
 # Stock movement logs (for audit & reports)
 class StockMovement(models.Model):
     MOVEMENT_TYPE_CHOICES = [
@@ -94,9 +124,14 @@ class StockMovement(models.Model):
     def __str__(self):
         return f"{self.batch} - {self.movement_type} - {self.quantity}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["timestamp", "id"], name="stock_movement_ts_id_idx"),
+        ]
+
 
 # Party master (Customer/Supplier)
-class Party(models.Model):
+class Party(SyncTrackedModel):
     PARTY_TYPES = (
         ('customer', 'Customer'),
         ('supplier', 'Supplier'),
@@ -130,11 +165,18 @@ class Party(models.Model):
             models.Index(fields=["name"]),
             models.Index(fields=["phone"]),
             models.Index(fields=["proprietor"]),
+            models.Index(fields=["name", "id"], name="inventory_party_name_id_idx"),
+            # customers over their credit limit (utils.credit.customers_over_limit)
+            models.Index(
+                F("current_balance") - F("credit_limit"),
+                condition=Q(party_type="customer", credit_limit__gt=0),
+                name="party_credit_exposure_idx",
+            ),
         ]
 
 
 # Custom price lists
-class PriceList(models.Model):
+class PriceList(SyncTrackedModel):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
 
@@ -142,10 +184,15 @@ class PriceList(models.Model):
         return self.name
 
 
-class PriceListItem(models.Model):
+class PriceListItem(SyncTrackedModel):
     price_list = models.ForeignKey(PriceList, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE,related_name="price_list_items")
     custom_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Line rules applied by inventory.pricing: a percent discount and
+    # "bonus_quantity free for every bonus_per sold".
+    discount = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    bonus_per = models.PositiveIntegerField(default=0)
+    bonus_quantity = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ('price_list', 'product')
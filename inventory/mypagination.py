@@ -1,4 +1,5 @@
-from rest_framework.pagination import LimitOffsetPagination
-class MyCustomPagination(LimitOffsetPagination):
+from utils.pagination import KeysetOptInPagination
+class MyCustomPagination(KeysetOptInPagination):
     default_limit=5
-    max_limit=10
\ No newline at end of file
+    max_limit=10
+    keyset_ordering=("name", "id")
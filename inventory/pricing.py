@@ -0,0 +1,224 @@
+"""Effective selling prices per (customer, product).
+
+A customer's price list is named by the free-text ``Party.price_list``,
+which holds either a :class:`~inventory.models.PriceList` id or its name. A
+product's effective rate is the ``custom_price`` of its item on that list,
+else its trade price. The list item may also carry a percent ``discount``
+and a "``bonus_quantity`` free per ``bonus_per`` sold" rule.
+
+:func:`resolve_prices` handles a whole cart. Customer -> price list and
+(price list, product) -> rule are kept in per-worker LRU caches, and all
+uncached products are fetched with their list items in one query. Price
+list, product and party edits bump a version key in the Django cache after
+commit, and a worker that sees the new version clears its caches. With a
+per-process cache backend other workers never see the bump, so the caches
+are also cleared after ``PRICE_CACHE_TTL`` seconds.
+"""
+
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import FilteredRelation, Q
+from django.db.models.signals import post_delete, post_save
+
+from utils.cache import MISSING, LRUCache, VersionKey
+
+from .models import Party, PriceList, PriceListItem, Product
+
+PRICE_CACHE_SIZE = getattr(settings, "PRICE_CACHE_SIZE", 50000)
+PRICE_CACHE_TTL = getattr(settings, "PRICE_CACHE_TTL", 300)
+_version = VersionKey("inventory:pricing:version", ttl=PRICE_CACHE_TTL)
+_CENT = Decimal("0.01")
+
+PriceRule = namedtuple("PriceRule", "rate discount bonus_per bonus_quantity price_list_id")
+
+_party_lists = LRUCache(PRICE_CACHE_SIZE)
+_rules = LRUCache(PRICE_CACHE_SIZE)
+
+
+def invalidate_price_cache():
+    """Make every worker's cached prices stale by bumping the cache version."""
+    _version.bump()
+
+
+def _on_change(sender, **kwargs):
+    transaction.on_commit(invalidate_price_cache)
+
+
+def connect_price_cache():
+    for model in (PriceList, PriceListItem, Product, Party):
+        uid = f"price_cache_{model._meta.label_lower}"
+        post_save.connect(_on_change, sender=model, dispatch_uid=uid)
+        post_delete.connect(_on_change, sender=model, dispatch_uid=uid)
+
+
+def _check_version():
+    if _version.expired():
+        _party_lists.clear()
+        _rules.clear()
+
+
+def _price_lists_for(customer_ids):
+    """Return ``{customer_id: price_list_id or None}``."""
+    result, missing = {}, []
+    for customer_id in customer_ids:
+        cached = _party_lists.get(customer_id)
+        if cached is MISSING:
+            missing.append(customer_id)
+        else:
+            result[customer_id] = cached
+    if not missing:
+        return result
+
+    raw = dict(Party.objects.filter(pk__in=missing).values_list("pk", "price_list"))
+    names = {value.strip() for value in raw.values() if value and not value.strip().isdigit()}
+    by_name = {}
+    if names:
+        by_name = {name: pk for pk, name in PriceList.objects.filter(name__in=names).values_list("pk", "name")}
+    for customer_id in missing:
+        value = (raw.get(customer_id) or "").strip()
+        price_list_id = int(value) if value.isdigit() else by_name.get(value)
+        _party_lists.set(customer_id, price_list_id)
+        result[customer_id] = price_list_id
+    return result
+
+
+def _load_rules(keys):
+    """Fetch rules for ``(price_list_id, product_id)`` keys in one query."""
+    product_ids = {product_id for _, product_id in keys}
+    list_ids = {price_list_id for price_list_id, _ in keys if price_list_id is not None}
+    fields = ["id", "trade_price"]
+    products = Product.objects.filter(pk__in=product_ids)
+    if list_ids:
+        products = products.annotate(
+            item=FilteredRelation("price_list_items", condition=Q(price_list_items__price_list_id__in=list_ids))
+        )
+        fields += ["item__price_list_id", "item__custom_price", "item__discount", "item__bonus_per", "item__bonus_quantity"]
+
+    trade, custom = {}, {}
+    for row in products.values(*fields):
+        trade[row["id"]] = row["trade_price"]
+        if row.get("item__price_list_id") is not None:
+            custom[(row["item__price_list_id"], row["id"])] = PriceRule(
+                row["item__custom_price"],
+                row["item__discount"],
+                row["item__bonus_per"],
+                row["item__bonus_quantity"],
+                row["item__price_list_id"],
+            )
+
+    rules = {}
+    for key in keys:
+        price_list_id, product_id = key
+        if product_id not in trade:
+            continue
+        rule = custom.get(key) or PriceRule(trade[product_id], Decimal("0"), 0, 0, None)
+        _rules.set(key, rule)
+        rules[key] = rule
+    return rules
+
+
+def resolve_prices(pairs):
+    """Return ``{(customer_id, product_id): PriceRule}`` for ``pairs``.
+
+    Unknown products are left out of the result.
+    """
+    _check_version()
+    pairs = list(dict.fromkeys(pairs))
+    lists = _price_lists_for({customer_id for customer_id, _ in pairs})
+
+    result, missing = {}, []
+    for customer_id, product_id in pairs:
+        key = (lists.get(customer_id), product_id)
+        rule = _rules.get(key)
+        if rule is MISSING:
+            missing.append(key)
+        else:
+            result[(customer_id, product_id)] = rule
+    if missing:
+        loaded = _load_rules(missing)
+        for customer_id, product_id in pairs:
+            key = (lists.get(customer_id), product_id)
+            if key in loaded:
+                result[(customer_id, product_id)] = loaded[key]
+    return result
+
+
+def price_line(rule, quantity):
+    """Return the ``SaleInvoiceItem``-shaped pricing of ``quantity`` units."""
+    amount = (rule.rate * quantity).quantize(_CENT, ROUND_HALF_UP)
+    net_amount = (amount * (100 - rule.discount) / 100).quantize(_CENT, ROUND_HALF_UP)
+    bonus = quantity // rule.bonus_per * rule.bonus_quantity if rule.bonus_per else 0
+    return {
+        "rate": rule.rate,
+        "discount1": rule.discount,
+        "bonus": bonus,
+        "amount": amount,
+        "net_amount": net_amount,
+        "price_list_id": rule.price_list_id,
+    }
+
+
+#: price_line key -> item field, for items that are priced in place
+SALE_ITEM_FIELDS = {"rate": "rate", "discount1": "discount1", "bonus": "bonus", "amount": "amount", "net_amount": "net_amount"}
+ORDER_ITEM_FIELDS = {"rate": "price", "net_amount": "amount"}
+
+
+def apply_prices(customer, items, fields=SALE_ITEM_FIELDS):
+    """Price, in place, the item dicts of a cart that lack a price or amount.
+
+    ``customer`` and each item's ``"product"`` may be instances or ids.
+    Fields already given on an item are kept. An item that gives its rate
+    but no amount gets the amounts of that rate and its own discount.
+    """
+    customer_id = getattr(customer, "pk", customer)
+    price_field, discount_field = fields["rate"], fields.get("discount1")
+    totals = [(source, target) for source, target in fields.items() if source in ("amount", "net_amount")]
+    incomplete = [
+        item
+        for item in items
+        if item.get(price_field) is None or any(item.get(target) is None for _, target in totals)
+    ]
+    if not incomplete:
+        return items
+    product_ids = [getattr(item["product"], "pk", item["product"]) for item in incomplete]
+    rules = resolve_prices([(customer_id, product_id) for product_id in product_ids])
+    for item, product_id in zip(incomplete, product_ids):
+        rule = rules[(customer_id, product_id)]
+        targets = fields.items()
+        if item.get(price_field) is not None:
+            rule = rule._replace(rate=item[price_field], discount=item.get(discount_field) or Decimal("0"))
+            targets = totals
+        line = price_line(rule, item["quantity"])
+        for source, target in targets:
+            if item.get(target) is None:
+                item[target] = line[source]
+    return items
+
+
+def price_cart(customer_id, items):
+    """Price ``items`` (``{"product": id, "quantity": n}``) for one customer.
+
+    Returns one priced dict per item, in order; raises ``KeyError`` for an
+    unknown product.
+    """
+    rules = resolve_prices([(customer_id, item["product"]) for item in items])
+    return [
+        {"product": item["product"], "quantity": item["quantity"], **price_line(rules[(customer_id, item["product"])], item["quantity"])}
+        for item in items
+    ]
+
+
+__all__ = [
+    "ORDER_ITEM_FIELDS",
+    "PriceRule",
+    "SALE_ITEM_FIELDS",
+    "apply_prices",
+    "connect_price_cache",
+    "invalidate_price_cache",
+    "price_cart",
+    "price_line",
+    "resolve_prices",
+]
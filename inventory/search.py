@@ -0,0 +1,192 @@
+"""Ranked product and party search.
+
+Chained ``icontains`` filters cannot use B-tree indexes, so every keystroke
+in the product picker used to scan the table. Search now goes through
+:func:`search`, which picks a backend from the database vendor:
+
+* PostgreSQL: the ``icontains`` filters are answered by ``pg_trgm`` GIN
+  indexes on ``UPPER(column)`` (see ``inventory/migrations``) and results
+  are ranked by trigram word similarity.
+* SQLite: an FTS5 shadow table per model (``<db_table>_fts``, trigram
+  tokenizer, rowid = pk) is kept in sync by ``post_save``/``post_delete``
+  and ranked with bm25. It is created and backfilled on first use; rebuild
+  it with ``manage.py rebuild_search_index`` after bulk writes, which skip
+  signals.
+
+Exact matches on a key column (a product's barcode) are looked up through
+its own index and always sort first.
+"""
+
+from functools import reduce
+from operator import and_, or_
+
+from django.apps import apps
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+
+#: model label -> searchable text columns
+SEARCH_FIELDS = {
+    "inventory.Product": ("name", "barcode"),
+    "inventory.Party": ("name", "phone", "proprietor"),
+}
+
+#: the trigram tokenizer cannot match terms shorter than this
+MIN_TERM_LENGTH = 3
+#: beyond this many FTS hits, search falls back to unranked substring filters
+MAX_FTS_RESULTS = 500
+
+
+def _fields(model):
+    return SEARCH_FIELDS[model._meta.label]
+
+
+def _fts_table(model):
+    return f"{model._meta.db_table}_fts"
+
+
+def _ensure_fts(model, cursor):
+    """Create and backfill the FTS5 table for ``model`` if it does not exist."""
+    table = _fts_table(model)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [table])
+    if cursor.fetchone():
+        return
+    columns = ", ".join(_fields(model))
+    cursor.execute(f"CREATE VIRTUAL TABLE {table} USING fts5({columns}, tokenize='trigram')")
+    cursor.execute(
+        f"INSERT INTO {table} (rowid, {columns}) SELECT id, {columns} FROM {model._meta.db_table}"
+    )
+
+
+def rebuild_search_index(model, using="default"):
+    """Recreate the SQLite FTS table of ``model`` from its current rows."""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {_fts_table(model)}")
+        _ensure_fts(model, cursor)
+
+
+def _index_instance(sender, instance, raw=False, using="default", **kwargs):
+    connection = connections[using]
+    if raw or connection.vendor != "sqlite":
+        return
+    table = _fts_table(sender)
+    fields = _fields(sender)
+    with connection.cursor() as cursor:
+        _ensure_fts(sender, cursor)
+        cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [instance.pk])
+        cursor.execute(
+            f"INSERT INTO {table} (rowid, {', '.join(fields)}) VALUES (%s{', %s' * len(fields)})",
+            [instance.pk, *(getattr(instance, field) or "" for field in fields)],
+        )
+
+
+def _unindex_instance(sender, instance, using="default", **kwargs):
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        _ensure_fts(sender, cursor)
+        cursor.execute(f"DELETE FROM {_fts_table(sender)} WHERE rowid = %s", [instance.pk])
+
+
+def connect_search_index():
+    for label in SEARCH_FIELDS:
+        model = apps.get_model(label)
+        uid = f"search_index_{model._meta.label_lower}"
+        post_save.connect(_index_instance, sender=model, dispatch_uid=uid)
+        post_delete.connect(_unindex_instance, sender=model, dispatch_uid=uid)
+
+
+def _terms(q):
+    return [term for term in q.split() if len(term) >= MIN_TERM_LENGTH]
+
+
+def _contains(fields, q):
+    return reduce(or_, (Q(**{f"{field}__icontains": q}) for field in fields))
+
+
+def _match(queryset, q):
+    """Return ``(filter, rank expression)`` for ``q`` on ``queryset``'s backend."""
+    model = queryset.model
+    fields = _fields(model)
+    connection = connections[queryset.db]
+
+    if connection.vendor == "postgresql":
+        rank = Greatest(*(TrigramWordSimilarity(q, field) for field in fields))
+        return _contains(fields, q), rank
+
+    terms = _terms(q)
+    if connection.vendor == "sqlite" and terms:
+        table = _fts_table(model)
+        query = " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        with connection.cursor() as cursor:
+            _ensure_fts(model, cursor)
+            cursor.execute(
+                f"SELECT rowid, rank FROM {table} WHERE {table} MATCH %s ORDER BY rank LIMIT %s",
+                [query, MAX_FTS_RESULTS + 1],
+            )
+            ranked = cursor.fetchall()
+        if len(ranked) > MAX_FTS_RESULTS:
+            # too many hits to pass as a pk list; every term must still match
+            condition = reduce(and_, (_contains(fields, term) for term in terms))
+            return condition, Value(0.0, output_field=FloatField())
+        # bm25 ranks are negative, best first
+        rank = Case(
+            *(When(pk=pk, then=Value(-score)) for pk, score in ranked),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        return Q(pk__in=[pk for pk, _ in ranked]), rank
+
+    return _contains(fields, q), Value(0.0, output_field=FloatField())
+
+
+def search(queryset, q, exact_field=None):
+    """Filter ``queryset`` to rows matching ``q``, best match first.
+
+    Rows are annotated with ``search_rank``. With ``exact_field``, rows whose
+    column equals ``q`` exactly are included even if the text search missed
+    them and come before everything else.
+    """
+    q = (q or "").strip()
+    if not q:
+        return queryset
+    condition, rank = _match(queryset, q)
+    exact_hit = Value(0)
+    if exact_field and " " not in q:
+        exact = Q(**{exact_field: q})
+        condition |= exact
+        exact_hit = Case(When(exact, then=Value(1)), default=Value(0), output_field=IntegerField())
+    return (
+        queryset.filter(condition)
+        .annotate(exact_hit=exact_hit, search_rank=rank)
+        .order_by("-exact_hit", "-search_rank", "pk")
+    )
+
+
+def search_products(q, queryset=None):
+    """Products matching ``q``; an exact barcode scan is always the first hit."""
+    if queryset is None:
+        queryset = apps.get_model("inventory.Product").objects.all()
+    return search(queryset, q, exact_field="barcode")
+
+
+def search_parties(q, queryset=None):
+    if queryset is None:
+        queryset = apps.get_model("inventory.Party").objects.all()
+    return search(queryset, q)
+
+
+__all__ = [
+    "SEARCH_FIELDS",
+    "connect_search_index",
+    "rebuild_search_index",
+    "search",
+    "search_parties",
+    "search_products",
+]
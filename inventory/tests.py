@@ -0,0 +1,265 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from inventory import pricing, search
+from inventory.barcodes import invalidate_barcode_cache
+from inventory.models import Batch, Party, PriceList, PriceListItem, Product, StockBalance
+from inventory.pricing import (
+    ORDER_ITEM_FIELDS,
+    SALE_ITEM_FIELDS,
+    apply_prices,
+    invalidate_price_cache,
+    price_cart,
+    resolve_prices,
+)
+from inventory.search import search_parties, search_products
+from inventory.views import product_by_barcode, product_list
+from sale.tests import User, setup_basic_entities
+from setting.models import Branch, Company, Distributor, Group, Warehouse
+from utils.stock import rebuild_stock_balances, stock_balance_drift
+
+
+def make_product(name, barcode):
+    return Product.objects.create(
+        name=name,
+        barcode=barcode,
+        company=Company.objects.get_or_create(name="C1")[0],
+        group=Group.objects.get_or_create(name="G1")[0],
+        distributor=Distributor.objects.get_or_create(name="D1")[0],
+        trade_price=10,
+        retail_price=12,
+        sales_tax_ratio=0,
+        fed_tax_ratio=0,
+    )
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.panadol = make_product("Panadol Extra", "8964000111")
+        self.syrup = make_product("Calpol Syrup", "5000")
+        self.scanned = make_product("Vitamin C", "77")
+        self.cust = Party.objects.create(
+            name="Khan Medical Store", address="a", phone="03001234567", party_type="customer"
+        )
+
+    def test_substring_matches_are_ranked(self):
+        make_product("Cold Syrup Panadol Mix", "")
+        names = [p.name for p in search_products("panadol")]
+        self.assertEqual(names[0], "Panadol Extra")
+        self.assertEqual(len(names), 2)
+
+    def test_exact_barcode_comes_first(self):
+        make_product("Flu Tab 5000", "1")
+        self.assertEqual(list(search_products("5000"))[0], self.syrup)
+        # too short for the text index, still found through the barcode
+        self.assertEqual(list(search_products("77")), [self.scanned])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.panadol.name = "Brufen"
+        self.panadol.save()
+        self.assertEqual(list(search_products("brufen")), [self.panadol])
+        self.assertEqual(list(search_products("panadol")), [])
+        self.cust.delete()
+        self.assertEqual(list(search_parties("medical")), [])
+
+    def test_searches_past_the_fts_cap_keep_every_match(self):
+        company, group, distributor = self.panadol.company, self.panadol.group, self.panadol.distributor
+        Product.objects.bulk_create(
+            Product(
+                name=f"Panadol {n}",
+                barcode=f"P{n}",
+                company=company,
+                group=group,
+                distributor=distributor,
+                trade_price=10,
+                retail_price=12,
+                sales_tax_ratio=0,
+                fed_tax_ratio=0,
+            )
+            for n in range(search.MAX_FTS_RESULTS + 10)
+        )
+        search.rebuild_search_index(Product)
+
+        results = search_products("panadol")
+        self.assertEqual(results.count(), search.MAX_FTS_RESULTS + 11)
+        self.assertIn(self.panadol, results)
+        self.assertEqual(search_products("panadol 509").get().name, "Panadol 509")
+
+    def test_party_search_covers_phone(self):
+        self.assertEqual(list(search_parties("1234567")), [self.cust])
+
+    def test_product_list_uses_search(self):
+        response = product_list(APIRequestFactory().get("/products/", {"q": "8964000111"}))
+        self.assertEqual([row["id"] for row in response.data["results"]], [self.panadol.pk])
+
+
+class BarcodeLookupTests(TestCase):
+    def setUp(self):
+        self.product = make_product("Panadol Extra", "8964000111")
+        self.price_list = PriceList.objects.create(name="Wholesale")
+        PriceListItem.objects.create(price_list=self.price_list, product=self.product, custom_price=9)
+        warehouse = Warehouse.objects.create(name="W1", branch=Branch.objects.create(name="B", address="a"))
+        StockBalance.objects.create(product=self.product, warehouse=warehouse, quantity=40)
+        invalidate_barcode_cache()
+
+    def _scan(self, code, **params):
+        return product_by_barcode(APIRequestFactory().get("/", params), code=code)
+
+    def test_scan_returns_price_list_price_and_stock(self):
+        data = self._scan("8964000111", priceListId=self.price_list.pk).data
+        self.assertEqual((data["price"], data["tradePrice"], data["stock"]), (9.0, 10.0, 40))
+        self.assertEqual(self._scan("unknown").status_code, 404)
+
+    def test_party_price_list_by_name_is_resolved_as_at_checkout(self):
+        party = Party.objects.create(
+            name="Khan", address="a", phone="1", party_type="customer", price_list="Wholesale"
+        )
+        invalidate_price_cache()
+        data = self._scan("8964000111", partyId=party.pk).data
+        self.assertEqual((data["price"], data["priceListId"]), (9.0, self.price_list.pk))
+        line = price_cart(party.pk, [{"product": self.product.pk, "quantity": 1}])[0]
+        self.assertEqual(data["price"], float(line["rate"]))
+
+    def test_repeat_scans_only_query_stock(self):
+        self._scan("8964000111")
+        with self.assertNumQueries(1):
+            self._scan("8964000111", priceListId=self.price_list.pk)
+
+    def test_product_save_invalidates_after_commit(self):
+        self._scan("8964000111")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.trade_price = 11
+            self.product.save()
+        self.assertEqual(self._scan("8964000111").data["price"], 11.0)
+
+
+class PricingEngineTests(TestCase):
+    def setUp(self):
+        self.listed = make_product("Panadol Extra", "1")
+        self.plain = make_product("Calpol Syrup", "2")
+        self.wholesale = PriceList.objects.create(name="Wholesale")
+        self.item = PriceListItem.objects.create(
+            price_list=self.wholesale,
+            product=self.listed,
+            custom_price=9,
+            discount=10,
+            bonus_per=10,
+            bonus_quantity=1,
+        )
+        self.by_id, self.by_name, self.retail = (
+            Party.objects.create(name=n, address="a", phone="1", party_type="customer", price_list=v)
+            for n, v in (("A", str(self.wholesale.pk)), ("B", "Wholesale"), ("C", None))
+        )
+        invalidate_price_cache()
+
+    def test_cart_is_resolved_in_fixed_queries_then_cached(self):
+        pairs = [(c.pk, p.pk) for c in (self.by_id, self.by_name, self.retail) for p in (self.listed, self.plain)]
+        with self.assertNumQueries(3):  # parties, list names, products with list items
+            rules = resolve_prices(pairs)
+        self.assertEqual(rules[(self.by_name.pk, self.listed.pk)].rate, 9)
+        self.assertEqual(rules[(self.retail.pk, self.listed.pk)].rate, 10)
+        self.assertEqual(rules[(self.by_id.pk, self.plain.pk)].rate, 10)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_prices(pairs), rules)
+
+    def test_discount_and_bonus_rules(self):
+        line, plain = price_cart(
+            self.by_id.pk,
+            [{"product": self.listed.pk, "quantity": 25}, {"product": self.plain.pk, "quantity": 25}],
+        )
+        self.assertEqual((line["amount"], line["net_amount"], line["bonus"]), (225, Decimal("202.50"), 2))
+        self.assertEqual((plain["amount"], plain["net_amount"], plain["bonus"]), (250, 250, 0))
+
+    def test_explicit_prices_are_kept(self):
+        priced = {"product": self.listed, "quantity": 2, "rate": Decimal("7"), "amount": 14, "net_amount": 14}
+        self.assertEqual(apply_prices(self.by_id, [dict(priced)]), [priced])
+
+    def test_rate_only_lines_get_their_amounts(self):
+        sale, order = (
+            apply_prices(self.by_id, [{"product": self.listed, "quantity": 3, **rate}], fields)[0]
+            for rate, fields in (
+                ({"rate": Decimal("7"), "discount1": Decimal("50")}, SALE_ITEM_FIELDS),
+                ({"price": Decimal("7")}, ORDER_ITEM_FIELDS),
+            )
+        )
+        self.assertEqual((sale["rate"], sale["amount"], sale["net_amount"]), (7, 21, Decimal("10.50")))
+        self.assertNotIn("bonus", sale)
+        self.assertEqual((order["price"], order["amount"]), (7, 21))
+
+    def test_cached_prices_expire_without_a_shared_cache(self):
+        resolve_prices([(self.by_id.pk, self.listed.pk)])
+        # another worker's edit: its version bump never reaches a per-process cache
+        PriceListItem.objects.filter(pk=self.item.pk).update(custom_price=8)
+        with mock.patch.object(pricing._version, "ttl", 0):
+            rules = resolve_prices([(self.by_id.pk, self.listed.pk)])
+        self.assertEqual(rules[(self.by_id.pk, self.listed.pk)].rate, 8)
+
+    def test_price_list_edit_invalidates_after_commit(self):
+        resolve_prices([(self.by_id.pk, self.listed.pk)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.custom_price = 8
+            self.item.save()
+        self.assertEqual(resolve_prices([(self.by_id.pk, self.listed.pk)])[(self.by_id.pk, self.listed.pk)].rate, 8)
+
+
+@override_settings(ROOT_URLCONF="erp.urls")
+class PurchaseAdminStockTests(TestCase):
+    def setUp(self):
+        data = setup_basic_entities()
+        self.warehouse = data["warehouse"]
+        self.product = data["product"]
+        self.supplier = Party.objects.create(name="Supp", address="a", phone="1", party_type="supplier")
+        Batch.objects.create(
+            product=self.product,
+            batch_number="B1",
+            expiry_date=date.today() + timedelta(days=30),
+            purchase_price=5,
+            sale_price=10,
+            quantity=5,
+            warehouse=self.warehouse,
+        )
+        rebuild_stock_balances()
+        self.client.force_login(User.objects.create_superuser("staff@example.com", "pass"))
+
+    def _item(self, index, batch_number, quantity):
+        return {
+            f"items-{index}-product": self.product.pk,
+            f"items-{index}-batch_number": batch_number,
+            f"items-{index}-expiry_date": (date.today() + timedelta(days=90)).isoformat(),
+            f"items-{index}-quantity": quantity,
+            f"items-{index}-purchase_price": "5",
+            f"items-{index}-sale_price": "10",
+            f"items-{index}-amount": str(5 * quantity),
+        }
+
+    def test_received_purchase_updates_stock_balance(self):
+        response = self.client.post(
+            "/admin/purchase/purchaseinvoice/add/",
+            {
+                "invoice_no": "PI-1",
+                "date": date.today().isoformat(),
+                "supplier": self.supplier.pk,
+                "warehouse": self.warehouse.pk,
+                "total_amount": "35",
+                "discount": "0",
+                "tax": "0",
+                "grand_total": "35",
+                "payment_method": "Credit",
+                "paid_amount": "0",
+                "status": "Pending",
+                "items-TOTAL_FORMS": "2",
+                "items-INITIAL_FORMS": "0",
+                "items-MIN_NUM_FORMS": "0",
+                "items-MAX_NUM_FORMS": "1000",
+                **self._item(0, "B1", 3),
+                **self._item(1, "B2", 4),
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        balance = StockBalance.objects.get(product=self.product, warehouse=self.warehouse)
+        self.assertEqual(balance.quantity, 12)
+        self.assertEqual(stock_balance_drift(), [])
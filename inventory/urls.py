@@ -8,5 +8,7 @@ urlpatterns = [
     path('price-lists/<int:pk>/', views.price_list_detail, name='price_list_detail'),
     path('levels/', views.inventory_levels, name='inventory_levels'),
     path('products/', views.product_list, name='product_list'),
+    path('products/by-barcode/<str:code>/', views.product_by_barcode, name='product_by_barcode'),
     path('parties/', views.party_list, name='party_list'),
+    path('parties/over-credit-limit/', views.parties_over_credit_limit, name='parties_over_credit_limit'),
 ]
@@ -1,11 +1,15 @@
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
-from django.db.models import Sum,Q
-from .models import PriceList, Batch, Product, Party
+from django.db.models import Sum
+from .models import PriceList, Product, Party, StockBalance
+from .barcodes import lookup_barcode
 from .mypagination import MyCustomPagination
+from .search import search_parties, search_products
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from utils.credit import customers_over_limit
+from utils.streaming import StreamedArray, StreamingJSONResponse
 
 
 @api_view(["GET"])
@@ -33,27 +37,27 @@ def price_list_detail(request, pk):
 def inventory_levels(request):
     """Return aggregated stock levels per product."""
     levels = (
-        Batch.objects.values("product__id", "product__name")
+        StockBalance.objects.values("product__id", "product__name")
         .annotate(total_stock=Sum("quantity"))
         .order_by("product__id")
     )
-    data = [
-        {
+    data = StreamedArray(
+        levels,
+        lambda item: {
             "product": {"id": item["product__id"], "name": item["product__name"]},
             "totalStock": item["total_stock"] or 0,
-        }
-        for item in levels
-    ]
-    return Response({"levels": data})
+        },
+    )
+    return StreamingJSONResponse({"levels": data})
 
 
 @api_view(["GET"])
 def product_list(request):
     """Return all products with camelCase keys."""
     q = (request.GET.get("q") or "").strip()
-    qs = (Product.objects.order_by("name"))
+    qs = Product.objects.order_by("name").prefetch_related("stock_balances")
     if q:
-        qs = qs.filter(Q(name__icontains=q) | Q(barcode__icontains=q))
+        qs = search_products(q, qs)
 
     paginator = MyCustomPagination()
     page = paginator.paginate_queryset(qs, request)
@@ -72,6 +76,27 @@ def product_list(request):
     return paginator.get_paginated_response(data)
 
 
+@api_view(["GET"])
+def product_by_barcode(request, code):
+    """
+    Scan lookup: price, tax ratios, stock and price-list price in one payload.
+    Query params: warehouseId, priceListId or partyId (uses the party's price list).
+    """
+    def int_param(name):
+        value = (request.GET.get(name) or "").strip()
+        return int(value) if value.isdigit() else None
+
+    data = lookup_barcode(
+        code,
+        warehouse_id=int_param("warehouseId"),
+        price_list_id=int_param("priceListId"),
+        party_id=int_param("partyId"),
+    )
+    if data is None:
+        return Response({"detail": "No product with this barcode."}, status=404)
+    return Response(data)
+
+
 @api_view(["GET"])
 def party_list(request):
     """
@@ -100,11 +125,7 @@ def party_list(request):
         qs = qs.filter(area_id=area_id)
 
     if q:
-        qs = qs.filter(
-            Q(name__icontains=q) |
-            Q(phone__icontains=q) |
-            Q(proprietor__icontains=q)
-        )
+        qs = search_parties(q, qs)
 
     paginator = MyCustomPagination()
     page = paginator.paginate_queryset(qs, request)
@@ -132,3 +153,36 @@ def party_list(request):
     ]
 
     return paginator.get_paginated_response(data)
+
+
+@api_view(["GET"])
+def parties_over_credit_limit(request):
+    """
+    Customers whose outstanding balance is above their credit limit, worst first.
+    Query params: cityId, areaId, plus MyCustomPagination's limit/offset.
+    """
+    city_id = (request.GET.get("cityId") or "").strip()
+    area_id = (request.GET.get("areaId") or "").strip()
+
+    qs = Party.objects.all()
+    if city_id:
+        qs = qs.filter(city_id=city_id)
+    if area_id:
+        qs = qs.filter(area_id=area_id)
+
+    paginator = MyCustomPagination()
+    page = paginator.paginate_queryset(customers_over_limit(qs), request)
+    data = [
+        {
+            "id": p.id,
+            "name": p.name,
+            "phone": p.phone,
+            "cityId": p.city_id,
+            "areaId": p.area_id,
+            "creditLimit": float(p.credit_limit),
+            "currentBalance": float(p.current_balance),
+            "overLimit": float(p.over_limit),
+        }
+        for p in page
+    ]
+    return paginator.get_paginated_response(data)
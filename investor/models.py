@@ -1,7 +1,7 @@
 from django.db import models
 
 from django_ledger.models import AccountModel
-from utils.ledger import post_simple_entry
+from utils.ledger import ledger_poster, post_simple_entry
 
 
 class InvestorTransaction(models.Model):
@@ -37,6 +37,13 @@ class InvestorTransaction(models.Model):
         "profit": {"debit": "PROFIT", "credit": None},
     }
 
+    @staticmethod
+    def _account(code):
+        account = ledger_poster.get_account(code)
+        if account is None:
+            raise AccountModel.DoesNotExist(f"No account with code {code!r}")
+        return account
+
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         super().save(*args, **kwargs)
@@ -49,12 +56,12 @@ class InvestorTransaction(models.Model):
             debit_account = (
                 self.investor.chart_of_account
                 if mapping["debit"] is None
-                else AccountModel.objects.get(code=mapping["debit"])
+                else self._account(mapping["debit"])
             )
             credit_account = (
                 self.investor.chart_of_account
                 if mapping["credit"] is None
-                else AccountModel.objects.get(code=mapping["credit"])
+                else self._account(mapping["credit"])
             )
 
             post_simple_entry(
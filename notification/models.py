@@ -11,3 +11,8 @@ class Notification(models.Model):
 
     def __str__(self):
         return self.title
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="notification_created_id_idx"),
+        ]
@@ -1,4 +1,5 @@
 from rest_framework import viewsets
+from utils.pagination import KeysetOptInPagination
 from .models import Notification
 from .serializers import NotificationSerializer
 
@@ -6,3 +7,5 @@ from .serializers import NotificationSerializer
 class NotificationViewSet(viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
+    pagination_class = KeysetOptInPagination
+    keyset_ordering = ("-created_at", "-id")
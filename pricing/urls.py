@@ -1,8 +1,11 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import PriceListViewSet, PriceListItemViewSet
+from .views import PriceListViewSet, PriceListItemViewSet, resolve_cart_prices
 
 router = DefaultRouter()
 router.register(r'pricelists', PriceListViewSet)
 router.register(r'pricelist-items', PriceListItemViewSet)
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path('prices/resolve/', resolve_cart_prices, name='resolve_cart_prices'),
+]
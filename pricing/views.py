@@ -1,6 +1,9 @@
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
 
 from inventory.models import PriceList, PriceListItem
+from inventory.pricing import price_cart
 
 
 from .serializers import PriceListSerializer, PriceListItemSerializer
@@ -14,3 +17,22 @@ class PriceListViewSet(viewsets.ModelViewSet):
 class PriceListItemViewSet(viewsets.ModelViewSet):
     queryset = PriceListItem.objects.all()
     serializer_class = PriceListItemSerializer
+
+
+@api_view(["POST"])
+def resolve_cart_prices(request):
+    """
+    Price a cart for one customer.
+    Body: {"customer": id, "items": [{"product": id, "quantity": n}, ...]}
+    """
+    customer = request.data.get("customer")
+    items = request.data.get("items") or []
+    try:
+        items = [{"product": int(i["product"]), "quantity": int(i.get("quantity") or 1)} for i in items]
+        lines = price_cart(int(customer), items)
+    except (KeyError, TypeError, ValueError):
+        return Response(
+            {"detail": "customer and items[].product must be existing ids."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response({"customer": int(customer), "items": lines})
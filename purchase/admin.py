@@ -1,8 +1,7 @@
 from django.contrib import admin
 from django import forms
 from django.http import HttpResponse
-from django.template.loader import render_to_string
-from xhtml2pdf import pisa
+from utils.pdf import get_invoice_pdf, merge_invoice_pdfs, schedule_prerender
 from django.db import transaction
 from .models import (
     PurchaseInvoice,
@@ -12,6 +11,7 @@ from .models import (
     InvestorTransaction,
 )
 from inventory.models import Batch, StockMovement
+from utils.stock import apply_balance_deltas
 
 class PurchaseInvoiceItemForm(forms.ModelForm):
     class Meta:
@@ -57,14 +57,8 @@ class PurchaseInvoiceItemInline(admin.TabularInline):
 # --- PDF Helper ---
 
 def generate_pdf_invoice(invoice):
-    context = {
-        'invoice': invoice,
-        'items': invoice.items.all() if hasattr(invoice, 'items') else [],
-        'invoice_type': invoice.__class__.__name__,
-    }
-    html = render_to_string("invoices/pdf_invoice.html", context)
-    response = HttpResponse(content_type='application/pdf')
-    pisa.CreatePDF(html, dest=response)
+    response = HttpResponse(get_invoice_pdf(invoice), content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="{invoice}.pdf"'
     return response
 
 
@@ -73,7 +67,10 @@ def generate_pdf_invoice(invoice):
 def print_invoice_pdf(modeladmin, request, queryset):
     if queryset.count() == 1:
         return generate_pdf_invoice(queryset.first())
-    return HttpResponse("Please select only one invoice to print.")
+    # Several invoices (e.g. a delivery route): one merged PDF, in list order.
+    response = HttpResponse(merge_invoice_pdfs(queryset.order_by('pk')), content_type='application/pdf')
+    response['Content-Disposition'] = 'inline; filename="invoices.pdf"'
+    return response
 
 
 print_invoice_pdf.short_description = "Print Invoice PDF"
@@ -115,6 +112,7 @@ class PurchaseInvoiceAdmin(admin.ModelAdmin):
             item.save()
 
         # Now batches + stock movements
+        deltas = {}
         for item in instances:
             # Find or create the batch in the current warehouse
             batch, created = Batch.objects.get_or_create(
@@ -137,6 +135,8 @@ class PurchaseInvoiceAdmin(admin.ModelAdmin):
             # Increase stock by received qty
             batch.quantity = (batch.quantity or 0) + (item.quantity or 0)
             batch.save()
+            key = (batch.product_id, batch.warehouse_id)
+            deltas[key] = deltas.get(key, 0) + (item.quantity or 0)
 
             # Log stock movement (IN)
             StockMovement.objects.create(
@@ -148,8 +148,11 @@ class PurchaseInvoiceAdmin(admin.ModelAdmin):
                 ref_id=invoice.pk,
             )
 
+        apply_balance_deltas(deltas)
+
         # DRF/Model layer auto‑ledger logic runs on invoice.save()
         formset.save_m2m()  # finish
+        schedule_prerender(invoice)
 
 class PurchaseReturnItemInline(admin.TabularInline):
     model = PurchaseReturnItem
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PurchaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'purchase'
+
+    def ready(self):
+        from utils.pdf import connect_prerender
+
+        connect_prerender(self.get_model('PurchaseInvoice'))
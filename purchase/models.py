@@ -1,19 +1,18 @@
 from django.db import models
 from inventory.models import Product, Party
 from setting.models import Warehouse
-from utils.stock import stock_in, stock_out
-from finance.models import PaymentTerm, PaymentSchedule
-from datetime import timedelta, datetime, time
+from utils.balances import adjust_party_balance
+from utils.schedules import create_payment_schedules
+from utils.stock import stock_in, allocate_stock
+from finance.models import PaymentTerm
 from setting.constants import TAX_RECEIVABLE_ACCOUNT_CODE
 from decimal import Decimal
 from django.db import transaction
-from django.utils import timezone
 from django_ledger.models import (
-    AccountModel,
     JournalEntryModel,
     TransactionModel,
 )
-from utils.ledger import get_or_create_default_ledger
+from utils.ledger import create_journal_entry, ledger_poster
 
 
 
@@ -58,88 +57,78 @@ class PurchaseInvoice(models.Model):
                     purchase_price=item.purchase_price,
                     sale_price=item.sale_price,
                     reason=f"Purchase Invoice {self.invoice_no}",
+                    warehouse=self.warehouse,
                 )
 
             # 2) Supplier balance increases by outstanding only
             outstanding = Decimal(self.grand_total) - Decimal(self.paid_amount or 0)
             if outstanding:
-                self.supplier.current_balance = (self.supplier.current_balance or 0) + outstanding
-                self.supplier.save(update_fields=["current_balance"])
+                adjust_party_balance(self.supplier, outstanding)
 
-            # 3) Optional: build payment schedule from payment_term (kept from your code)
-            if self.payment_term:
-                installment_amount = outstanding / (self.payment_term.installments or 1)
-                for i in range(self.payment_term.installments):
-                    due_date = self.date + timedelta(days=self.payment_term.interval_days * (i + 1))
-                    PaymentSchedule.objects.create(
-                        term=self.payment_term,
-                        purchase_invoice=self,
-                        due_date=due_date,
-                        amount=installment_amount,
-                    )
+            # 3) Optional: build payment schedule from payment_term
+            create_payment_schedules([(self, outstanding)], "purchase_invoice")
 
         # 4) Create ledger journal entry once
         if not self.journal_entry:
-            ledger = get_or_create_default_ledger()
-            if ledger:
-                ts = timezone.make_aware(datetime.combine(self.date, time.min))
-                je = JournalEntryModel.objects.create(
-                    ledger=ledger,
-                    timestamp=ts,
-                    description=f"Purchase Invoice {self.invoice_no}",
+            tax_account = None
+            if self.tax:
+                tax_account = ledger_poster.get_account(TAX_RECEIVABLE_ACCOUNT_CODE)
+            txs = self.journal_transactions(tax_account)
+            if txs:
+                je = create_journal_entry(
+                    self.date,
+                    f"Purchase Invoice {self.invoice_no}",
+                    txs,
                 )
-                txs = []
-                purchase_account = self.warehouse.default_purchase_account
-                if purchase_account:
-                    txs.append(
-                        TransactionModel(
-                            journal_entry=je,
-                            account=purchase_account,
-                            tx_type=TransactionModel.DEBIT,
-                            amount=Decimal(self.total_amount) - Decimal(self.discount or 0),
-                            description="Purchase",
-                        )
-                    )
-                if self.tax:
-                    tax_account = AccountModel.objects.filter(code=TAX_RECEIVABLE_ACCOUNT_CODE).first()
-                    if tax_account:
-                        txs.append(
-                            TransactionModel(
-                                journal_entry=je,
-                                account=tax_account,
-                                tx_type=TransactionModel.DEBIT,
-                                amount=Decimal(self.tax),
-                                description="Tax",
-                            )
-                        )
-                outstanding = Decimal(self.grand_total) - Decimal(self.paid_amount or 0)
-                if outstanding and self.supplier.chart_of_account:
-                    txs.append(
-                        TransactionModel(
-                            journal_entry=je,
-                            account=self.supplier.chart_of_account,
-                            tx_type=TransactionModel.CREDIT,
-                            amount=outstanding,
-                            description="Supplier Payable",
-                        )
-                    )
-                if Decimal(self.paid_amount or 0) > 0:
-                    cash_or_bank = self.warehouse.default_cash_account or self.warehouse.default_bank_account
-                    if cash_or_bank:
-                        txs.append(
-                            TransactionModel(
-                                journal_entry=je,
-                                account=cash_or_bank,
-                                tx_type=TransactionModel.CREDIT,
-                                amount=Decimal(self.paid_amount),
-                                description="Payment",
-                            )
-                        )
-                if txs:
-                    TransactionModel.objects.bulk_create(txs)
+                if je:
                     self.journal_entry = je
                     super().save(update_fields=["journal_entry"])
 
+    def journal_transactions(self, tax_account=None):
+        """Debit/credit lines for this invoice, in ``utils.ledger`` format."""
+        txs = []
+        purchase_account = self.warehouse.default_purchase_account
+        if purchase_account:
+            txs.append(
+                {
+                    "account": purchase_account,
+                    "type": TransactionModel.DEBIT,
+                    "amount": Decimal(self.total_amount) - Decimal(self.discount or 0),
+                    "description": "Purchase",
+                }
+            )
+        if self.tax and tax_account:
+            txs.append(
+                {
+                    "account": tax_account,
+                    "type": TransactionModel.DEBIT,
+                    "amount": Decimal(self.tax),
+                    "description": "Tax",
+                }
+            )
+        outstanding = Decimal(self.grand_total) - Decimal(self.paid_amount or 0)
+        if outstanding and self.supplier.chart_of_account:
+            txs.append(
+                {
+                    "account": self.supplier.chart_of_account,
+                    "type": TransactionModel.CREDIT,
+                    "amount": outstanding,
+                    "description": "Supplier Payable",
+                }
+            )
+        if Decimal(self.paid_amount or 0) > 0:
+            cash_or_bank = self.warehouse.default_cash_account or self.warehouse.default_bank_account
+            if cash_or_bank:
+                txs.append(
+                    {
+                        "account": cash_or_bank,
+                        "type": TransactionModel.CREDIT,
+                        "amount": Decimal(self.paid_amount),
+                        "description": "Payment",
+                    }
+                )
+        return txs
+
 
 class PurchaseInvoiceItem(models.Model):
     invoice = models.ForeignKey(
@@ -177,82 +166,70 @@ class PurchaseReturn(models.Model):
 
         # 1) Stock out (we are sending goods back to supplier)
         if is_new and self.items.exists():
-            for item in self.items.all():
-                stock_out(
-                    product=item.product,
-                    quantity=item.quantity,
-                    reason=f"Purchase Return {self.return_no}",
-                )
+            allocate_stock(
+                [(item.product, item.quantity) for item in self.items.select_related("product")],
+                reason=f"Purchase Return {self.return_no}",
+                warehouse=self.warehouse,
+                ref_model="PurchaseReturn",
+                ref_id=self.pk,
+            )
 
         # 2) Ledger journal entry
         if not self.journal_entry:
             refund_now = self.payment_method == "Cash"
-            ledger = get_or_create_default_ledger()
-            if ledger:
-                ts = timezone.make_aware(datetime.combine(self.date, time.min))
-                je = JournalEntryModel.objects.create(
-                    ledger=ledger,
-                    timestamp=ts,
-                    description=f"Purchase Return {self.return_no}",
+            txs = []
+            purchase_account = getattr(self.warehouse, "default_purchase_return_account", None) or self.warehouse.default_purchase_account
+            if purchase_account:
+                txs.append(
+                    {
+                        "account": purchase_account,
+                        "type": TransactionModel.CREDIT,
+                        "amount": Decimal(self.total_amount),
+                        "description": "Purchase Return",
+                    }
                 )
-                txs = []
-                purchase_account = getattr(self.warehouse, "default_purchase_return_account", None) or self.warehouse.default_purchase_account
-                if purchase_account:
+            tax_amt = Decimal(getattr(self, "tax", 0) or 0)
+            if tax_amt:
+                tax_account = ledger_poster.get_account(TAX_RECEIVABLE_ACCOUNT_CODE)
+                if tax_account:
                     txs.append(
-                        TransactionModel(
-                            journal_entry=je,
-                            account=purchase_account,
-                            tx_type=TransactionModel.CREDIT,
-                            amount=Decimal(self.total_amount),
-                            description="Purchase Return",
-                        )
+                        {
+                            "account": tax_account,
+                            "type": TransactionModel.CREDIT,
+                            "amount": tax_amt,
+                            "description": "Tax Reversal",
+                        }
                     )
-                tax_amt = Decimal(getattr(self, "tax", 0) or 0)
-                if tax_amt:
-                    tax_account = AccountModel.objects.filter(code=TAX_RECEIVABLE_ACCOUNT_CODE).first()
-                    if tax_account:
-                        txs.append(
-                            TransactionModel(
-                                journal_entry=je,
-                                account=tax_account,
-                                tx_type=TransactionModel.CREDIT,
-                                amount=tax_amt,
-                                description="Tax Reversal",
-                            )
-                        )
-                amount_total = Decimal(self.total_amount) + tax_amt
-                if refund_now:
-                    cash_or_bank = _cash_or_bank_for(self.warehouse)
-                    if cash_or_bank:
-                        txs.append(
-                            TransactionModel(
-                                journal_entry=je,
-                                account=cash_or_bank,
-                                tx_type=TransactionModel.DEBIT,
-                                amount=amount_total,
-                                description="Cash Refund",
-                            )
-                        )
-                else:
-                    if self.supplier.chart_of_account:
-                        txs.append(
-                            TransactionModel(
-                                journal_entry=je,
-                                account=self.supplier.chart_of_account,
-                                tx_type=TransactionModel.DEBIT,
-                                amount=amount_total,
-                                description="Supplier Payable Reversal",
-                            )
-                        )
-                if txs:
-                    TransactionModel.objects.bulk_create(txs)
+            amount_total = Decimal(self.total_amount) + tax_amt
+            if refund_now:
+                cash_or_bank = _cash_or_bank_for(self.warehouse)
+                if cash_or_bank:
+                    txs.append(
+                        {
+                            "account": cash_or_bank,
+                            "type": TransactionModel.DEBIT,
+                            "amount": amount_total,
+                            "description": "Cash Refund",
+                        }
+                    )
+            elif self.supplier.chart_of_account:
+                txs.append(
+                    {
+                        "account": self.supplier.chart_of_account,
+                        "type": TransactionModel.DEBIT,
+                        "amount": amount_total,
+                        "description": "Supplier Payable Reversal",
+                    }
+                )
+            if txs:
+                je = create_journal_entry(self.date, f"Purchase Return {self.return_no}", txs)
+                if je:
                     self.journal_entry = je
                     super().save(update_fields=["journal_entry"])
 
             # 3) Supplier balance adjustment for credit notes
             if not refund_now:
-                self.supplier.current_balance = (self.supplier.current_balance or 0) - Decimal(self.total_amount)
-                self.supplier.save(update_fields=["current_balance"])
+                adjust_party_balance(self.supplier, -Decimal(self.total_amount))
         
 
 class PurchaseReturnItem(models.Model):
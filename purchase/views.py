@@ -5,6 +5,8 @@ from django.db.models import Q
 from django.shortcuts import get_object_or_404
 
 from utils.notifications import notify_user_and_party
+from utils.invoice_import import import_from_request
+from utils.pdf import schedule_prerender
 
 from .models import PurchaseInvoice, PurchaseReturn, InvestorTransaction
 from .serializers import (
@@ -43,6 +45,7 @@ class PurchaseInvoiceViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         invoice = serializer.save()
+        schedule_prerender(invoice)
         notify_user_and_party(
             user=self.request.user,
             party=invoice.supplier,
@@ -50,6 +53,12 @@ class PurchaseInvoiceViewSet(viewsets.ModelViewSet):
             message=f"Purchase invoice {invoice.invoice_no} created.",
         )
 
+    @action(detail=False, methods=["post"], url_path="bulk-import")
+    def bulk_import(self, request):
+        """Create many invoices at once from a JSON list or a JSON/CSV upload."""
+        summary, status_code = import_from_request(request, "purchase")
+        return Response(summary, status=status_code)
+
     @action(detail=False, methods=["get"], url_path="by-number/(?P<invoice_no>[^/.]+)")
     def retrieve_by_number(self, request, invoice_no=None):
         """Retrieve a purchase invoice using its invoice_no."""
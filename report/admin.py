@@ -1,8 +1,17 @@
 from django.contrib import admin
-from .models import ReportLog
+from .models import AccountBalanceSnapshot, BalanceSnapshotCheckpoint, ReportLog
 
 @admin.register(ReportLog)
 class ReportLogAdmin(admin.ModelAdmin):
     list_display = ['report_name', 'generated_by', 'filters_used']
 
 
+@admin.register(AccountBalanceSnapshot)
+class AccountBalanceSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['account', 'date', 'debit', 'credit']
+    list_filter = ['date']
+
+
+@admin.register(BalanceSnapshotCheckpoint)
+class BalanceSnapshotCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['through', 'created_at']
@@ -2,16 +2,73 @@
 
 These services aggregate :class:`~django_ledger.models.TransactionModel`
 balances by their related account roles for a given period.
+
+Totals are computed in the database. Days covered by the latest
+:class:`~report.models.BalanceSnapshotCheckpoint` are read from
+:class:`~report.models.AccountBalanceSnapshot` rows (one per account and
+day) and only the tail after the checkpoint is aggregated from raw
+transactions.
 """
 
 from __future__ import annotations
 
-from datetime import date
+from collections import defaultdict
+from datetime import date, timedelta
 from decimal import Decimal
-from typing import Dict
+from typing import Dict, Optional
 
+from django.db import transaction
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
 from django_ledger.models import TransactionModel
-from collections import defaultdict
+
+from .models import AccountBalanceSnapshot, BalanceSnapshotCheckpoint
+
+_ZERO = Value(Decimal("0"), output_field=DecimalField(max_digits=20, decimal_places=2))
+
+
+def debit_credit_sums(field="amount", tx_type=None, condition=None, prefix=""):
+    """Conditional ``Sum`` aggregates for debits and credits.
+
+    ``tx_type`` is the lookup holding the transaction type; snapshot rows
+    already store the two sides in separate columns. ``condition`` (a ``Q``)
+    restricts both sums, whose names then start with ``prefix``.
+    """
+    if tx_type is None:
+        return {
+            "debit": Coalesce(Sum("debit"), _ZERO),
+            "credit": Coalesce(Sum("credit"), _ZERO),
+        }
+    debit, credit = Q(**{tx_type: TransactionModel.DEBIT}), Q(**{tx_type: TransactionModel.CREDIT})
+    if condition is not None:
+        debit, credit = debit & condition, credit & condition
+    return {
+        f"{prefix}debit": Coalesce(Sum(field, filter=debit), _ZERO),
+        f"{prefix}credit": Coalesce(Sum(field, filter=credit), _ZERO),
+    }
+
+
+def _transactions(start_date: date, end_date: date):
+    return TransactionModel.objects.filter(
+        journal_entry__timestamp__date__gte=start_date,
+        journal_entry__timestamp__date__lte=end_date,
+    )
+
+
+def _add_role_totals(totals, rows):
+    # Some backends (SQLite) return aggregates without the column's scale;
+    # quantize so totals render exactly like summed ``amount`` values.
+    places = Decimal(1).scaleb(-TransactionModel._meta.get_field("amount").decimal_places)
+    for row in rows:
+        net = row["debit"] - row["credit"]
+        totals[row["account__role"]] += net.quantize(places)
+
+
+def snapshot_through() -> Optional[date]:
+    """Return the last day covered by balance snapshots, if any."""
+    checkpoint = BalanceSnapshotCheckpoint.objects.order_by("-created_at", "-id").first()
+    return checkpoint.through if checkpoint else None
 
 
 def account_type_balances(*, start_date: date, end_date: date) -> Dict[str, Decimal]:
@@ -23,21 +80,91 @@ def account_type_balances(*, start_date: date, end_date: date) -> Dict[str, Deci
     computed totals.
     """
 
-    qs = TransactionModel.objects.filter(
-        journal_entry__timestamp__date__gte=start_date,
-        journal_entry__timestamp__date__lte=end_date,
-    ).select_related("account")
-
     totals: Dict[str, Decimal] = defaultdict(Decimal)
-    for tx in qs:
-        role = tx.account.role
-        if tx.tx_type == TransactionModel.DEBIT:
-            totals[role] += tx.amount
-        else:
-            totals[role] -= tx.amount
+    tail_start = start_date
+
+    through = snapshot_through()
+    if through and through >= start_date:
+        covered_end = min(through, end_date)
+        _add_role_totals(
+            totals,
+            AccountBalanceSnapshot.objects.filter(date__gte=start_date, date__lte=covered_end)
+            .values("account__role")
+            .annotate(**debit_credit_sums())
+            .order_by(),
+        )
+        tail_start = covered_end + timedelta(days=1)
+
+    if tail_start <= end_date:
+        _add_role_totals(
+            totals,
+            _transactions(tail_start, end_date)
+            .values("account__role")
+            .annotate(**debit_credit_sums(tx_type="tx_type"))
+            .order_by(),
+        )
 
     return dict(totals)
 
 
-__all__ = ["account_type_balances"]
+def expire_snapshots(day: date) -> None:
+    """Forget snapshots from ``day`` on after a posting dated ``day`` changed.
+
+    Checkpoints covering ``day`` move back to the day before, so those days
+    are read from raw transactions until the next
+    :func:`snapshot_account_balances` run rebuilds them.
+    """
+    if BalanceSnapshotCheckpoint.objects.filter(through__gte=day).update(through=day - timedelta(days=1)):
+        AccountBalanceSnapshot.objects.filter(date__gte=day).delete()
+
+
+@transaction.atomic
+def snapshot_account_balances(*, through: Optional[date] = None, since: Optional[date] = None) -> int:
+    """(Re)build per-account daily snapshots up to ``through`` and checkpoint them.
+
+    ``through`` defaults to yesterday so the current day stays in the tail.
+    Days after the previous checkpoint are rebuilt; pass ``since`` to also
+    rebuild earlier days, e.g. after back-dated postings. Returns the number
+    of snapshot rows written.
+    """
+    through = through or timezone.localdate() - timedelta(days=1)
+    previous = snapshot_through()
+    if since is None and previous is not None:
+        since = previous + timedelta(days=1)
+
+    snapshots = AccountBalanceSnapshot.objects.filter(date__lte=through)
+    transactions = TransactionModel.objects.filter(journal_entry__timestamp__date__lte=through)
+    if since is not None:
+        snapshots = snapshots.filter(date__gte=since)
+        transactions = transactions.filter(journal_entry__timestamp__date__gte=since)
+    snapshots.delete()
+
+    rows = (
+        transactions.annotate(day=TruncDate("journal_entry__timestamp"))
+        .values("account_id", "day")
+        .annotate(**debit_credit_sums(tx_type="tx_type"))
+        .order_by()
+    )
+    created = AccountBalanceSnapshot.objects.bulk_create(
+        [
+            AccountBalanceSnapshot(
+                account_id=row["account_id"],
+                date=row["day"],
+                debit=row["debit"],
+                credit=row["credit"],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+    BalanceSnapshotCheckpoint.objects.create(through=max(through, previous or through))
+    return len(created)
+
 
+__all__ = [
+    "account_type_balances",
+    "debit_credit_sums",
+    "expire_snapshots",
+    "snapshot_account_balances",
+    "snapshot_through",
+]
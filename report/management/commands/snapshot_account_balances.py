@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from report.financial_statements import snapshot_account_balances
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot per-account daily debit/credit totals used by financial statements. "
+        "Meant to run periodically (e.g. nightly from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--through",
+            type=date.fromisoformat,
+            help="Last day to snapshot (YYYY-MM-DD). Defaults to yesterday.",
+        )
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="Rebuild from this day instead of the previous checkpoint, e.g. after back-dated postings.",
+        )
+
+    def handle(self, *args, **options):
+        count = snapshot_account_balances(through=options["through"], since=options["since"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} account balance snapshot row(s)."))
@@ -1,4 +1,5 @@
 from django.db import models
+from django_ledger.models import AccountModel
 from user.models import CustomUser
 # Create your models here.
 
@@ -8,4 +9,38 @@ class ReportLog(models.Model):
     generated_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True)
     filters_used = models.TextField()
     output_format = models.CharField(max_length=10, choices=[('pdf', 'PDF'), ('excel', 'Excel'), ('word', 'Word')])
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class AccountBalanceSnapshot(models.Model):
+    """Debit/credit totals of one account for one day.
+
+    Built by ``report.financial_statements.snapshot_account_balances`` for
+    days up to the latest :class:`BalanceSnapshotCheckpoint`; statements read
+    these rows for covered days and raw transactions for the tail.
+    """
+
+    account = models.ForeignKey(AccountModel, on_delete=models.CASCADE, related_name="balance_snapshots")
+    date = models.DateField()
+    debit = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ("account", "date")
+        indexes = [models.Index(fields=["date"], name="report_snapshot_date_idx")]
+
+    def __str__(self):
+        return f"{self.account_id} {self.date}: {self.debit} / {self.credit}"
+
+
+class BalanceSnapshotCheckpoint(models.Model):
+    """Records that snapshots are complete for every day up to ``through``."""
+
+    through = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        get_latest_by = "created_at"
+
+    def __str__(self):
+        return f"Snapshots through {self.through}"
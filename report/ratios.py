@@ -1,53 +1,216 @@
+"""Financial ratios derived from per-role ledger totals.
+
+Every ratio is computed from a single :class:`RoleTotals` instance, which is
+filled by one grouped aggregate over
+:class:`~django_ledger.models.TransactionModel`. For a period, asset,
+liability and equity roles are balances at its end, while income and
+expense roles only count the period's postings. Register new ratios with
+:func:`ratio`; they are picked up by :func:`compute_ratios` without any
+additional queries.
+"""
+
 from decimal import Decimal
-from django.db.models import Sum, F
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
 from django_ledger.models import TransactionModel
-from collections import defaultdict
 
+from utils.cache import VersionKey
+
+from .financial_statements import debit_credit_sums
+
+RATIO_CACHE_TIMEOUT = getattr(settings, "REPORT_RATIO_CACHE_TIMEOUT", 300)
+_version = VersionKey("report:ratios:version")
+
+RATIOS = {}
+#: role prefixes read as balances rather than movements over a period
+BALANCE_SHEET_ROLES = ("asset", "lia", "eq")
+
+
+class RoleTotals:
+    """Debit and credit totals per account role."""
+
+    def __init__(self, totals=None):
+        self.totals = totals or {}
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Aggregate a ``TransactionModel`` queryset in one grouped query."""
+        rows = (
+            entries.values("account__role")
+            .annotate(**debit_credit_sums(tx_type="tx_type"))
+            .order_by()
+        )
+        return cls({row["account__role"]: (row["debit"], row["credit"]) for row in rows})
+
+    @classmethod
+    def for_period(cls, entries, start_date):
+        """Like :meth:`from_entries`, counting only postings from ``start_date`` on
+        for roles outside :data:`BALANCE_SHEET_ROLES`. Still one query.
+        """
+        in_period = Q(journal_entry__timestamp__date__gte=start_date)
+        rows = (
+            entries.values("account__role")
+            .annotate(
+                **debit_credit_sums(tx_type="tx_type"),
+                **debit_credit_sums(tx_type="tx_type", condition=in_period, prefix="period_"),
+            )
+            .order_by()
+        )
+        return cls(
+            {
+                row["account__role"]: (
+                    (row["debit"], row["credit"])
+                    if row["account__role"].startswith(BALANCE_SHEET_ROLES)
+                    else (row["period_debit"], row["period_credit"])
+                )
+                for row in rows
+            }
+        )
 
-def _sum_entries(entries, role_prefix, positive="debit"):
-    """Return the summed balance for accounts with a given role prefix."""
-    total = Decimal("0")
-    for tx in entries.select_related("account"):
-        if not tx.account.role.startswith(role_prefix):
-            continue
-        if tx.tx_type == TransactionModel.DEBIT:
-            amt = tx.amount if positive == "debit" else -tx.amount
-        else:
-            amt = -tx.amount if positive == "debit" else tx.amount
-        total += amt
-    return total
+    def balance(self, role_prefix, positive="debit"):
+        """Return the summed balance for accounts with a given role prefix."""
+        total = Decimal("0")
+        for role, (debit, credit) in self.totals.items():
+            if role.startswith(role_prefix):
+                total += debit - credit
+        return total if positive == "debit" else -total
 
 
-def current_ratio(*, current_assets=None, current_liabilities=None, entries=None):
+def _ratio(numerator, denominator):
+    if not denominator:
+        return None
+    return float(numerator) / float(denominator)
+
+
+def _role_totals(entries, totals):
+    if totals is None and entries is not None:
+        totals = RoleTotals.from_entries(entries)
+    return totals
+
+
+def current_ratio(*, current_assets=None, current_liabilities=None, entries=None, totals=None):
     """Calculate the current ratio.
 
     Either ``current_assets`` and ``current_liabilities`` can be provided directly,
     or a queryset of :class:`~django_ledger.models.TransactionModel` can be supplied via
-    ``entries`` to derive the values from underlying accounting data.
+    ``entries`` (or precomputed :class:`RoleTotals` via ``totals``) to derive the
+    values from underlying accounting data.
     """
-    if entries is not None:
+    totals = _role_totals(entries, totals)
+    if totals is not None:
         if current_assets is None:
-            current_assets = _sum_entries(entries, "asset", positive="debit")
+            current_assets = totals.balance("asset", positive="debit")
         if current_liabilities is None:
-            current_liabilities = _sum_entries(entries, "lia", positive="credit")
-    if not current_liabilities:
-        return None
-    return float(current_assets) / float(current_liabilities)
+            current_liabilities = totals.balance("lia", positive="credit")
+    return _ratio(current_assets, current_liabilities)
 
 
-def gross_profit_margin(*, gross_profit=None, revenue=None, entries=None):
+def gross_profit_margin(*, gross_profit=None, revenue=None, entries=None, totals=None):
     """Calculate the gross profit margin.
 
-    Parameters can be supplied directly or derived from ``entries``. When using
-    ``entries``, all accounts whose role starts with ``inc`` are treated as
+    Parameters can be supplied directly or derived from ``entries``/``totals``.
+    When derived, all accounts whose role starts with ``inc`` are treated as
     revenue and all accounts starting with ``exp`` as cost of goods sold.
     """
-    if entries is not None:
+    totals = _role_totals(entries, totals)
+    if totals is not None:
         if revenue is None:
-            revenue = _sum_entries(entries, "inc", positive="credit")
+            revenue = totals.balance("inc", positive="credit")
         if gross_profit is None:
-            expenses = _sum_entries(entries, "exp", positive="debit")
+            expenses = totals.balance("exp", positive="debit")
             gross_profit = revenue - expenses
-    if not revenue:
+    return _ratio(gross_profit, revenue)
+
+
+def quick_ratio(*, entries=None, totals=None):
+    """Current assets excluding inventory over current liabilities.
+
+    Like the other ratios derived only from ledger data, this is ``None``
+    when neither ``entries`` nor ``totals`` is given.
+    """
+    totals = _role_totals(entries, totals)
+    if totals is None:
         return None
-    return float(gross_profit) / float(revenue)
+    liquid = totals.balance("asset_ca") - totals.balance("asset_ca_inv")
+    return _ratio(liquid, totals.balance("lia_cl", positive="credit"))
+
+
+def debt_to_equity(*, entries=None, totals=None):
+    """Total liabilities over total equity."""
+    totals = _role_totals(entries, totals)
+    if totals is None:
+        return None
+    return _ratio(totals.balance("lia", positive="credit"), totals.balance("eq", positive="credit"))
+
+
+def inventory_turnover(*, entries=None, totals=None):
+    """Cost of goods sold over the inventory balance."""
+    totals = _role_totals(entries, totals)
+    if totals is None:
+        return None
+    return _ratio(totals.balance("cogs"), totals.balance("asset_ca_inv"))
+
+
+def ratio(name):
+    """Register ``func(totals=...)`` under ``name`` in :func:`compute_ratios` output."""
+
+    def register(func):
+        RATIOS[name] = func
+        return func
+
+    return register
+
+
+ratio("currentRatio")(current_ratio)
+ratio("grossProfitMargin")(gross_profit_margin)
+ratio("quickRatio")(quick_ratio)
+ratio("debtToEquity")(debt_to_equity)
+ratio("inventoryTurnover")(inventory_turnover)
+
+
+def invalidate_ratio_cache():
+    """Make every cached ratio result stale by bumping the cache version."""
+    _version.bump()
+
+
+def compute_ratios(*, start_date=None, end_date=None, ledger=None):
+    """Return every registered ratio for a period and optional ledger.
+
+    Balance-sheet figures are taken as of ``end_date``, profit-and-loss
+    figures over ``start_date``..``end_date``. The role totals are fetched once and results are cached per
+    ``(period, ledger)`` until a posting invalidates them or
+    ``REPORT_RATIO_CACHE_TIMEOUT`` seconds pass.
+    """
+    version = _version.current()
+    ledger_key = getattr(ledger, "pk", ledger)
+    key = f"report:ratios:{version}:{ledger_key}:{start_date}:{end_date}"
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    entries = TransactionModel.objects.all()
+    if end_date:
+        entries = entries.filter(journal_entry__timestamp__date__lte=end_date)
+    if ledger_key:
+        entries = entries.filter(journal_entry__ledger_id=ledger_key)
+
+    totals = RoleTotals.for_period(entries, start_date) if start_date else RoleTotals.from_entries(entries)
+    data = {name: func(totals=totals) for name, func in RATIOS.items()}
+    cache.set(key, data, RATIO_CACHE_TIMEOUT)
+    return data
+
+
+__all__ = [
+    "RATIOS",
+    "RoleTotals",
+    "compute_ratios",
+    "current_ratio",
+    "debt_to_equity",
+    "gross_profit_margin",
+    "inventory_turnover",
+    "invalidate_ratio_cache",
+    "quick_ratio",
+    "ratio",
+]
@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django_ledger.models import JournalEntryModel, TransactionModel
+
+from utils.ledger import journal_entries_posted
+
+from .financial_statements import expire_snapshots
+from .ratios import invalidate_ratio_cache
+
+
+@receiver(journal_entries_posted)
+@receiver(post_save, sender=JournalEntryModel)
+@receiver(post_delete, sender=JournalEntryModel)
+@receiver(post_save, sender=TransactionModel)
+@receiver(post_delete, sender=TransactionModel)
+def expire_cached_ratios(sender, **kwargs):
+    """Drop cached ratios once a ledger change commits."""
+    transaction.on_commit(invalidate_ratio_cache)
+
+
+def _day(timestamp):
+    return timezone.localdate(timestamp) if timezone.is_aware(timestamp) else timestamp.date()
+
+
+@receiver(pre_save, sender=JournalEntryModel)
+def remember_entry_day(sender, instance, **kwargs):
+    """Keep the stored date of an entry being moved, which its snapshots cover."""
+    if not instance._state.adding:
+        instance._snapshot_day = (
+            JournalEntryModel.objects.filter(pk=instance.pk).values_list("timestamp", flat=True).first()
+        )
+
+
+@receiver(journal_entries_posted)
+@receiver(post_save, sender=JournalEntryModel)
+@receiver(post_delete, sender=JournalEntryModel)
+@receiver(post_save, sender=TransactionModel)
+@receiver(post_delete, sender=TransactionModel)
+def expire_balance_snapshots(sender, instance=None, entries=(), **kwargs):
+    """Drop snapshots a back-dated or edited posting made stale."""
+    if isinstance(instance, TransactionModel):
+        entries = JournalEntryModel.objects.filter(pk=instance.journal_entry_id)
+    elif instance is not None:
+        entries = [instance]
+    timestamps = [je.timestamp for je in entries]
+    timestamps += [je._snapshot_day for je in entries if getattr(je, "_snapshot_day", None)]
+    if timestamps:
+        expire_snapshots(min(_day(ts) for ts in timestamps))
@@ -0,0 +1,196 @@
+import uuid
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django_ledger.models import AccountModel, ChartOfAccountModel, LedgerModel, TransactionModel
+from rest_framework.test import APIRequestFactory
+
+from report.financial_statements import account_type_balances, snapshot_account_balances, snapshot_through
+from report.models import AccountBalanceSnapshot
+from report.ratios import (
+    RoleTotals,
+    compute_ratios,
+    current_ratio,
+    debt_to_equity,
+    inventory_turnover,
+    quick_ratio,
+)
+from report.views import financial_ratios
+from sale.tests import setup_basic_entities
+from utils.ledger import post_simple_entry
+
+
+class AccountTypeBalancesTests(TestCase):
+    def setUp(self):
+        self.data = setup_basic_entities()
+        for day, amount in ((1, "100.00"), (1, "20.50"), (2, "30.00"), (5, "7.25")):
+            post_simple_entry(
+                date=date(2026, 1, day),
+                amount=Decimal(amount),
+                narration="Sale",
+                debit_account=self.data["customer_account"],
+                credit_account=self.data["sales_account"],
+            )
+
+    def _legacy(self, start_date, end_date):
+        """Reference implementation: sum every transaction in Python."""
+        totals = defaultdict(Decimal)
+        for tx in TransactionModel.objects.filter(
+            journal_entry__timestamp__date__gte=start_date,
+            journal_entry__timestamp__date__lte=end_date,
+        ).select_related("account"):
+            sign = 1 if tx.tx_type == TransactionModel.DEBIT else -1
+            totals[tx.account.role] += sign * tx.amount
+        return {k: str(v) for k, v in totals.items()}
+
+    def _balances(self, start_date, end_date):
+        totals = account_type_balances(start_date=start_date, end_date=end_date)
+        return {k: str(v) for k, v in totals.items()}
+
+    def test_matches_per_transaction_sum(self):
+        expected = self._legacy(date(2026, 1, 1), date(2026, 1, 31))
+        self.assertEqual(expected["asset_ca_receivables"], "157.75")
+        with self.assertNumQueries(2):
+            self.assertEqual(self._balances(date(2026, 1, 1), date(2026, 1, 31)), expected)
+
+    def test_snapshots_plus_tail_give_the_same_result(self):
+        written = snapshot_account_balances(through=date(2026, 1, 2))
+        self.assertEqual(written, 4)
+        self.assertEqual(AccountBalanceSnapshot.objects.count(), 4)
+        for start, end in (
+            (date(2026, 1, 1), date(2026, 1, 31)),
+            (date(2026, 1, 2), date(2026, 1, 5)),
+            (date(2026, 1, 1), date(2026, 1, 1)),
+            (date(2026, 1, 3), date(2026, 1, 31)),
+        ):
+            self.assertEqual(self._balances(start, end), self._legacy(start, end))
+
+    def test_snapshot_rebuild_picks_up_back_dated_postings(self):
+        snapshot_account_balances(through=date(2026, 1, 5))
+        post_simple_entry(
+            date=date(2026, 1, 2),
+            amount=Decimal("1.00"),
+            narration="Late",
+            debit_account=self.data["cash_account"],
+            credit_account=self.data["customer_account"],
+        )
+        snapshot_account_balances(through=date(2026, 1, 5), since=date(2026, 1, 1))
+        period = (date(2026, 1, 1), date(2026, 1, 31))
+        self.assertEqual(self._balances(*period), self._legacy(*period))
+
+
+    def test_back_dated_posting_expires_covered_snapshots(self):
+        snapshot_account_balances(through=date(2026, 1, 5))
+        post_simple_entry(
+            date=date(2026, 1, 2),
+            amount=Decimal("1.00"),
+            narration="Late",
+            debit_account=self.data["cash_account"],
+            credit_account=self.data["customer_account"],
+        )
+        self.assertEqual(snapshot_through(), date(2026, 1, 1))
+        self.assertFalse(AccountBalanceSnapshot.objects.filter(date__gte=date(2026, 1, 2)).exists())
+        period = (date(2026, 1, 1), date(2026, 1, 31))
+        self.assertEqual(self._balances(*period), self._legacy(*period))
+
+        # the next regular run rebuilds the expired days
+        snapshot_account_balances(through=date(2026, 1, 5))
+        self.assertEqual(snapshot_through(), date(2026, 1, 5))
+        self.assertEqual(self._balances(*period), self._legacy(*period))
+
+        # moving an entry out of the covered days expires its old date too
+        je = TransactionModel.objects.filter(amount=Decimal("30.00")).first().journal_entry
+        je.timestamp = je.timestamp.replace(day=20)
+        je.save()
+        self.assertEqual(snapshot_through(), date(2026, 1, 1))
+        self.assertEqual(self._balances(*period), self._legacy(*period))
+
+
+class RatioEngineTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.data = setup_basic_entities()
+        post_simple_entry(
+            date=date(2026, 1, 1),
+            amount=Decimal("50.00"),
+            narration="Sale",
+            debit_account=self.data["customer_account"],
+            credit_account=self.data["sales_account"],
+        )
+
+    def test_all_ratios_come_from_one_query_and_are_cached(self):
+        with self.assertNumQueries(1):
+            first = compute_ratios(start_date=date(2026, 1, 1), end_date=date(2026, 1, 31))
+        self.assertIn("quickRatio", first)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                compute_ratios(start_date=date(2026, 1, 1), end_date=date(2026, 1, 31)), first
+            )
+
+    def test_balance_sheet_ratios_include_postings_before_the_period(self):
+        payable = AccountModel.add_root(
+            name="Payable",
+            code="2000",
+            role="lia_cl_acc_payable",
+            balance_type="credit",
+            coa_model=ChartOfAccountModel.objects.get(),
+        )
+        post_simple_entry(
+            date=date(2026, 1, 2),
+            amount=Decimal("100.00"),
+            narration="Loan",
+            debit_account=self.data["cash_account"],
+            credit_account=payable,
+        )
+        post_simple_entry(
+            date=date(2026, 2, 3),
+            amount=Decimal("30.00"),
+            narration="Sale",
+            debit_account=self.data["customer_account"],
+            credit_account=self.data["sales_account"],
+        )
+        with self.assertNumQueries(1):
+            ratios = compute_ratios(start_date=date(2026, 2, 1), end_date=date(2026, 2, 28))
+        # cash 100 and receivables 50 + 30, against the payable of 100
+        self.assertEqual(ratios["currentRatio"], 1.8)
+        self.assertEqual(ratios["quickRatio"], 1.8)
+
+    def test_posting_invalidates_cached_ratios(self):
+        compute_ratios()
+        post_simple_entry(
+            date=date(2026, 1, 2),
+            amount=Decimal("5.00"),
+            narration="Refund",
+            debit_account=self.data["sales_account"],
+            credit_account=self.data["cash_account"],
+        )
+        with self.assertNumQueries(1):
+            compute_ratios()
+
+    def test_ratios_from_role_totals(self):
+        totals = RoleTotals(
+            {
+                "asset_ca_cash": (Decimal("100"), Decimal("0")),
+                "asset_ca_inv": (Decimal("50"), Decimal("0")),
+                "lia_cl_acc_payable": (Decimal("0"), Decimal("75")),
+            }
+        )
+        self.assertEqual(current_ratio(totals=totals), 2.0)
+        self.assertEqual(quick_ratio(totals=totals), 100 / 75)
+
+    def test_ratios_without_inputs_are_none(self):
+        for func in (current_ratio, quick_ratio, debt_to_equity, inventory_turnover):
+            self.assertIsNone(func())
+
+    def test_ratios_view_rejects_bad_parameters(self):
+        factory = APIRequestFactory()
+        ledger = LedgerModel.objects.get()
+        for params in ({"year": "abc"}, {"start": "2026-13-01", "end": "2026-12-31"}, {"ledger": "x"}):
+            self.assertEqual(financial_ratios(factory.get("/", params)).status_code, 400)
+        self.assertEqual(financial_ratios(factory.get("/", {"ledger": str(uuid.uuid4())})).status_code, 400)
+        response = financial_ratios(factory.get("/", {"year": "2026", "ledger": str(ledger.uuid)}))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("quickRatio", response.data)
@@ -1,3 +1,4 @@
+import uuid
 from datetime import date, datetime
 
 from django.http import JsonResponse
@@ -5,8 +6,8 @@ from django.shortcuts import render
 from django.views.decorators.http import require_http_methods
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django_ledger.models import TransactionModel
-from .ratios import current_ratio, gross_profit_margin
+from django_ledger.models import LedgerModel
+from .ratios import compute_ratios
 
 from .financial_statements import account_type_balances
 
@@ -17,13 +18,49 @@ def report_dashboard(request):
     return render(request, 'report/dashboard.html')
 
 
+def _period(request):
+    """Return ``(start_date, end_date)`` from ``year`` or ``start``/``end`` params.
+
+    Raises ``ValueError`` when a given parameter is not a valid year or date.
+    """
+    year = request.GET.get("year")
+    start = request.GET.get("start")
+    end = request.GET.get("end")
+
+    try:
+        if year:
+            return date(int(year), 1, 1), date(int(year), 12, 31)
+        if start and end:
+            return datetime.fromisoformat(start).date(), datetime.fromisoformat(end).date()
+    except (OverflowError, ValueError):
+        raise ValueError("Invalid 'year', 'start' or 'end' parameter.")
+    return None, None
+
+
+def _ledger(request):
+    """Return the ``ledger`` param as a UUID, or ``None``; ``ValueError`` if unknown."""
+    ledger = request.GET.get("ledger")
+    if not ledger:
+        return None
+    try:
+        ledger = uuid.UUID(ledger)
+    except ValueError:
+        ledger = None
+    if ledger is None or not LedgerModel.objects.filter(uuid=ledger).exists():
+        raise ValueError("Unknown ledger.")
+    return ledger
+
+
 @api_view(["GET"])
 def financial_ratios(request):
-    entries = TransactionModel.objects.all()
-    data = {
-        "currentRatio": current_ratio(entries=entries),
-        "grossProfitMargin": gross_profit_margin(entries=entries),
-    }
+    """Return financial ratios, optionally for a period (``year`` or
+    ``start``/``end``) and a single ``ledger`` (UUID)."""
+    try:
+        start_date, end_date = _period(request)
+        ledger = _ledger(request)
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=400)
+    data = compute_ratios(start_date=start_date, end_date=end_date, ledger=ledger)
     return Response(data)
 
 
@@ -36,17 +73,11 @@ def financial_statement(request):
     formatted) or a ``year`` parameter representing a financial year.
     """
 
-    year = request.GET.get("year")
-    start = request.GET.get("start")
-    end = request.GET.get("end")
-
-    if year:
-        start_date = date(int(year), 1, 1)
-        end_date = date(int(year), 12, 31)
-    elif start and end:
-        start_date = datetime.fromisoformat(start).date()
-        end_date = datetime.fromisoformat(end).date()
-    else:
+    try:
+        start_date, end_date = _period(request)
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+    if start_date is None:
         return JsonResponse(
             {"detail": "Provide 'year' or both 'start' and 'end' parameters."},
             status=400,
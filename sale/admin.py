@@ -1,8 +1,7 @@
 from django.contrib import admin,messages
 from django.utils.html import format_html
 from django.http import HttpResponse
-from django.template.loader import render_to_string
-from xhtml2pdf import pisa
+from utils.pdf import get_invoice_pdf, merge_invoice_pdfs, schedule_prerender
 from inventory.models import Batch, StockMovement
 from .models import (
     SaleInvoice,
@@ -52,14 +51,8 @@ class SaleInvoiceItemInline(admin.TabularInline):
 # --- PDF Helper ---
 
 def generate_pdf_invoice(invoice):
-    context = {
-        'invoice': invoice,
-        'items': invoice.items.all() if hasattr(invoice, 'items') else [],
-        'invoice_type': invoice.__class__.__name__,
-    }
-    html = render_to_string("invoices/pdf_invoice.html", context)
-    response = HttpResponse(content_type='application/pdf')
-    pisa.CreatePDF(html, dest=response)
+    response = HttpResponse(get_invoice_pdf(invoice), content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="{invoice}.pdf"'
     return response
 
 # --- Admin Actions ---
@@ -67,7 +60,10 @@ def generate_pdf_invoice(invoice):
 def print_invoice_pdf(modeladmin, request, queryset):
     if queryset.count() == 1:
         return generate_pdf_invoice(queryset.first())
-    return HttpResponse("Please select only one invoice to print.")
+    # Several invoices (e.g. a delivery route): one merged PDF, in list order.
+    response = HttpResponse(merge_invoice_pdfs(queryset.order_by('pk')), content_type='application/pdf')
+    response['Content-Disposition'] = 'inline; filename="invoices.pdf"'
+    return response
 
 print_invoice_pdf.short_description = "Print Invoice PDF"
 
@@ -85,6 +81,12 @@ class SaleInvoiceAdmin(admin.ModelAdmin):
 
     readonly_fields = ['total_amount', 'net_amount']
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if not change:
+            form.instance.post_items()
+        schedule_prerender(form.instance)
+
 # ---------- Inline ----------
 class SaleReturnItemInline(admin.TabularInline):
     model = SaleReturnItem
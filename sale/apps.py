@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class SaleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sale'
+
+    def ready(self):
+        from utils.pdf import connect_prerender
+
+        connect_prerender(self.get_model('SaleInvoice'))
@@ -0,0 +1,60 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.invoice_import import IMPORTERS, load_invoices
+
+
+class Command(BaseCommand):
+    help = "Bulk import sale or purchase invoices from a JSON or CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSON or CSV file with the invoices to import.")
+        parser.add_argument(
+            "--type",
+            dest="kind",
+            choices=sorted(IMPORTERS),
+            default="sale",
+            help="Kind of invoices in the file (default: sale).",
+        )
+        parser.add_argument(
+            "--format",
+            dest="fmt",
+            choices=["json", "csv"],
+            help="File format; guessed from the extension when omitted.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of invoices written per transaction (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["fmt"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if fmt not in ("json", "csv"):
+            raise CommandError("Cannot guess the file format; pass --format json or --format csv.")
+        try:
+            with open(path, "rb") as fp:
+                invoices = load_invoices(fp.read(), fmt)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        importer = IMPORTERS[options["kind"]]
+        chunk_size = max(options["chunk_size"], 1)
+        created = failed = 0
+        for start in range(0, len(invoices), chunk_size):
+            for result in importer(invoices[start:start + chunk_size]):
+                if result["status"] == "created":
+                    created += 1
+                else:
+                    failed += 1
+                    self.stderr.write(
+                        f"#{start + result['index']} {result['invoice_no'] or '-'}: "
+                        f"{json.dumps(result['errors'])}"
+                    )
+
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f"Imported {created} invoice(s), {failed} failed."))
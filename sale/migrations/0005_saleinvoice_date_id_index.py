@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sale', '0004_alter_salereturnitem_net_amount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='saleinvoice',
+            index=models.Index(fields=['date', 'id'], name='sale_invoice_date_id_idx'),
+        ),
+    ]
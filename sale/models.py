@@ -2,23 +2,23 @@ from django.db import models
 
 from setting.models import Warehouse
 
-from inventory.models import Party, Product, Batch
+from inventory.models import Party, Product, Batch, StockMovement
 
 
 import logging
-from datetime import timedelta, datetime, time
 from decimal import Decimal
 
 from django.db import transaction
-from django.utils import timezone
 from django_ledger.models import (
-    AccountModel,
     JournalEntryModel,
     TransactionModel,
 )
-from utils.stock import stock_return, stock_out
-from utils.ledger import get_or_create_default_ledger
-from finance.models import PaymentTerm, PaymentSchedule
+from utils.balances import adjust_party_balance
+from utils.credit import reserve_credit
+from utils.schedules import create_payment_schedules
+from utils.stock import stock_return, allocate_stock
+from utils.ledger import create_journal_entry, ledger_poster
+from finance.models import PaymentTerm
 from setting.constants import TAX_PAYABLE_ACCOUNT_CODE
 
 logger = logging.getLogger(__name__)
@@ -82,6 +82,11 @@ class SaleInvoice(models.Model):
     payment_term = models.ForeignKey(PaymentTerm, on_delete=models.SET_NULL, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pending")
 
+    class Meta:
+        indexes = [
+            # keyset pagination on (date, id)
+            models.Index(fields=["date", "id"], name="sale_invoice_date_id_idx"),
+        ]
 
     @transaction.atomic
     def save(self, *args, **kwargs):
@@ -94,99 +99,95 @@ class SaleInvoice(models.Model):
         super().save(*args, **kwargs)
 
         if is_new:
-            # 1) Stock-out per item
-            for item in self.items.all():
-                stock_out(
-                    product=item.product,
-                    quantity=item.quantity + getattr(item, "bonus", 0),
-                    reason=f"Sale Invoice {self.invoice_no}",
-                )
+            # 1) Stock-out happens in post_items(), once the items are saved
 
-            # 2) Customer balance increases by outstanding only
+            # 2) Customer balance increases by outstanding only, within the credit limit
             outstanding = Decimal(self.grand_total) - Decimal(self.paid_amount or 0)
             if outstanding:
-                self.customer.current_balance = (self.customer.current_balance or 0) + outstanding
-                self.customer.save(update_fields=["current_balance"])
+                reserve_credit(self.customer, outstanding)
 
             # 3) Optional: payment schedule from payment_term
-            if self.payment_term:
-                installments = self.payment_term.installments or 1
-                installment_amount = outstanding / installments
-                for i in range(installments):
-                    due_date = self.date + timedelta(days=self.payment_term.interval_days * (i + 1))
-                    PaymentSchedule.objects.create(
-                        term=self.payment_term,
-                        sale_invoice=self,
-                        due_date=due_date,
-                        amount=installment_amount,
-                    )
+            create_payment_schedules([(self, outstanding)], "sale_invoice")
 
         # 4) Create journal entry once
         if not self.journal_entry:
-            ledger = get_or_create_default_ledger()
-            if ledger and self.warehouse.default_sales_account and self.customer.chart_of_account:
-                timestamp = timezone.make_aware(
-                    datetime.combine(self.date, time.min)
+            if self.warehouse.default_sales_account and self.customer.chart_of_account:
+                tax_account = None
+                if self.tax:
+                    tax_account = ledger_poster.get_account(TAX_PAYABLE_ACCOUNT_CODE)
+                je = create_journal_entry(
+                    self.date,
+                    f"Sale Invoice {self.invoice_no}",
+                    self.journal_transactions(tax_account),
                 )
-                je = JournalEntryModel.objects.create(
-                    ledger=ledger,
-                    timestamp=timestamp,
-                    description=f"Sale Invoice {self.invoice_no}",
+                if je:
+                    self.journal_entry = je
+                    super().save(update_fields=["journal_entry"])
+
+    def post_items(self):
+        """Draw stock for all items at once (FEFO, split across batches).
+
+        Every creation path calls this after saving the items. An invoice
+        whose stock was already drawn is left alone.
+        """
+        if StockMovement.objects.filter(ref_model="SaleInvoice", ref_id=self.pk, movement_type="OUT").exists():
+            return []
+        return allocate_stock(
+            [
+                (item.product, item.quantity + getattr(item, "bonus", 0))
+                for item in self.items.select_related("product").order_by("pk")
+            ],
+            reason=f"Sale Invoice {self.invoice_no}",
+            warehouse=self.warehouse,
+            ref_model="SaleInvoice",
+            ref_id=self.pk,
+        )
+
+    def journal_transactions(self, tax_account=None):
+        """Debit/credit lines for this invoice, in ``utils.ledger`` format."""
+        transactions = [
+            {
+                "account": self.customer.chart_of_account,
+                "type": TransactionModel.DEBIT,
+                "amount": self.grand_total,
+                "description": "Sale",
+            },
+            {
+                "account": self.warehouse.default_sales_account,
+                "type": TransactionModel.CREDIT,
+                "amount": self.grand_total - Decimal(self.tax or 0),
+                "description": "Revenue",
+            },
+        ]
+        if self.tax and tax_account:
+            transactions.append(
+                {
+                    "account": tax_account,
+                    "type": TransactionModel.CREDIT,
+                    "amount": self.tax,
+                    "description": "Tax payable",
+                }
+            )
+        if Decimal(self.paid_amount or 0) > 0:
+            cash_or_bank = _cash_or_bank_for(self.warehouse)
+            if cash_or_bank:
+                transactions.append(
+                    {
+                        "account": cash_or_bank,
+                        "type": TransactionModel.DEBIT,
+                        "amount": self.paid_amount,
+                        "description": "Cash received",
+                    }
                 )
-                transactions = [
-                    TransactionModel(
-                        journal_entry=je,
-                        account=self.customer.chart_of_account,
-                        tx_type=TransactionModel.DEBIT,
-                        amount=self.grand_total,
-                        description="Sale",
-                    ),
-                    TransactionModel(
-                        journal_entry=je,
-                        account=self.warehouse.default_sales_account,
-                        tx_type=TransactionModel.CREDIT,
-                        amount=self.grand_total - Decimal(self.tax or 0),
-                        description="Revenue",
-                    ),
-                ]
-                if self.tax:
-                    tax_account = AccountModel.objects.filter(
-                        code=TAX_PAYABLE_ACCOUNT_CODE
-                    ).first()
-                    if tax_account:
-                        transactions.append(
-                            TransactionModel(
-                                journal_entry=je,
-                                account=tax_account,
-                                tx_type=TransactionModel.CREDIT,
-                                amount=self.tax,
-                                description="Tax payable",
-                            )
-                        )
-                if Decimal(self.paid_amount or 0) > 0:
-                    cash_or_bank = _cash_or_bank_for(self.warehouse)
-                    if cash_or_bank:
-                        transactions.append(
-                            TransactionModel(
-                                journal_entry=je,
-                                account=cash_or_bank,
-                                tx_type=TransactionModel.DEBIT,
-                                amount=self.paid_amount,
-                                description="Cash received",
-                            )
-                        )
-                        transactions.append(
-                            TransactionModel(
-                                journal_entry=je,
-                                account=self.customer.chart_of_account,
-                                tx_type=TransactionModel.CREDIT,
-                                amount=self.paid_amount,
-                                description="Payment",
-                            )
-                        )
-                TransactionModel.objects.bulk_create(transactions)
-                self.journal_entry = je
-                super().save(update_fields=["journal_entry"])
+                transactions.append(
+                    {
+                        "account": self.customer.chart_of_account,
+                        "type": TransactionModel.CREDIT,
+                        "amount": self.paid_amount,
+                        "description": "Payment",
+                    }
+                )
+        return transactions
 
 
 
@@ -236,42 +237,29 @@ class SaleReturn(models.Model):
         # 2) Journal entry (single composite)
         if not self.journal_entry:
             refund_now = self.payment_method == "Cash"
-            ledger = get_or_create_default_ledger()
-            if ledger and self.customer.chart_of_account:
-                timestamp = timezone.make_aware(
-                    datetime.combine(self.date, time.min)
-                )
-                je = JournalEntryModel.objects.create(
-                    ledger=ledger,
-                    timestamp=timestamp,
-                    description=f"Sale Return {self.return_no}",
-                )
+            if self.customer.chart_of_account:
                 sales_return_account = getattr(
                     self.warehouse, "default_sales_return_account", None
                 ) or self.warehouse.default_sales_account
+                tax_amount = Decimal(getattr(self, "tax", 0) or 0)
                 transactions = [
-                    TransactionModel(
-                        journal_entry=je,
-                        account=sales_return_account,
-                        tx_type=TransactionModel.DEBIT,
-                        amount=self.total_amount - Decimal(getattr(self, "tax", 0) or 0),
-                        description="Sales return",
-                    )
+                    {
+                        "account": sales_return_account,
+                        "type": TransactionModel.DEBIT,
+                        "amount": self.total_amount - tax_amount,
+                        "description": "Sales return",
+                    }
                 ]
-                tax_amount = Decimal(getattr(self, "tax", 0) or 0)
                 if tax_amount:
-                    tax_account = AccountModel.objects.filter(
-                        code=TAX_PAYABLE_ACCOUNT_CODE
-                    ).first()
+                    tax_account = ledger_poster.get_account(TAX_PAYABLE_ACCOUNT_CODE)
                     if tax_account:
                         transactions.append(
-                            TransactionModel(
-                                journal_entry=je,
-                                account=tax_account,
-                                tx_type=TransactionModel.DEBIT,
-                                amount=tax_amount,
-                                description="Tax reversal",
-                            )
+                            {
+                                "account": tax_account,
+                                "type": TransactionModel.DEBIT,
+                                "amount": tax_amount,
+                                "description": "Tax reversal",
+                            }
                         )
                 target_account = (
                     _cash_or_bank_for(self.warehouse)
@@ -279,23 +267,22 @@ class SaleReturn(models.Model):
                     else self.customer.chart_of_account
                 )
                 transactions.append(
-                    TransactionModel(
-                        journal_entry=je,
-                        account=target_account,
-                        tx_type=TransactionModel.CREDIT,
-                        amount=self.total_amount,
-                        description="Refund" if refund_now else "Credit note",
-                    )
+                    {
+                        "account": target_account,
+                        "type": TransactionModel.CREDIT,
+                        "amount": self.total_amount,
+                        "description": "Refund" if refund_now else "Credit note",
+                    }
+                )
+                je = create_journal_entry(
+                    self.date, f"Sale Return {self.return_no}", transactions
                 )
-                TransactionModel.objects.bulk_create(transactions)
-                self.journal_entry = je
-                super().save(update_fields=["journal_entry"])
+                if je:
+                    self.journal_entry = je
+                    super().save(update_fields=["journal_entry"])
 
                 if not refund_now:
-                    self.customer.current_balance = (
-                        self.customer.current_balance or 0
-                    ) - Decimal(self.total_amount)
-                    self.customer.save(update_fields=["current_balance"])
+                    adjust_party_balance(self.customer, -Decimal(self.total_amount))
 
 
 class SaleReturnItem(models.Model):
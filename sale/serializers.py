@@ -1,3 +1,5 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from rest_framework import serializers
 
 from .models import (
@@ -8,6 +10,9 @@ from .models import (
     RecoveryLog,
 )
 from finance.serializers import PaymentScheduleSerializer
+from inventory.pricing import apply_prices
+from utils.credit import CreditLimitExceeded, check_credit
+from utils.pdf import schedule_prerender
 
 
 class SaleInvoiceItemSerializer(serializers.ModelSerializer):
@@ -27,6 +32,12 @@ class SaleInvoiceItemSerializer(serializers.ModelSerializer):
             "net_amount",
             "bid_amount",
         ]
+        # left out, they are filled from the customer's price list
+        extra_kwargs = {
+            "rate": {"required": False},
+            "amount": {"required": False},
+            "net_amount": {"required": False},
+        }
 
 
 class RecoveryLogSerializer(serializers.ModelSerializer):
@@ -69,11 +80,20 @@ class SaleInvoiceSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ("grand_total", "net_amount")
 
+    @transaction.atomic
     def create(self, validated_data):
-        items_data = validated_data.pop("items", [])
-        invoice = SaleInvoice.objects.create(**validated_data)
+        items_data = apply_prices(validated_data["customer"], validated_data.pop("items", []))
+        try:
+            invoice = SaleInvoice.objects.create(**validated_data)
+        except CreditLimitExceeded as exc:
+            raise serializers.ValidationError({"customer": exc.messages})
         for item in items_data:
             SaleInvoiceItem.objects.create(invoice=invoice, **item)
+        try:
+            invoice.post_items()
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({"items": exc.messages})
+        schedule_prerender(invoice)
         return invoice
 
     def validate(self, data):
@@ -86,6 +106,13 @@ class SaleInvoiceSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {"paid_amount": "Paid amount cannot exceed grand total."}
             )
+        if self.instance is None and data.get("customer") is not None:
+            # same outstanding as SaleInvoice.save, which enforces the limit atomically
+            outstanding = (data.get("total_amount") or 0) - discount + tax - paid
+            try:
+                check_credit(data["customer"], outstanding)
+            except CreditLimitExceeded as exc:
+                raise serializers.ValidationError({"customer": exc.messages})
         return data
 
 
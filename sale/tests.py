@@ -1,17 +1,31 @@
-from datetime import date
+import re
+import zipfile
+from datetime import date, timedelta
 from decimal import Decimal
+from io import BytesIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from rest_framework.test import APITestCase
+from django.core.exceptions import ValidationError
+from django.core.files.storage import InMemoryStorage
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, TestCase, override_settings
+from pypdf import PdfReader
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
 
 from django_ledger.models.entity import EntityModel
 from django_ledger.models.chart_of_accounts import ChartOfAccountModel
 from django_ledger.models.accounts import AccountModel
+from django_ledger.models.journal_entry import JournalEntryModel
 from django_ledger.models.ledger import LedgerModel
 from django_ledger.models.transactions import TransactionModel
 
-from inventory.models import Party, Product, Batch
+from finance.models import PaymentTerm
+from finance.views import PaymentScheduleViewSet
+from inventory.models import Party, Product, Batch, StockMovement
+from inventory.views import inventory_levels
 from setting.models import (
     Branch,
     Warehouse,
@@ -21,7 +35,21 @@ from setting.models import (
     City,
     Area,
 )
-from sale.models import SaleInvoice, SaleReturn, SaleReturnItem
+from sale.models import RecoveryLog, SaleInvoice, SaleInvoiceItem, SaleReturn, SaleReturnItem
+from sale.views import SaleInvoiceViewSet, add_recovery_payment, sale_invoice_detail, sale_invoice_list
+from utils.balances import reconcile_party_balances
+from utils.credit import CreditLimitExceeded, check_credit, credit_status, customers_over_limit
+from utils.invoice_import import import_purchase_invoices, import_sale_invoices, load_invoices
+from utils import pdf
+from utils.ledger import ledger_poster, post_simple_entry
+from utils.schedules import overdue_schedules, schedules_due_within, split_installments
+from utils.streaming import StreamedArray, StreamingJSONResponse
+from utils.stock import (
+    allocate_stock,
+    rebuild_stock_balances,
+    stock_balance_drift,
+    stock_return,
+)
 
 
 User = get_user_model()
@@ -261,3 +289,697 @@ class SaleBalanceTests(TestCase):
         self.customer.refresh_from_db()
         self.assertEqual(self.customer.current_balance, Decimal("70"))
 
+    def _credit_sale(self, invoice_no, customer, amount=100):
+        return SaleInvoice.objects.create(
+            invoice_no=invoice_no,
+            date=date.today(),
+            customer=customer,
+            warehouse=self.warehouse,
+            total_amount=amount,
+            discount=0,
+            tax=0,
+            paid_amount=0,
+            payment_method="Credit",
+            status="Pending",
+        )
+
+    def test_stale_instances_do_not_lose_updates(self):
+        stale = Party.objects.get(pk=self.customer.pk)
+        self._credit_sale("INV-4", self.customer, 100)
+        self._credit_sale("INV-5", stale, 40)
+        self.assertEqual(stale.current_balance, Decimal("140"))
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_balance, Decimal("140"))
+
+    def test_reconcile_restores_ledger_balance(self):
+        self._credit_sale("INV-6", self.customer, 100)
+        Party.objects.filter(pk=self.customer.pk).update(current_balance=5)
+
+        drift, skipped = reconcile_party_balances(fix=False)
+        self.assertEqual([(row["stored"], row["ledger"]) for row in drift], [(Decimal("5"), Decimal("100"))])
+        self.assertEqual(skipped, [])
+
+        reconcile_party_balances()
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_balance, Decimal("100"))
+        self.assertEqual(reconcile_party_balances(fix=False)[0], [])
+
+
+class CreditLimitTests(TestCase):
+    def setUp(self):
+        data = setup_basic_entities()
+        self.warehouse = data["warehouse"]
+        self.customer = data["customer"]
+        Party.objects.filter(pk=self.customer.pk).update(credit_limit=150)
+        self.customer.refresh_from_db()
+
+    def _credit_sale(self, invoice_no, amount, **extra):
+        return SaleInvoice.objects.create(
+            invoice_no=invoice_no,
+            date=date.today(),
+            customer=self.customer,
+            warehouse=self.warehouse,
+            total_amount=amount,
+            payment_method="Credit",
+            **extra,
+        )
+
+    def test_sale_over_limit_is_rejected(self):
+        self._credit_sale("INV-C1", 100)
+        with self.assertRaises(CreditLimitExceeded):
+            self._credit_sale("INV-C2", 60)
+        self.assertFalse(SaleInvoice.objects.filter(invoice_no="INV-C2").exists())
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_balance, Decimal("100"))
+        # paid up front, nothing is added to the exposure
+        self._credit_sale("INV-C3", 60, paid_amount=60)
+
+    def test_check_and_over_limit_query_read_the_counter(self):
+        self._credit_sale("INV-C4", 120)
+        with self.assertNumQueries(1):
+            self.assertEqual(credit_status(self.customer)["available"], Decimal("30"))
+        with self.assertRaises(CreditLimitExceeded):
+            check_credit(self.customer, 31)
+        self.assertEqual(list(customers_over_limit()), [])
+        Party.objects.filter(pk=self.customer.pk).update(credit_limit=100)
+        self.assertEqual([(p, p.over_limit) for p in customers_over_limit()], [(self.customer, Decimal("20"))])
+
+    def test_recovery_lowers_exposure_once(self):
+        term = PaymentTerm.objects.create(name="2x", installments=2, interval_days=30)
+        invoice = self._credit_sale("INV-C5", 100, payment_term=term)
+        schedule = invoice.payment_schedules.first()
+        view = PaymentScheduleViewSet.as_view({"post": "mark_paid"})
+        for _ in range(2):
+            view(APIRequestFactory().post("/"), pk=schedule.pk)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_balance, Decimal("50"))
+
+    def test_recovery_payment_frees_credit(self):
+        invoice = self._credit_sale("INV-C6", 150)
+        request = APIRequestFactory().post("/", {"amount": "100"}, format="json")
+        force_authenticate(request, User.objects.get())
+        response = add_recovery_payment(request, order_id=invoice.pk)
+        self.assertEqual(response.status_code, 200)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_balance, Decimal("50"))
+        self.assertEqual(reconcile_party_balances(fix=False), ([], []))
+        self._credit_sale("INV-C7", 100)
+
+
+class PaymentScheduleTests(TestCase):
+    def setUp(self):
+        data = setup_basic_entities()
+        self.term = PaymentTerm.objects.create(name="3x", installments=3, interval_days=7)
+        self.invoice = SaleInvoice.objects.create(
+            invoice_no="INV-S1",
+            date=date.today() - timedelta(days=10),
+            customer=data["customer"],
+            warehouse=data["warehouse"],
+            total_amount=100,
+            payment_method="Credit",
+            payment_term=self.term,
+        )
+
+    def test_residue_goes_to_last_installment(self):
+        amounts = list(self.invoice.payment_schedules.order_by("due_date").values_list("amount", flat=True))
+        self.assertEqual(amounts, [Decimal("33.33"), Decimal("33.33"), Decimal("33.34")])
+        self.assertEqual(split_installments(Decimal("-10"), 3)[-1], Decimal("-3.34"))
+
+    def test_aging_buckets(self):
+        today = date.today()
+        self.assertEqual([s.due_date for s in overdue_schedules(today)], [today - timedelta(days=3)])
+        self.assertEqual([s.due_date for s in schedules_due_within(today)], [today + timedelta(days=4)])
+
+
+class StockAllocationTests(TestCase):
+    def setUp(self):
+        data = setup_basic_entities()
+        self.customer = data["customer"]
+        self.warehouse = data["warehouse"]
+        self.product = data["product"]
+        today = date.today()
+        for number, qty, days in (("LATE", 300, 90), ("EARLY", 100, 10), ("MID", 200, 30)):
+            Batch.objects.create(
+                product=self.product,
+                batch_number=number,
+                expiry_date=today + timedelta(days=days),
+                purchase_price=5,
+                sale_price=10,
+                quantity=qty,
+                warehouse=self.warehouse,
+            )
+        rebuild_stock_balances()
+
+    def test_line_is_split_across_batches_first_expiry_first(self):
+        allocations = allocate_stock(
+            [(self.product, 350)], reason="Test", warehouse=self.warehouse
+        )
+        self.assertEqual(
+            [(a["batch"].batch_number, a["quantity"]) for a in allocations],
+            [("EARLY", 100), ("MID", 200), ("LATE", 50)],
+        )
+        self.assertEqual(Batch.objects.get(batch_number="EARLY").quantity, 0)
+        self.assertEqual(Batch.objects.get(batch_number="MID").quantity, 0)
+        self.assertEqual(Batch.objects.get(batch_number="LATE").quantity, 250)
+        self.assertEqual(StockMovement.objects.filter(movement_type="OUT").count(), 3)
+
+    def test_insufficient_stock_leaves_batches_untouched(self):
+        with self.assertRaises(ValidationError):
+            allocate_stock([(self.product, 601)], reason="Test", warehouse=self.warehouse)
+        self.assertEqual(sum(Batch.objects.values_list("quantity", flat=True)), 600)
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_query_count_does_not_grow_with_lines(self):
+        with CaptureQueriesContext(connection) as few:
+            allocate_stock([(self.product, 1)] * 2, reason="Test", warehouse=self.warehouse)
+        with CaptureQueriesContext(connection) as many:
+            allocate_stock([(self.product, 1)] * 60, reason="Test", warehouse=self.warehouse)
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(Batch.objects.get(batch_number="EARLY").quantity, 38)
+
+    def test_stock_balance_follows_postings(self):
+        self.assertEqual(self.product.stock, 600)
+        allocate_stock([(self.product, 150)], reason="Test", warehouse=self.warehouse)
+        stock_return(self.product, 20, "EARLY", reason="Test")
+        self.assertEqual(self.product.stock, 470)
+        self.assertEqual(stock_balance_drift(), [])
+
+    def _post_invoice(self, invoice_no, quantity, **item):
+        request = APIRequestFactory().post(
+            "/",
+            {
+                "invoice_no": invoice_no,
+                "date": date.today().isoformat(),
+                "customer": self.customer.pk,
+                "warehouse": self.warehouse.pk,
+                "total_amount": "10.00",
+                "payment_method": "Credit",
+                "items": [{"product": self.product.pk, "quantity": quantity, "bonus": 5, **item}],
+            },
+            format="json",
+        )
+        force_authenticate(request, User.objects.get())
+        return SaleInvoiceViewSet.as_view({"post": "create"})(request)
+
+    def test_api_invoice_draws_stock_after_items_are_saved(self):
+        response = self._post_invoice("API-1", 145)
+        self.assertEqual(response.status_code, 201, response.data)
+        invoice = SaleInvoice.objects.get(invoice_no="API-1")
+        movements = StockMovement.objects.filter(ref_model="SaleInvoice", ref_id=invoice.pk, movement_type="OUT")
+        self.assertEqual(sorted(movements.values_list("quantity", flat=True)), [50, 100])
+        self.assertEqual(self.product.stock, 450)
+        invoice.post_items()  # already drawn
+        self.assertEqual(self.product.stock, 450)
+
+        response = self._post_invoice("API-2", 500)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("items", response.data)
+        self.assertFalse(SaleInvoice.objects.filter(invoice_no="API-2").exists())
+        self.assertEqual(self.product.stock, 450)
+
+    def test_api_rate_only_line_gets_its_amounts(self):
+        response = self._post_invoice("API-R", 1, rate="9.00")
+        self.assertEqual(response.status_code, 201, response.data)
+        item = SaleInvoice.objects.get(invoice_no="API-R").items.get()
+        self.assertEqual((item.rate, item.amount, item.net_amount), (Decimal("9"), Decimal("9"), Decimal("9")))
+
+    def test_drift_is_reported_and_rebuilt(self):
+        Batch.objects.filter(batch_number="LATE").update(quantity=0)
+        self.assertEqual(
+            stock_balance_drift(),
+            [
+                {
+                    "product_id": self.product.pk,
+                    "warehouse_id": self.warehouse.pk,
+                    "balance": 600,
+                    "batches": 300,
+                }
+            ],
+        )
+        rebuild_stock_balances()
+        self.assertEqual(stock_balance_drift(), [])
+
+
+class SaleInvoiceImportTests(TestCase):
+    def setUp(self):
+        data = setup_basic_entities()
+        self.warehouse = data["warehouse"]
+        self.product = data["product"]
+        self.customer = data["customer"]
+        self.sales_account = data["sales_account"]
+        Batch.objects.create(
+            product=self.product,
+            batch_number="B1",
+            expiry_date=date.today() + timedelta(days=30),
+            purchase_price=5,
+            sale_price=10,
+            quantity=10,
+            warehouse=self.warehouse,
+        )
+        rebuild_stock_balances()
+
+    def _invoice(self, number, quantity, product=None):
+        return {
+            "invoice_no": number,
+            "date": date.today().isoformat(),
+            "customer": self.customer.pk,
+            "warehouse": self.warehouse.pk,
+            "payment_method": "Credit",
+            "items": [
+                {
+                    "product": product or self.product.pk,
+                    "quantity": quantity,
+                    "rate": "10",
+                    "amount": str(10 * quantity),
+                }
+            ],
+        }
+
+    def test_imported_invoices_are_prerendered_with_their_items(self):
+        rendered = []
+        executor = mock.Mock()
+        executor.submit.side_effect = lambda fn, model, pk: rendered.append(
+            (model, model.objects.get(pk=pk).items.count())
+        )
+        with mock.patch.object(pdf, "_get_executor", return_value=executor):
+            with self.captureOnCommitCallbacks(execute=True):
+                import_sale_invoices([self._invoice("IMP-P1", 2), self._invoice("IMP-P2", 1)])
+        self.assertEqual(rendered, [(SaleInvoice, 1), (SaleInvoice, 1)])
+
+    def test_import_reports_per_invoice_results(self):
+        results = import_sale_invoices(
+            [
+                self._invoice("IMP-1", 4),
+                self._invoice("IMP-2", 3),
+                self._invoice("IMP-3", 1, product=9999),
+                self._invoice("IMP-4", 5),
+            ]
+        )
+        self.assertEqual(
+            [r["status"] for r in results], ["created", "created", "error", "error"]
+        )
+        self.assertIn("items", results[2]["errors"])
+        self.assertEqual(results[3]["errors"]["items"], ["Insufficient stock for P1"])
+
+        self.assertEqual(Batch.objects.get(batch_number="B1").quantity, 3)
+        self.assertEqual(stock_balance_drift(), [])
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_balance, Decimal("70"))
+
+        invoice = SaleInvoice.objects.get(invoice_no="IMP-1")
+        self.assertEqual(invoice.items.count(), 1)
+        self.assertIsNotNone(invoice.journal_entry)
+        self.assertTrue(invoice.journal_entry.je_number)
+        self.assertTrue(
+            TransactionModel.objects.filter(
+                journal_entry=invoice.journal_entry,
+                account=self.sales_account,
+                tx_type=TransactionModel.CREDIT,
+                amount=Decimal("40"),
+            ).exists()
+        )
+
+    def test_credit_limits_and_fefo_batches(self):
+        Batch.objects.create(
+            product=self.product,
+            batch_number="B0",
+            expiry_date=date.today() + timedelta(days=5),
+            purchase_price=5,
+            sale_price=10,
+            quantity=2,
+            warehouse=self.warehouse,
+        )
+        Party.objects.filter(pk=self.customer.pk).update(credit_limit=50)
+        results = import_sale_invoices(
+            [self._invoice("CL-1", 3), self._invoice("CL-2", 3), self._invoice("CL-3", 2)],
+            check_credit_limits=True,
+        )
+        self.assertEqual([r["status"] for r in results], ["created", "error", "created"])
+        self.assertIn("Credit limit", results[1]["errors"]["customer"])
+        # the earliest expiry is drawn first and recorded on the item
+        self.assertEqual(SaleInvoice.objects.get(invoice_no="CL-1").items.get().batch.batch_number, "B0")
+        self.assertEqual(Batch.objects.get(batch_number="B0").quantity, 0)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.current_balance, Decimal("50"))
+
+    def test_bad_lines_are_reported_per_invoice(self):
+        other = Warehouse.objects.create(name="W2", branch=self.warehouse.branch)
+        foreign = Batch.objects.create(
+            product=self.product,
+            batch_number="B2",
+            expiry_date=date.today() + timedelta(days=30),
+            purchase_price=5,
+            sale_price=10,
+            quantity=5,
+            warehouse=other,
+        )
+        own = Batch.objects.get(batch_number="B1")
+        wrong_batch = self._invoice("BAD-1", 1)
+        wrong_batch["items"][0]["batch"] = foreign.pk
+        wrong_status = {**self._invoice("BAD-2", 1), "status": "Shipped"}
+        not_a_line = self._invoice("BAD-3", 1)
+        not_a_line["items"].append("oops")
+        given_batch = self._invoice("OK-1", 2)
+        given_batch["items"][0]["batch"] = own.pk
+
+        results = import_sale_invoices([wrong_batch, wrong_status, not_a_line, "oops", given_batch])
+
+        self.assertEqual([r["status"] for r in results], ["error", "error", "error", "error", "created"])
+        self.assertIn("does not belong", results[0]["errors"]["items"][0]["batch"])
+        self.assertIn("Must be one of", results[1]["errors"]["status"])
+        self.assertEqual(results[2]["errors"]["items"][0], {})
+        self.assertIn("Expected a dictionary", results[2]["errors"]["items"][1]["non_field_errors"])
+        self.assertIn("Expected a dictionary", results[3]["errors"]["non_field_errors"])
+        self.assertEqual(SaleInvoice.objects.get(invoice_no="OK-1").items.get().batch, own)
+        self.assertEqual(Batch.objects.get(pk=foreign.pk).quantity, 5)
+        self.assertEqual(Batch.objects.get(pk=own.pk).quantity, 8)
+
+    def test_given_batch_is_the_one_drawn(self):
+        Batch.objects.create(
+            product=self.product,
+            batch_number="B0",
+            expiry_date=date.today() + timedelta(days=5),
+            purchase_price=5,
+            sale_price=10,
+            quantity=5,
+            warehouse=self.warehouse,
+        )
+        rebuild_stock_balances()
+        own = Batch.objects.get(batch_number="B1")
+        pinned, too_many = self._invoice("PIN-1", 2), self._invoice("PIN-2", 9)
+        pinned["items"].append(self._invoice("PIN-1", 1)["items"][0])
+        pinned["items"][0]["batch"] = too_many["items"][0]["batch"] = own.pk
+
+        results = import_sale_invoices([pinned, too_many])
+
+        self.assertEqual([r["status"] for r in results], ["created", "error"])
+        self.assertEqual(results[1]["errors"]["items"], [f"Insufficient stock in batch {own.pk}"])
+        items = SaleInvoice.objects.get(invoice_no="PIN-1").items.order_by("pk")
+        self.assertEqual([item.batch.batch_number for item in items], ["B1", "B0"])
+        movements = StockMovement.objects.filter(ref_model="SaleInvoice", ref_id=results[0]["id"])
+        self.assertEqual(
+            sorted(movements.values_list("batch__batch_number", "quantity")), [("B0", 1), ("B1", 2)]
+        )
+        self.assertEqual(stock_balance_drift(), [])
+
+    def test_api_import_enforces_credit_limits(self):
+        Party.objects.filter(pk=self.customer.pk).update(credit_limit=30)
+        request = APIRequestFactory().post(
+            "/", [self._invoice("API-CL-1", 2), self._invoice("API-CL-2", 2)], format="json"
+        )
+        force_authenticate(request, User.objects.get())
+        response = SaleInvoiceViewSet.as_view({"post": "bulk_import"})(request)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["created", "error"])
+        self.assertIn("Credit limit", response.data["results"][1]["errors"]["customer"])
+
+    def test_overpaid_purchase_is_rejected(self):
+        supplier = Party.objects.create(name="Supp", address="a", phone="1", party_type="supplier")
+        results = import_purchase_invoices(
+            [
+                {
+                    "invoice_no": "PI-1",
+                    "date": date.today().isoformat(),
+                    "supplier": supplier.pk,
+                    "warehouse": self.warehouse.pk,
+                    "paid_amount": "60",
+                    "items": [
+                        {
+                            "product": self.product.pk,
+                            "batch_number": "PB-1",
+                            "expiry_date": (date.today() + timedelta(days=90)).isoformat(),
+                            "quantity": 10,
+                            "purchase_price": "5",
+                            "sale_price": "10",
+                            "amount": "50",
+                        }
+                    ],
+                }
+            ]
+        )
+        self.assertEqual(results[0]["errors"], {"paid_amount": "Paid amount cannot exceed grand total."})
+        self.assertFalse(Batch.objects.filter(batch_number="PB-1").exists())
+
+    def test_csv_rows_are_grouped_by_invoice(self):
+        content = (
+            "invoice_no,date,customer,warehouse,item_product,item_quantity,item_rate,item_amount\n"
+            f"CSV-1,2026-01-05,{self.customer.pk},{self.warehouse.pk},{self.product.pk},1,10,10\n"
+            f"CSV-1,2026-01-05,{self.customer.pk},{self.warehouse.pk},{self.product.pk},2,10,20\n"
+        )
+        invoices = load_invoices(content, "csv")
+        self.assertEqual(len(invoices), 1)
+        self.assertEqual(len(invoices[0]["items"]), 2)
+        results = import_sale_invoices(invoices)
+        self.assertEqual(results[0]["status"], "created")
+        self.assertEqual(SaleInvoice.objects.get(invoice_no="CSV-1").total_amount, Decimal("30"))
+
+
+class LedgerPosterTests(TestCase):
+    def setUp(self):
+        self.data = setup_basic_entities()
+
+    def _post(self, amount):
+        return post_simple_entry(
+            date=date(2026, 1, 5),
+            amount=Decimal(amount),
+            narration="Test",
+            debit_account=self.data["cash_account"],
+            credit_account=self.data["customer_account"],
+        )
+
+    def test_unit_of_work_writes_entries_in_one_batch(self):
+        self._post(1)  # warm the ledger cache and the JE sequence row
+        with CaptureQueriesContext(connection) as few:
+            with ledger_poster.unit_of_work():
+                self._post(1)
+        with CaptureQueriesContext(connection) as many:
+            with ledger_poster.unit_of_work():
+                entries = [self._post(i) for i in range(1, 21)]
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(JournalEntryModel.objects.count(), 22)
+        self.assertEqual(TransactionModel.objects.filter(journal_entry__in=entries).count(), 40)
+        numbers = set(JournalEntryModel.objects.values_list("je_number", flat=True))
+        self.assertEqual(len(numbers), 22)
+
+    def test_failed_block_discards_queued_entries(self):
+        with self.assertRaises(RuntimeError):
+            with ledger_poster.unit_of_work():
+                self._post(5)
+                raise RuntimeError
+        self.assertFalse(JournalEntryModel.objects.exists())
+
+    def test_account_cache_is_invalidated_on_save(self):
+        self.assertEqual(ledger_poster.get_account("1100"), self.data["cash_account"])
+        with self.assertNumQueries(0):
+            ledger_poster.get_account("1100")
+        self.data["cash_account"].name = "Till"
+        self.data["cash_account"].save()
+        self.assertEqual(ledger_poster.get_account("1100").name, "Till")
+
+    def test_missing_accounts_are_not_cached(self):
+        self.assertIsNone(ledger_poster.get_account("2200"))
+        with self.assertNumQueries(1):
+            self.assertIsNone(ledger_poster.get_account("2200"))
+
+    def test_other_workers_invalidate_through_the_shared_version(self):
+        ledger_poster.get_account("1100")
+        # another worker saved an account and bumped the version after commit
+        AccountModel.objects.filter(code="1100").update(name="Till")
+        ledger_poster._version.bump()
+        self.assertEqual(ledger_poster.get_account("1100").name, "Till")
+
+    def test_cached_accounts_expire_without_a_shared_cache(self):
+        ledger_poster.get_account("1100")
+        # another worker's bump never reaches a per-process cache
+        AccountModel.objects.filter(code="1100").update(name="Till")
+        with mock.patch.object(ledger_poster._version, "ttl", 0):
+            self.assertEqual(ledger_poster.get_account("1100").name, "Till")
+
+
+class StreamingJSONTests(TestCase):
+    def setUp(self):
+        self.data = setup_basic_entities()
+        Batch.objects.create(
+            product=self.data["product"],
+            batch_number="B1",
+            expiry_date=date(2027, 1, 1),
+            purchase_price=Decimal("8.50"),
+            sale_price=Decimal("10.00"),
+            quantity=5,
+            warehouse=self.data["warehouse"],
+        )
+
+    def _body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_wire_format_matches_drf_renderer(self):
+        payload = {"batches": list(Batch.objects.values()), "count": 1}
+        streamed = StreamingJSONResponse(
+            {"batches": StreamedArray(Batch.objects.values(), chunk_size=1), "count": 1}
+        )
+        self.assertEqual(self._body(streamed), JSONRenderer().render(payload))
+
+    def test_inventory_levels_streams_balances(self):
+        rebuild_stock_balances()
+        request = APIRequestFactory().get("/inventory/levels/")
+        force_authenticate(request, user=User.objects.first())
+        response = inventory_levels(request)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            self._body(response),
+            b'{"levels":[{"product":{"id":%d,"name":"P1"},"totalStock":5}]}' % self.data["product"].pk,
+        )
+
+
+class InvoicePDFCacheTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(pdf, "default_storage", InMemoryStorage())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        data = setup_basic_entities()
+        self.invoices = [
+            SaleInvoice.objects.create(
+                invoice_no=f"PDF-{i}",
+                date=date(2026, 1, 5),
+                customer=data["customer"],
+                warehouse=data["warehouse"],
+                sub_total=Decimal("10"),
+                total_amount=Decimal("10"),
+                grand_total=Decimal("10"),
+                net_amount=Decimal("10"),
+                payment_method="Cash",
+                paid_amount=Decimal("10"),
+                area_id=data["customer"].area if i == 0 else None,
+            )
+            for i in range(2)
+        ]
+
+    def test_unchanged_invoice_is_served_from_cache(self):
+        invoice = self.invoices[0]
+        with mock.patch.object(pdf, "render_pdf", wraps=pdf.render_pdf) as render:
+            first = pdf.get_invoice_pdf(invoice)
+            self.assertEqual(pdf.get_invoice_pdf(invoice), first)
+            self.assertEqual(render.call_count, 1)
+
+            invoice.invoice_no = "PDF-EDITED"
+            invoice.save(update_fields=["invoice_no"])
+            pdf.get_invoice_pdf(invoice)
+            self.assertEqual(render.call_count, 2)
+
+    def test_merged_pdf_contains_every_invoice(self):
+        pages = [len(PdfReader(BytesIO(pdf.get_invoice_pdf(i))).pages) for i in self.invoices]
+        merged = PdfReader(BytesIO(pdf.merge_invoice_pdfs(self.invoices)))
+        self.assertEqual(len(merged.pages), sum(pages))
+
+    def _export(self, **params):
+        request = APIRequestFactory().get("/invoices/export/", params)
+        force_authenticate(request, user=User.objects.first())
+        return SaleInvoiceViewSet.as_view({"get": "export"})(request)
+
+    @override_settings(INVOICE_PDF_EXPORT_PROCESSES=2, INVOICE_PDF_EXPORT_INLINE=0)
+    def test_zip_export_streams_filtered_invoices(self):
+        response = self._export(area_id=self.invoices[0].area_id_id)
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), ["PDF-0.pdf"])
+        stored = SaleInvoice.objects.get(pk=self.invoices[0].pk)
+        self.assertEqual(archive.read("PDF-0.pdf"), pdf.get_invoice_pdf(stored))
+
+    def test_small_exports_render_in_process(self):
+        with mock.patch.object(pdf, "_process_pool") as process_pool:
+            archive = zipfile.ZipFile(BytesIO(b"".join(self._export().streaming_content)))
+        self.assertEqual(len(archive.namelist()), 2)
+        process_pool.assert_not_called()
+
+    @override_settings(INVOICE_PDF_EXPORT_PROCESSES=0)
+    def test_pdf_export_merges_every_invoice(self):
+        response = self._export(output="pdf", date="2026-01-05")
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(response.streaming)
+        pages = sum(len(PdfReader(BytesIO(pdf.get_invoice_pdf(i))).pages) for i in self.invoices)
+        content = b"".join(response.streaming_content)
+        response.close()
+        self.assertEqual(len(PdfReader(BytesIO(content)).pages), pages)
+
+    def test_export_rejects_empty_and_oversized_selections(self):
+        self.assertEqual(self._export(date="2020-01-01").status_code, 404)
+        with override_settings(INVOICE_PDF_EXPORT_MAX=1):
+            self.assertEqual(self._export().status_code, 400)
+
+
+class SaleInvoiceListViewTests(TestCase):
+    def setUp(self):
+        data = setup_basic_entities()
+        self.invoices = SaleInvoice.objects.bulk_create(
+            SaleInvoice(
+                invoice_no=f"L-{i}",
+                date=date(2026, 1, 1) + timedelta(days=i % 30),
+                customer=data["customer"],
+                warehouse=data["warehouse"],
+                area_id=data["customer"].area,
+                total_amount=Decimal("10"),
+                grand_total=Decimal("10"),
+                paid_amount=Decimal("4"),
+                net_amount=Decimal("10"),
+                payment_method="Credit",
+            )
+            for i in range(1000)
+        )
+        SaleInvoiceItem.objects.bulk_create(
+            SaleInvoiceItem(
+                invoice=invoice,
+                product=data["product"],
+                quantity=1,
+                rate=Decimal("10"),
+                amount=Decimal("10"),
+                net_amount=Decimal("10"),
+            )
+            for invoice in self.invoices
+        )
+        RecoveryLog.objects.bulk_create(
+            RecoveryLog(invoice=self.invoices[0], date=date(2026, 2, day), notes="call")
+            for day in (1, 2)
+        )
+
+    def _get(self, view, *args, **params):
+        return view(RequestFactory().get("/", params), *args)
+
+    def test_rendering_every_invoice_takes_fixed_queries(self):
+        with mock.patch("sale.views.SALE_LIST_PAGE_SIZE", 1000), self.assertNumQueries(2):
+            response = self._get(sale_invoice_list)
+        self.assertContains(response, "L-999")
+        self.assertContains(response, "P1 &times; 1", count=1000)
+
+    def test_pages_walk_every_invoice_newest_first(self):
+        seen, params = [], {}
+        while True:
+            html = self._get(sale_invoice_list, **params).content.decode()
+            seen += re.findall(r"<td>(L-\d+)</td>", html)
+            cursor = re.search(r"\?after=([\w-]+)", html)
+            if not cursor:
+                break
+            params = {"after": cursor.group(1)}
+        expected = SaleInvoice.objects.order_by("-date", "-pk").values_list("invoice_no", flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_api_cursor_pages_walk_every_invoice_without_count(self):
+        view = SaleInvoiceViewSet.as_view({"get": "list"})
+        user = User.objects.first()
+        seen, url = [], "/invoices/?cursor=&limit=300"
+        while url:
+            request = APIRequestFactory().get(url)
+            force_authenticate(request, user=user)
+            with CaptureQueriesContext(connection) as queries:
+                response = view(request)
+            self.assertFalse(any("COUNT(" in q["sql"].upper() for q in queries.captured_queries))
+            self.assertLessEqual(len(response.data["results"]), 300)
+            seen += [row["invoice_no"] for row in response.data["results"]]
+            url = response.data["next"]
+        expected = SaleInvoice.objects.order_by("-date", "-pk").values_list("invoice_no", flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_detail_annotates_recoveries(self):
+        with self.assertNumQueries(3):
+            response = self._get(sale_invoice_detail, self.invoices[0].pk)
+        self.assertContains(response, "Recovery Logs (2)")
+        self.assertContains(response, "Balance Due:</strong> Rs 6")
@@ -1,22 +1,34 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.contrib import messages
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, F, Max, Prefetch, Q
+from django.core.exceptions import ValidationError
 
 from rest_framework.response import Response
 from drf_spectacular.utils import OpenApiParameter, OpenApiTypes, extend_schema
 
+import tempfile
 from datetime import date
 from decimal import Decimal, InvalidOperation
 
 
+from inventory.search import search_parties
+from utils.balances import adjust_party_balance
 from utils.notifications import notify_user_and_party
+from utils.invoice_import import import_from_request
+from utils.ledger import post_simple_entry
+from utils.pdf import iter_invoice_pdfs, pdf_filename, schedule_prerender, write_merged_pdf
+from utils.pagination import KeysetOptInPagination
+from utils.streaming import iter_zip
 
 
 from .models import (
@@ -35,20 +47,59 @@ from .serializers import (
 )
 
 
-@require_http_methods(["GET"])
-def sale_invoice_list(request):
-    sales = (
+SALE_LIST_PAGE_SIZE = 50
+
+
+def _invoice_display_queryset():
+    """Invoices with everything the list/detail templates render, in fixed queries."""
+    return (
         SaleInvoice.objects.select_related(
             'customer',
-            'salesman',
+            'warehouse',
             'booking_man_id',
-            'supplying_man_id',
             'delivery_man_id',
             'city_id',
-            'area_id',
-        ).all()
+            'area_id__city',
+        )
+        .prefetch_related(
+            Prefetch('items', queryset=SaleInvoiceItem.objects.select_related('product').order_by('pk')),
+        )
+        .annotate(
+            recovery_count=Count('recovery_logs'),
+            last_recovery=Max('recovery_logs__date'),
+            balance_due=F('grand_total') - F('paid_amount'),
+        )
+    )
+
+
+def _parse_list_cursor(value):
+    """``"<date>_<id>"`` from the previous page, or ``None`` for the first page."""
+    try:
+        day, pk = value.split('_', 1)
+        return date.fromisoformat(day), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+@require_http_methods(["GET"])
+def sale_invoice_list(request):
+    """Newest invoices first, paged on ``(date, id)`` so deep pages stay cheap."""
+    sales = _invoice_display_queryset().order_by('-date', '-pk')
+    cursor = _parse_list_cursor(request.GET.get('after'))
+    if cursor:
+        day, pk = cursor
+        sales = sales.filter(Q(date__lt=day) | Q(date=day, pk__lt=pk))
+
+    sales = list(sales[:SALE_LIST_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(sales) > SALE_LIST_PAGE_SIZE:
+        sales = sales[:SALE_LIST_PAGE_SIZE]
+        next_cursor = f"{sales[-1].date.isoformat()}_{sales[-1].pk}"
+    return render(
+        request,
+        'Invoice/sale_list.html',
+        {'sales': sales, 'next_cursor': next_cursor, 'is_first_page': cursor is None},
     )
-    return render(request, 'invoice/sale_list.html', {'sales': sales})
 
 @require_http_methods(["GET", "POST"])
 def sale_invoice_create(request):
@@ -57,22 +108,29 @@ def sale_invoice_create(request):
         form = SaleInvoiceForm(request.POST,instance=sale)
         formset = SaleInvoiceItemForm(request.POST,instance=sale)
         if form.is_valid() and formset.is_valid():
-            sale = form.save()
-            formset.instance = sale
-            formset.save()
-            Notification.objects.create(
-                user=request.user,
-                title="Sale Invoice Created",
-                message=f"Sale invoice {sale.invoice_no} was created."
-            )
-            messages.success(request, "Sale invoice created.")
-            return redirect(reverse('sale_detail', args=[sale.pk]))
+            try:
+                with transaction.atomic():
+                    sale = form.save()
+                    formset.instance = sale
+                    formset.save()
+                    sale.post_items()
+                    schedule_prerender(sale)
+            except ValidationError as exc:
+                form.add_error(None, exc)
+            else:
+                Notification.objects.create(
+                    user=request.user,
+                    title="Sale Invoice Created",
+                    message=f"Sale invoice {sale.invoice_no} was created."
+                )
+                messages.success(request, "Sale invoice created.")
+                return redirect(reverse('sale_detail', args=[sale.pk]))
     else:
         sale=SaleInvoice()
         form = SaleInvoiceForm(instance=sale)
         formset = SaleInvoiceItemForm(instance=sale)
         
-    return render(request, 'invoice/sale_form.html', {'form': form, 'formset': formset})
+    return render(request, 'Invoice/sale_form.html', {'form': form, 'formset': formset})
 
 @require_http_methods(["GET", "POST"])
 def sale_invoice_edit(request, pk):
@@ -81,35 +139,58 @@ def sale_invoice_edit(request, pk):
         form = SaleInvoiceForm(request.POST, instance=sale)
         formset = SaleInvoiceItemForm(request.POST, instance=sale)
         if form.is_valid() and formset.is_valid():
-            form.save()
-            formset.save()
+            with transaction.atomic():
+                form.save()
+                formset.save()
+                schedule_prerender(sale)
             messages.success(request, "Sale invoice updated.")
             return redirect(reverse('sale_detail', args=[sale.pk]))
     else:
         form = SaleInvoiceForm(instance=sale)
         formset = SaleInvoiceItemForm(instance=sale)
-    return render(request, 'invoice/sale_form.html', {'form': form, 'formset': formset})
+    return render(request, 'Invoice/sale_form.html', {'form': form, 'formset': formset})
 
 @require_http_methods(["GET"])
 def sale_invoice_detail(request, pk):
     invoice = get_object_or_404(
-        SaleInvoice.objects.select_related(
-            'customer',
-            'salesman',
-            'booking_man_id',
-            'supplying_man_id',
-            'delivery_man_id',
-            'city_id',
-            'area_id',
+        _invoice_display_queryset().prefetch_related(
+            Prefetch('recovery_logs', queryset=RecoveryLog.objects.select_related('employee').order_by('date', 'pk')),
         ),
         pk=pk,
     )
-    return render(request, 'invoice/sale_detail.html', {'sale': invoice})
+    return render(request, 'Invoice/sale_detail.html', {'sale': invoice})
+
+
+ROUTE_PARAMETERS = [
+    OpenApiParameter(
+        "date",
+        OpenApiTypes.DATE,
+        OpenApiParameter.QUERY,
+        description="Filter invoices dated exactly this day",
+        required=False,
+    ),
+    OpenApiParameter(
+        "delivery_man_id",
+        OpenApiTypes.INT,
+        OpenApiParameter.QUERY,
+        description="Filter invoices assigned to this delivery man",
+        required=False,
+    ),
+    OpenApiParameter(
+        "area_id",
+        OpenApiTypes.INT,
+        OpenApiParameter.QUERY,
+        description="Filter invoices delivered to this area",
+        required=False,
+    ),
+]
 
 
 class SaleInvoiceViewSet(viewsets.ModelViewSet):
     queryset = SaleInvoice.objects.all().prefetch_related('items', 'recovery_logs')
     serializer_class = SaleInvoiceSerializer
+    pagination_class = KeysetOptInPagination
+    keyset_ordering = ("-date", "-id")
 
     def perform_create(self, serializer):
         invoice = serializer.save()
@@ -133,11 +214,23 @@ class SaleInvoiceViewSet(viewsets.ModelViewSet):
         if end_date:
             qs = qs.filter(date__lte=end_date)
 
+        invoice_date = self.request.query_params.get("date")
+        if invoice_date:
+            qs = qs.filter(date=invoice_date)
+
+        delivery_man_id = self.request.query_params.get("delivery_man_id")
+        if delivery_man_id:
+            qs = qs.filter(delivery_man_id=delivery_man_id)
+
+        area_id = self.request.query_params.get("area_id")
+        if area_id:
+            qs = qs.filter(area_id=area_id)
+
         search = self.request.query_params.get("searchTerm")
         if search:
             qs = qs.filter(
                 Q(invoice_no__icontains=search) |
-                Q(customer__name__icontains=search)
+                Q(customer__in=search_parties(search).values("pk"))
             )
 
         return qs
@@ -181,11 +274,71 @@ class SaleInvoiceViewSet(viewsets.ModelViewSet):
                 description="Search by invoice number or customer name",
                 required=False,
             ),
+            *ROUTE_PARAMETERS,
+            OpenApiParameter(
+                "cursor",
+                OpenApiTypes.STR,
+                OpenApiParameter.QUERY,
+                description="Page by (date, id) instead of limit/offset; empty for the first page, then follow 'next'",
+                required=False,
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "output",
+                OpenApiTypes.STR,
+                OpenApiParameter.QUERY,
+                description="'zip' (one PDF per invoice, default) or 'pdf' (one merged PDF)",
+                required=False,
+            ),
+            *ROUTE_PARAMETERS,
+        ]
+    )
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """Export the filtered invoices as a streamed ZIP of PDFs or one merged PDF."""
+        output = request.query_params.get("output", "zip").lower()
+        if output not in ("zip", "pdf"):
+            return Response({"detail": "output must be 'zip' or 'pdf'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        invoices = self.filter_queryset(self.get_queryset()).order_by("date", "pk")
+        limit = getattr(settings, "INVOICE_PDF_EXPORT_MAX", 500)
+        count = invoices.count()
+        if not count:
+            return Response({"detail": "No invoices match the filter."}, status=status.HTTP_404_NOT_FOUND)
+        if count > limit:
+            return Response(
+                {"detail": f"At most {limit} invoices can be exported at once; narrow the filter."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rows = invoices.iterator(chunk_size=100)
+        if output == "pdf":
+            # spooled to disk and streamed from there, not held twice in memory
+            merged = tempfile.TemporaryFile()
+            write_merged_pdf(rows, merged, count)
+            merged.seek(0)
+            return FileResponse(
+                merged, as_attachment=True, filename="invoices.pdf", content_type="application/pdf"
+            )
+
+        files = ((pdf_filename(invoice), data) for invoice, data in iter_invoice_pdfs(rows, count))
+        response = StreamingHttpResponse(iter_zip(files), content_type="application/zip")
+        response["Content-Disposition"] = 'attachment; filename="invoices.zip"'
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @action(detail=False, methods=["post"], url_path="bulk-import")
+    def bulk_import(self, request):
+        """Create many invoices at once from a JSON list or a JSON/CSV upload."""
+        summary, status_code = import_from_request(request, "sale")
+        return Response(summary, status=status_code)
+
     @action(detail=False, methods=["get"], url_path="by-number/(?P<invoice_no>[^/.]+)")
     def retrieve_by_number(self, request, invoice_no=None):
         """Retrieve a sale invoice using its invoice_no."""
@@ -244,9 +397,10 @@ class RecoveryLogViewSet(viewsets.ModelViewSet):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def add_recovery_payment(request, order_id):
-    """Append a payment to the recovery log and update the invoice's paid amount."""
-    invoice = get_object_or_404(SaleInvoice, pk=order_id)
+    """Append a payment to the recovery log, update the invoice's paid amount and post it."""
+    invoice = get_object_or_404(SaleInvoice.objects.select_for_update().select_related("customer", "warehouse"), pk=order_id)
 
     amount = request.data.get("amount")
     notes = request.data.get("notes", "")
@@ -254,6 +408,8 @@ def add_recovery_payment(request, order_id):
         amount = Decimal(str(amount))
     except (TypeError, InvalidOperation):
         return Response({"detail": "Invalid amount."}, status=400)
+    if amount <= 0:
+        return Response({"detail": "Invalid amount."}, status=400)
 
     employee = getattr(request.user, "employee", None)
     if hasattr(employee, "first"):
@@ -269,7 +425,19 @@ def add_recovery_payment(request, order_id):
     invoice.paid_amount = (invoice.paid_amount or Decimal("0")) + amount
     if invoice.paid_amount >= invoice.grand_total:
         invoice.status = "Paid"
-    invoice.save(update_fields=["paid_amount", "status"])
+    invoice.save(update_fields=["paid_amount", "net_amount", "status"])
+    # the recovered amount no longer counts towards the customer's exposure
+    adjust_party_balance(invoice.customer, -amount)
+
+    cash_or_bank = invoice.warehouse.default_cash_account or invoice.warehouse.default_bank_account
+    if cash_or_bank and invoice.customer.chart_of_account:
+        post_simple_entry(
+            date=date.today(),
+            amount=amount,
+            narration=f"Recovery for Sale Invoice {invoice.invoice_no}",
+            debit_account=cash_or_bank,
+            credit_account=invoice.customer.chart_of_account,
+        )
 
     serializer = SaleInvoiceSerializer(invoice)
     return Response(serializer.data)
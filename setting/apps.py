@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class SettingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'setting'
+
+    def ready(self):
+        from .sync import connect_tombstones
+
+        connect_tombstones()
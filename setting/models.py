@@ -5,13 +5,46 @@ from django.db import models
 from django_ledger.models.accounts import AccountModel
 
 
-class City(models.Model):
+class SyncTrackedModel(models.Model):
+    """Abstract base for master data served by the delta-sync endpoint.
+
+    ``updated_at`` is bumped on every save, including ``save(update_fields=...)``.
+    ``QuerySet.update``/``bulk_update`` callers must set it themselves.
+    """
+
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "updated_at" not in update_fields:
+            kwargs["update_fields"] = [*update_fields, "updated_at"]
+        super().save(*args, **kwargs)
+
+
+class SyncTombstone(models.Model):
+    """Records a deleted master row so sync clients can drop it."""
+
+    collection = models.CharField(max_length=50)
+    object_id = models.CharField(max_length=64)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["collection", "deleted_at"])]
+
+    def __str__(self):
+        return f"{self.collection}:{self.object_id}"
+
+
+class City(SyncTrackedModel):
     name = models.CharField(max_length=100)
     def __str__(self):
         return self.name
 
 
-class Area(models.Model):
+class Area(SyncTrackedModel):
     city = models.ForeignKey(City, on_delete=models.SET_NULL, null=True, blank=True)
     name = models.CharField(max_length=100)
 
@@ -19,7 +52,24 @@ class Area(models.Model):
         return f"{self.name} ({self.city.name})" if self.city else self.name
 
 
-class Company(models.Model):
+class GeocodeCache(models.Model):
+    """Remote reverse-geocode answers keyed by rounded coordinates (see ``utils.geocode``)."""
+
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    result = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["latitude", "longitude"], name="geocode_cache_point_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.latitude}, {self.longitude}"
+
+
+class Company(SyncTrackedModel):
     name = models.CharField(max_length=100)
     payroll_expense_account = models.ForeignKey(
         AccountModel,
@@ -38,12 +88,12 @@ class Company(models.Model):
     def __str__(self):
         return self.name
 
-class Group(models.Model):
+class Group(SyncTrackedModel):
     name = models.CharField(max_length=100)
     def __str__(self):
         return self.name
 
-class Distributor(models.Model):
+class Distributor(SyncTrackedModel):
     name = models.CharField(max_length=100)
     def __str__(self):
         return self.name
@@ -0,0 +1,164 @@
+"""Incremental (delta) sync of master data for offline clients.
+
+Every collection is read in ``(timestamp, pk)`` order and paged with an
+opaque cursor, so a client only downloads rows changed since its last sync.
+Deleted rows are reported from :class:`~setting.models.SyncTombstone`.
+
+The high-water mark of a response is held back by ``SYNC_CURSOR_LAG_SECONDS``
+so rows written by transactions that commit late are not skipped.
+"""
+
+import base64
+import json
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import SyncTombstone
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+#: collection name -> (model label, timestamp expression)
+SYNC_COLLECTIONS = {
+    "companies": ("setting.Company", F("updated_at")),
+    "groups": ("setting.Group", F("updated_at")),
+    "distributors": ("setting.Distributor", F("updated_at")),
+    "cities": ("setting.City", F("updated_at")),
+    "areas": ("setting.Area", F("updated_at")),
+    "parties": ("inventory.Party", F("updated_at")),
+    "products": ("inventory.Product", F("updated_at")),
+    "batches": ("inventory.Batch", F("updated_at")),
+    "expense_categories": ("expense.ExpenseCategory", F("updated_at")),
+    "price_lists": ("inventory.PriceList", F("updated_at")),
+    "price_list_items": ("inventory.PriceListItem", F("updated_at")),
+    # django_ledger's ``updated`` is nullable on legacy rows
+    "chart_of_accounts": ("django_ledger.AccountModel", Coalesce("updated", "created")),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(rows_mark, deleted_mark):
+    """Pack ``(timestamp, pk)`` marks for rows and tombstones into a token."""
+    payload = json.dumps({"r": rows_mark, "d": deleted_mark}, default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(token):
+    if not token:
+        return None, None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return _mark(data.get("r")), _mark(data.get("d"))
+    except (ValueError, TypeError, AttributeError) as exc:
+        raise InvalidCursor(str(exc)) from exc
+
+
+def _mark(value):
+    if value is None:
+        return None
+    ts, pk = value
+    parsed = parse_datetime(ts)
+    if parsed is None:
+        raise InvalidCursor(f"Bad timestamp {ts!r}")
+    return parsed, pk
+
+
+def available_collections():
+    """Return ``{name: (model, timestamp expression)}`` for installed apps."""
+    return {
+        name: (apps.get_model(label), expr)
+        for name, (label, expr) in SYNC_COLLECTIONS.items()
+        if apps.is_installed(label.split(".")[0])
+    }
+
+
+def _after(qs, field, mark):
+    ts, pk = mark
+    if pk is None:
+        return qs.filter(**{f"{field}__gt": ts})
+    return qs.filter(Q(**{f"{field}__gt": ts}) | Q(**{field: ts, "pk__gt": pk}))
+
+
+def high_water_mark():
+    lag = getattr(settings, "SYNC_CURSOR_LAG_SECONDS", 5)
+    return timezone.now() - timedelta(seconds=lag)
+
+
+def sync_collection(name, cursor=None, limit=DEFAULT_PAGE_SIZE, until=None):
+    """Return one page of changes for ``name`` after ``cursor``.
+
+    The result holds changed ``rows`` (``.values()`` dicts like
+    ``management_all``), ``deleted`` primary keys, the next ``cursor`` and
+    ``has_more``. Without a cursor every current row is returned and
+    tombstones are skipped.
+    """
+    model, ts_expr = available_collections()[name]
+    until = until or high_water_mark()
+    rows_mark, deleted_mark = decode_cursor(cursor)
+
+    qs = model.objects.annotate(sync_ts=ts_expr).filter(sync_ts__lte=until)
+    if rows_mark:
+        qs = _after(qs, "sync_ts", rows_mark)
+    page = list(qs.order_by("sync_ts", "pk").values()[: limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    if page:
+        last = page[-1]
+        rows_mark = (last["sync_ts"].isoformat(), last[model._meta.pk.attname])
+    for row in page:
+        del row["sync_ts"]
+
+    deleted = []
+    tombstones = SyncTombstone.objects.filter(collection=name, deleted_at__lte=until)
+    if cursor is None:
+        latest = tombstones.order_by("-deleted_at", "-pk").values("deleted_at", "pk").first()
+        if latest:
+            deleted_mark = (latest["deleted_at"].isoformat(), latest["pk"])
+    else:
+        if deleted_mark:
+            tombstones = _after(tombstones, "deleted_at", deleted_mark)
+        gone = list(tombstones.order_by("deleted_at", "pk").values("pk", "object_id", "deleted_at")[: limit + 1])
+        has_more = has_more or len(gone) > limit
+        gone = gone[:limit]
+        if gone:
+            deleted_mark = (gone[-1]["deleted_at"].isoformat(), gone[-1]["pk"])
+        deleted = [item["object_id"] for item in gone]
+
+    if not page and not has_more and rows_mark is None:
+        # Empty collection: start the next sync at the high-water mark.
+        rows_mark = (until.isoformat(), None)
+
+    return {
+        "rows": page,
+        "deleted": deleted,
+        "cursor": encode_cursor(_iso(rows_mark), _iso(deleted_mark)),
+        "has_more": has_more,
+    }
+
+
+def _iso(mark):
+    if mark is None:
+        return None
+    ts, pk = mark
+    return (ts if isinstance(ts, str) else ts.isoformat(), pk)
+
+
+def _record_tombstone(sender, instance, **kwargs):
+    SyncTombstone.objects.create(collection=sender._sync_collection, object_id=str(instance.pk))
+
+
+def connect_tombstones():
+    """Record a tombstone whenever a synced row is deleted."""
+    for name, (model, _) in available_collections().items():
+        model._sync_collection = name
+        post_delete.connect(_record_tombstone, sender=model, dispatch_uid=f"sync_tombstone_{name}")
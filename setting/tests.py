@@ -1,3 +1,48 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from inventory.models import Party
+from setting.models import City, SyncTombstone
+from setting.sync import sync_collection
+
+
+@override_settings(SYNC_CURSOR_LAG_SECONDS=0)
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.cities = [City.objects.create(name=f"City {i}") for i in range(5)]
+
+    def _drain(self, name, cursor=None, limit=2):
+        rows, deleted = [], []
+        while True:
+            page = sync_collection(name, cursor, limit=limit)
+            rows += page["rows"]
+            deleted += page["deleted"]
+            cursor = page["cursor"]
+            if not page["has_more"]:
+                return rows, deleted, cursor
+
+    def test_initial_sync_pages_through_every_row(self):
+        rows, deleted, _ = self._drain("cities")
+        self.assertEqual([row["id"] for row in rows], [city.pk for city in self.cities])
+        self.assertEqual(deleted, [])
+
+    def test_only_changes_since_cursor_are_returned(self):
+        _, _, cursor = self._drain("cities")
+        self.assertEqual(self._drain("cities", cursor)[0], [])
+
+        self.cities[1].name = "Renamed"
+        self.cities[1].save(update_fields=["name"])
+        gone = self.cities[3].pk
+        self.cities[3].delete()
+
+        rows, deleted, _ = self._drain("cities", cursor)
+        self.assertEqual([row["name"] for row in rows], ["Renamed"])
+        self.assertEqual(deleted, [str(gone)])
+
+    def test_queryset_deletes_leave_tombstones(self):
+        Party.objects.create(
+            name="P", address="a", phone="1", party_type="customer", city=self.cities[0]
+        )
+        _, _, cursor = self._drain("parties")
+        Party.objects.all().delete()
+        self.assertEqual(len(self._drain("parties", cursor)[1]), 1)
+        self.assertTrue(SyncTombstone.objects.filter(collection="parties").exists())
@@ -10,6 +10,7 @@ from .views import (
     BranchViewSet,
     WarehouseViewSet,
     management_all,
+    management_sync,
 )
 
 
@@ -24,5 +25,6 @@ router.register(r'warehouses', WarehouseViewSet)
 
 urlpatterns = [
     path('all/', management_all),
+    path('sync/', management_sync),
     path('', include(router.urls)),
 ]
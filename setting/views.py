@@ -1,4 +1,4 @@
-from rest_framework import permissions, viewsets
+from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 
@@ -16,6 +16,16 @@ from inventory.models import Party, Product, Batch, PriceList, PriceListItem
 from expense.models import ExpenseCategory
 from django_ledger.models.accounts import AccountModel
 from rest_framework.decorators import action
+from utils.streaming import StreamedArray, StreamingJSONResponse
+
+from .sync import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursor,
+    available_collections,
+    high_water_mark,
+    sync_collection,
+)
 
 
 class CityViewSet(viewsets.ModelViewSet):
@@ -76,17 +86,59 @@ class WarehouseViewSet(viewsets.ModelViewSet):
 @permission_classes([permissions.IsAuthenticated])
 def management_all(request):
     data = {
-        "companies": list(Company.objects.values()),
-        "groups": list(Group.objects.values()),
-        "distributors": list(Distributor.objects.values()),
-        "cities": list(City.objects.values()),
-        "areas": list(Area.objects.values()),
-        "parties": list(Party.objects.values()),
-        "products": list(Product.objects.values()),
-        "batches": list(Batch.objects.values()),
-        "expense_categories": list(ExpenseCategory.objects.values()),
-        "price_lists": list(PriceList.objects.values()),
-        "price_list_items": list(PriceListItem.objects.values()),
-        "chart_of_accounts": list(AccountModel.objects.values()),
+        "companies": StreamedArray(Company.objects.values()),
+        "groups": StreamedArray(Group.objects.values()),
+        "distributors": StreamedArray(Distributor.objects.values()),
+        "cities": StreamedArray(City.objects.values()),
+        "areas": StreamedArray(Area.objects.values()),
+        "parties": StreamedArray(Party.objects.values()),
+        "products": StreamedArray(Product.objects.values()),
+        "batches": StreamedArray(Batch.objects.values()),
+        "expense_categories": StreamedArray(ExpenseCategory.objects.values()),
+        "price_lists": StreamedArray(PriceList.objects.values()),
+        "price_list_items": StreamedArray(PriceListItem.objects.values()),
+        "chart_of_accounts": StreamedArray(AccountModel.objects.values()),
     }
-    return Response(data)
+    return StreamingJSONResponse(data)
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def management_sync(request):
+    """Incremental replacement for ``management_all``.
+
+    Body: ``{"cursors": {"products": "<cursor>", ...}, "collections": [...],
+    "limit": 500}``. Collections without a cursor are sent in full; the
+    response carries, per collection, the changed ``rows``, ``deleted`` ids,
+    the next ``cursor`` and ``has_more``. Clients keep calling with the new
+    cursors while ``has_more`` is true.
+    """
+    cursors = request.data.get("cursors") or {}
+    known = available_collections()
+    names = request.data.get("collections") or list(known)
+    unknown = [name for name in [*names, *cursors] if name not in known]
+    if unknown:
+        return Response(
+            {"detail": f"Unknown collection(s): {', '.join(sorted(set(unknown)))}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        limit = min(int(request.data.get("limit") or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    until = high_water_mark()
+    collections = {}
+    try:
+        for name in names:
+            collections[name] = sync_collection(name, cursors.get(name), limit=limit, until=until)
+    except InvalidCursor:
+        return Response({"detail": f"Invalid cursor for {name}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(
+        {
+            "high_water_mark": until,
+            "has_more": any(page["has_more"] for page in collections.values()),
+            "collections": collections,
+        }
+    )
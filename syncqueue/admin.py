@@ -1,4 +1,8 @@
 from django.contrib import admin
 from .models import QueuedOperation
 
-admin.site.register(QueuedOperation)
+
+@admin.register(QueuedOperation)
+class QueuedOperationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'model_name', 'operation', 'status', 'attempts', 'created_at', 'processed_at']
+    list_filter = ['status', 'operation', 'model_name']
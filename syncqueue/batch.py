@@ -0,0 +1,97 @@
+"""Idempotent batched upload of offline operations.
+
+A client replays its whole offline queue in one request. Each operation
+carries a client-generated idempotency key and is stored as a
+:class:`~syncqueue.models.QueuedOperation` with that key before it is
+applied, inside its own savepoint. A key that was seen before is not applied
+again; the stored outcome is returned instead, so retrying a request after a
+timeout never duplicates invoices or orders.
+"""
+
+from django.db import IntegrityError, transaction
+
+from .models import QueuedOperation
+from .worker import (
+    OUTCOME_FIELDS,
+    OperationError,
+    error_detail,
+    execute,
+    finish,
+    get_serializer_class,
+    target_pk,
+)
+
+MAX_BATCH_OPERATIONS = 500
+
+
+def _result(op, replayed=False):
+    return {
+        "key": op.idempotency_key,
+        "status": "QUEUED" if op.status == "PENDING" else op.status,
+        "id": op.object_id or None,
+        "errors": op.error,
+        "replayed": replayed,
+    }
+
+
+def _invalid(key, message):
+    return {"key": key, "status": "FAILED", "id": None, "errors": {"detail": message}, "replayed": False}
+
+
+def _target(serializer_class, op):
+    if op.operation not in ("UPDATE", "DELETE"):
+        return None
+    model = serializer_class.Meta.model
+    return model.objects.filter(pk=model._meta.pk.to_python(target_pk(op.data))).first()
+
+
+def _apply_one(item, user):
+    key = item.get("key")
+    if not key:
+        return _invalid(key, "'key' is required.")
+    # checked here: an oversized key is a DataError on PostgreSQL, which
+    # would abort the whole batch instead of failing this item
+    max_length = QueuedOperation._meta.get_field("idempotency_key").max_length
+    if not isinstance(key, str) or len(key) > max_length:
+        return _invalid(key, f"'key' must be a string of at most {max_length} characters.")
+    operation = (item.get("operation") or "").upper()
+    if operation not in dict(QueuedOperation.OPERATION_CHOICES):
+        return _invalid(key, f"Unknown operation {item.get('operation')!r}.")
+
+    try:
+        with transaction.atomic():
+            op = QueuedOperation.objects.create(
+                idempotency_key=key,
+                user=user,
+                model_name=item.get("model") or item.get("model_name") or "",
+                operation=operation,
+                data=item.get("data") or {},
+            )
+    except IntegrityError:
+        existing = QueuedOperation.objects.get(idempotency_key=key)
+        return _result(existing, replayed=True)
+
+    try:
+        serializer_class = get_serializer_class(op.model_name)
+        instance = _target(serializer_class, op)
+    except Exception as exc:
+        op.attempts += 1
+        finish(op, "FAILED", error=error_detail(exc))
+    else:
+        # Transient errors leave the row pending for the background worker.
+        execute(op, serializer_class, instance)
+    op.save(update_fields=OUTCOME_FIELDS)
+    return _result(op)
+
+
+@transaction.atomic
+def apply_batch(operations, user=None):
+    """Apply ``operations`` in order and return one result per item.
+
+    Each item is ``{"key", "model", "operation", "data"}``. Results carry
+    the ``key``, ``status`` (``APPLIED``, ``FAILED`` or ``QUEUED`` when left
+    for the worker), the affected ``id``, ``errors`` and ``replayed``.
+    """
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise OperationError(f"At most {MAX_BATCH_OPERATIONS} operations per batch.")
+    return [_apply_one(item if isinstance(item, dict) else {}, user) for item in operations]
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from syncqueue.worker import DEFAULT_BATCH_SIZE, process_pending
+
+
+class Command(BaseCommand):
+    help = "Apply pending QueuedOperation rows. Safe to run several workers at once."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling instead of exiting once the queue is empty.",
+        )
+        parser.add_argument("--sleep", type=float, default=5.0, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            totals = process_pending(batch_size=options["batch_size"])
+            if any(totals.values()):
+                self.stdout.write(
+                    f"applied={totals['applied']} failed={totals['failed']} retry={totals['retry']}"
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
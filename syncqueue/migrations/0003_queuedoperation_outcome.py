@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('syncqueue', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedoperation',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('APPLIED', 'Applied'), ('FAILED', 'Failed')], default='PENDING', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='queuedoperation',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='queuedoperation',
+            name='object_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='queuedoperation',
+            name='error',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='queuedoperation',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='queuedoperation',
+            index=models.Index(fields=['processed', 'id'], name='syncqueue_q_process_e88e0a_idx'),
+        ),
+    ]
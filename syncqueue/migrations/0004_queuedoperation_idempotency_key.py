@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('syncqueue', '0003_queuedoperation_outcome'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedoperation',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -8,12 +8,26 @@ class QueuedOperation(models.Model):
         ('UPDATE', 'Update'),
         ('DELETE', 'Delete'),
     ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('APPLIED', 'Applied'),
+        ('FAILED', 'Failed'),
+    ]
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     model_name = models.CharField(max_length=100)
     operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
     data = models.JSONField()
     processed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    object_id = models.CharField(max_length=64, blank=True)
+    error = models.JSONField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    idempotency_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['processed', 'id'])]
 
     def __str__(self):
         return f"{self.model_name} - {self.operation}"
@@ -6,3 +6,4 @@ class QueuedOperationSerializer(serializers.ModelSerializer):
     class Meta:
         model = QueuedOperation
         fields = '__all__'
+        read_only_fields = ['processed', 'status', 'attempts', 'object_id', 'error', 'processed_at', 'idempotency_key']
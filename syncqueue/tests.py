@@ -0,0 +1,87 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from hr.models import Attendance, Employee
+from syncqueue.models import QueuedOperation
+from syncqueue.views import sync_batch
+from syncqueue.worker import process_batch, process_pending
+
+
+class SyncQueueWorkerTests(TestCase):
+    def setUp(self):
+        self.employee = Employee.objects.create(name="Rep", phone="1")
+
+    def _queue(self, operation, data, model_name="Attendance"):
+        return QueuedOperation.objects.create(model_name=model_name, operation=operation, data=data)
+
+    def test_operations_are_applied_and_outcomes_recorded(self):
+        existing = Attendance.objects.create(employee=self.employee, date=date(2026, 1, 1))
+        doomed = Attendance.objects.create(employee=self.employee, date=date(2026, 1, 2))
+        created = self._queue("CREATE", {"employee": self.employee.pk, "date": "2026-01-05"})
+        updated = self._queue("UPDATE", {"id": existing.pk, "remarks": "late"}, "hr.attendance")
+        deleted = self._queue("DELETE", {"id": doomed.pk})
+        invalid = self._queue("CREATE", {"employee": self.employee.pk})
+        missing = self._queue("UPDATE", {"id": 9999, "remarks": "x"})
+        unknown = self._queue("CREATE", {}, "Spaceship")
+
+        self.assertEqual(process_pending(), {"applied": 3, "failed": 3, "retry": 0})
+
+        ops = {op.pk: op for op in QueuedOperation.objects.all()}
+        self.assertTrue(all(op.processed for op in ops.values()))
+        new = Attendance.objects.get(date=date(2026, 1, 5))
+        self.assertEqual(ops[created.pk].object_id, str(new.pk))
+        self.assertEqual(ops[updated.pk].status, "APPLIED")
+        self.assertEqual(Attendance.objects.get(pk=existing.pk).remarks, "late")
+        self.assertFalse(Attendance.objects.filter(pk=doomed.pk).exists())
+        self.assertEqual(ops[deleted.pk].status, "APPLIED")
+        self.assertIn("date", ops[invalid.pk].error)
+        self.assertEqual(ops[missing.pk].status, "FAILED")
+        self.assertEqual(ops[unknown.pk].status, "FAILED")
+
+    def test_processed_operations_are_not_claimed_again(self):
+        self._queue("CREATE", {"employee": self.employee.pk, "date": "2026-01-05"})
+        self.assertEqual(process_batch()["applied"], 1)
+        self.assertEqual(process_batch(), {})
+        self.assertEqual(Attendance.objects.count(), 1)
+
+
+class SyncBatchTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("rep@example.com", "pass")
+        self.employee = Employee.objects.create(name="Rep", phone="1")
+
+    def _post(self, operations):
+        request = APIRequestFactory().post("/sync/batch/", {"operations": operations}, format="json")
+        force_authenticate(request, user=self.user)
+        return sync_batch(request)
+
+    def test_batch_applies_in_order_and_replays_are_deduplicated(self):
+        operations = [
+            {"key": "k1", "model": "Attendance", "operation": "CREATE",
+             "data": {"employee": self.employee.pk, "date": "2026-01-05"}},
+            {"key": "k2", "model": "Attendance", "operation": "CREATE",
+             "data": {"employee": self.employee.pk}},
+            {"operation": "CREATE"},
+        ]
+        first = self._post(operations).data["results"]
+        self.assertEqual([r["status"] for r in first], ["APPLIED", "FAILED", "FAILED"])
+        self.assertIn("date", first[1]["errors"])
+
+        replay = self._post(operations[:2]).data["results"]
+        self.assertEqual([r["replayed"] for r in replay], [True, True])
+        self.assertEqual(replay[0]["id"], first[0]["id"])
+        self.assertEqual(Attendance.objects.count(), 1)
+        self.assertEqual(QueuedOperation.objects.get(idempotency_key="k1").user, self.user)
+        self.assertEqual(process_batch(), {})
+
+    def test_malformed_keys_fail_without_aborting_the_batch(self):
+        create = {"model": "Attendance", "operation": "CREATE",
+                  "data": {"employee": self.employee.pk, "date": "2026-01-05"}}
+        response = self._post([{**create, "key": "k" * 101}, {**create, "key": 7}, {**create, "key": "ok"}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["FAILED", "FAILED", "APPLIED"])
+        self.assertIn("at most 100", response.data["results"][0]["errors"]["detail"])
+        self.assertEqual(list(QueuedOperation.objects.values_list("idempotency_key", flat=True)), ["ok"])
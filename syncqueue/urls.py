@@ -1,7 +1,10 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import QueuedOperationViewSet
+from .views import QueuedOperationViewSet, sync_batch
 
 router = DefaultRouter()
 router.register(r'queued-operations', QueuedOperationViewSet)
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('sync/batch/', sync_batch, name='sync_batch'),
+] + router.urls
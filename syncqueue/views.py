@@ -1,8 +1,39 @@
-from rest_framework import viewsets
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.response import Response
+
 from .models import QueuedOperation
 from .serializers import QueuedOperationSerializer
+from .batch import apply_batch
+from .worker import DEFAULT_BATCH_SIZE, OperationError, process_pending
 
 
 class QueuedOperationViewSet(viewsets.ModelViewSet):
     queryset = QueuedOperation.objects.all()
     serializer_class = QueuedOperationSerializer
+
+    @action(detail=False, methods=["post"], permission_classes=[permissions.IsAdminUser])
+    def process(self, request):
+        """Drain the queue now instead of waiting for the background worker."""
+        batch_size = int(request.data.get("batch_size") or DEFAULT_BATCH_SIZE)
+        return Response(process_pending(batch_size=batch_size))
+
+
+@api_view(["POST"])
+@permission_classes([permissions.IsAuthenticated])
+def sync_batch(request):
+    """Apply an ordered list of offline operations in one request.
+
+    Body: ``{"operations": [{"key": "<uuid>", "model": "SaleInvoice",
+    "operation": "CREATE", "data": {...}}, ...]}``. Keys already seen are
+    not applied again; their original result is returned with
+    ``"replayed": true``.
+    """
+    operations = request.data.get("operations")
+    if not isinstance(operations, list):
+        return Response({"detail": "'operations' must be a list."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        results = apply_batch(operations, user=request.user)
+    except OperationError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"results": results})
@@ -0,0 +1,225 @@
+"""Apply queued offline operations on the server.
+
+Workers claim unprocessed :class:`~syncqueue.models.QueuedOperation` rows
+with ``SELECT ... FOR UPDATE SKIP LOCKED`` so several of them can run side by
+side without ever picking up the same row. A claimed batch is grouped by
+``model_name`` and applied through the model's DRF serializer, each
+operation in its own savepoint, and the outcome of every operation is
+written back with one ``bulk_update``.
+"""
+
+import logging
+from collections import OrderedDict
+
+from django.apps import apps
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import ValidationError
+
+from .models import QueuedOperation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+
+#: normalized model name -> serializer used to apply its operations
+SERIALIZERS = {
+    "saleinvoice": "sale.serializers.SaleInvoiceSerializer",
+    "salereturn": "sale.serializers.SaleReturnSerializer",
+    "recoverylog": "sale.serializers.RecoveryLogSerializer",
+    "purchaseinvoice": "purchase.serializers.PurchaseInvoiceSerializer",
+    "purchasereturn": "purchase.serializers.PurchaseReturnSerializer",
+    "party": "investor.serializers.PartySerializer",
+    "expense": "expense.serializers.ExpenseSerializer",
+    "order": "ecommerce.serializers.OrderSerializer",
+    "attendance": "hr.serializers.AttendanceSerializer",
+    "leaverequest": "hr.serializers.LeaveRequestSerializer",
+    "lead": "crm.serializers.LeadSerializer",
+    "interaction": "crm.serializers.InteractionSerializer",
+}
+
+OUTCOME_FIELDS = ["processed", "status", "attempts", "object_id", "error", "processed_at"]
+
+
+class OperationError(Exception):
+    """A queued operation that can never succeed (bad model, missing id...)."""
+
+
+def normalize_model_name(name):
+    """``"sale.SaleInvoice"``, ``"SaleInvoice"`` and ``"sale_invoice"`` all map to ``"saleinvoice"``."""
+    return (name or "").rsplit(".", 1)[-1].replace("_", "").replace("-", "").lower()
+
+
+def get_serializer_class(model_name):
+    path = SERIALIZERS.get(normalize_model_name(model_name))
+    if not path or not apps.is_installed(path.split(".", 1)[0]):
+        raise OperationError(f"Unsupported model {model_name!r}")
+    return import_string(path)
+
+
+def target_pk(data):
+    pk = (data or {}).get("id")
+    if pk in (None, ""):
+        raise OperationError("'id' is required for UPDATE and DELETE")
+    return pk
+
+
+def apply_operation(serializer_class, operation, data, instance=None, user=None):
+    """Apply one operation and return the affected primary key.
+
+    ``instance`` is the prefetched target for UPDATE/DELETE (``None`` if it
+    no longer exists).
+    """
+    if operation == "CREATE":
+        serializer = serializer_class(data=data, context={"user": user})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save().pk
+    if instance is None:
+        raise ObjectDoesNotExist(f"{serializer_class.Meta.model.__name__} {target_pk(data)} does not exist")
+    if operation == "UPDATE":
+        serializer = serializer_class(instance, data=data, partial=True, context={"user": user})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save().pk
+    if operation == "DELETE":
+        pk = instance.pk
+        instance.delete()
+        return pk
+    raise OperationError(f"Unknown operation {operation!r}")
+
+
+def error_detail(exc):
+    if isinstance(exc, ValidationError):
+        return exc.detail
+    if isinstance(exc, DjangoValidationError):
+        return exc.message_dict if hasattr(exc, "error_dict") else exc.messages
+    return {"detail": str(exc)}
+
+
+def _apply_group(model_name, ops):
+    """Apply ``ops`` (same ``model_name``) in order, recording each outcome."""
+    try:
+        serializer_class = get_serializer_class(model_name)
+    except OperationError as exc:
+        for op in ops:
+            finish(op, "FAILED", error=error_detail(exc))
+        return
+
+    model = serializer_class.Meta.model
+    target_ids = []
+    for op in ops:
+        if op.operation in ("UPDATE", "DELETE"):
+            try:
+                target_ids.append(model._meta.pk.to_python(target_pk(op.data)))
+            except (OperationError, DjangoValidationError):
+                pass  # reported per operation below
+    instances = model.objects.in_bulk(target_ids) if target_ids else {}
+
+    for op in ops:
+        instance = None
+        if op.operation in ("UPDATE", "DELETE"):
+            try:
+                instance = instances.get(model._meta.pk.to_python(target_pk(op.data)))
+            except (OperationError, DjangoValidationError) as exc:
+                op.attempts += 1
+                finish(op, "FAILED", error=error_detail(exc))
+                continue
+        if execute(op, serializer_class, instance) and op.operation == "DELETE":
+            instances.pop(instance.pk, None)
+
+
+def execute(op, serializer_class, instance=None):
+    """Apply ``op`` in a savepoint and record the outcome on it (not saved).
+
+    Returns ``True`` when the operation was applied. Transient database
+    errors leave ``op`` pending until ``MAX_ATTEMPTS`` is reached.
+    """
+    op.attempts += 1
+    try:
+        with transaction.atomic():
+            object_id = apply_operation(serializer_class, op.operation, op.data, instance, op.user)
+    except (
+        ValidationError,
+        DjangoValidationError,
+        ObjectDoesNotExist,
+        IntegrityError,
+        OperationError,
+    ) as exc:
+        finish(op, "FAILED", error=error_detail(exc))
+    except DatabaseError as exc:
+        logger.warning("Queued operation %s failed (attempt %s): %s", op.pk, op.attempts, exc)
+        if op.attempts >= MAX_ATTEMPTS:
+            finish(op, "FAILED", error=error_detail(exc))
+        else:
+            op.error = error_detail(exc)
+    except Exception as exc:  # a bad payload must not wedge the queue
+        logger.exception("Queued operation %s crashed", op.pk)
+        finish(op, "FAILED", error=error_detail(exc))
+    else:
+        finish(op, "APPLIED", object_id=object_id)
+        return True
+    return False
+
+
+def finish(op, status, object_id=None, error=None):
+    op.processed = True
+    op.status = status
+    op.error = error
+    op.processed_at = timezone.now()
+    if object_id is not None:
+        op.object_id = str(object_id)
+
+
+def process_batch(batch_size=DEFAULT_BATCH_SIZE):
+    """Claim and apply up to ``batch_size`` pending operations.
+
+    Returns ``{"applied": n, "failed": n, "retry": n}`` for the batch; an
+    empty dict means nothing was pending.
+    """
+    with transaction.atomic():
+        ops = list(
+            QueuedOperation.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("user")
+            .filter(processed=False)
+            .order_by("id")[:batch_size]
+        )
+        if not ops:
+            return {}
+
+        groups = OrderedDict()
+        for op in ops:
+            groups.setdefault(normalize_model_name(op.model_name), []).append(op)
+        for model_name, group in groups.items():
+            _apply_group(model_name, group)
+
+        QueuedOperation.objects.bulk_update(ops, OUTCOME_FIELDS)
+
+    summary = {"applied": 0, "failed": 0, "retry": 0}
+    for op in ops:
+        if op.status == "APPLIED":
+            summary["applied"] += 1
+        elif op.status == "FAILED":
+            summary["failed"] += 1
+        else:
+            summary["retry"] += 1
+    return summary
+
+
+def process_pending(batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """Run :func:`process_batch` until the queue is drained; return the totals."""
+    totals = {"applied": 0, "failed": 0, "retry": 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        summary = process_batch(batch_size)
+        if not summary:
+            break
+        batches += 1
+        for key, value in summary.items():
+            totals[key] += value
+        if summary["retry"] == sum(summary.values()):
+            # Only transient failures left; let the next run retry them.
+            break
+    return totals
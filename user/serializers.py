@@ -4,8 +4,7 @@ from rest_framework import serializers
 
 from inventory.models import Party
 from .models import CustomUser, PasswordResetCode
-from utils.geocode import reverse_geocode
-from setting.models import City, Area
+from utils.geocode import resolve_party_location
 from django_ledger.models.accounts import AccountModel
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the User model exposing basic fields."""
@@ -99,12 +98,13 @@ class PartySerializer(serializers.ModelSerializer):
         validated_data.pop("user", None)
         party = Party.objects.create(user=user, **validated_data)
         code=party.name[:3].upper()+str(party.id).zfill(4)
+        account = None
         # Basic account creation for the party if a chart of account exists
         try:
             from django_ledger.models.chart_of_accounts import ChartOfAccountModel
             coa = ChartOfAccountModel.objects.first()
             if coa:
-                AccountModel.objects.create(
+                account = AccountModel.objects.create(
                     name=party.name,
                     code=code,
                     role="asset_ca_receivables",
@@ -113,18 +113,9 @@ class PartySerializer(serializers.ModelSerializer):
                 )
         except Exception:
             pass
-        geo = reverse_geocode(validated_data.get("latitude"), validated_data.get("longitude"))
-        party.chart_of_account=account
-        if geo.get("ok"):
-            # upsert City/Area by name (simple)
-            if geo.get("city"):
-                city_obj, _ = City.objects.get_or_create(name=geo["city"])
-                party.city = city_obj
-            if geo.get("area"):
-                area_obj, _ = Area.objects.get_or_create(name=geo["area"], defaults={"city": party.city})
-                # if Area has FK to City, ensure you set it
-                party.area = area_obj
-            party.save()
+        party.chart_of_account = account
+        # local cache/gazetteer only; a remote lookup runs after commit
+        party.save(update_fields=["chart_of_account", *resolve_party_location(party)])
         return party
 
 
@@ -181,7 +172,7 @@ class PartyProfileUpdateSerializer(serializers.ModelSerializer):
         model = Party
         fields = (
             "name", "address", "phone", "proprietor", "license_no", "license_expiry"
-           ,"user_email", "new_password",
+           ,"latitude", "longitude", "user_email", "new_password",
         )
 
     def update(self, instance: Party, validated_data):
@@ -204,8 +195,13 @@ class PartyProfileUpdateSerializer(serializers.ModelSerializer):
             user.save(update_fields=["password"])
 
         # Update Party fields
+        moved = any(
+            k in validated_data and validated_data[k] != getattr(instance, k) for k in ("latitude", "longitude")
+        )
         for k, v in validated_data.items():
             setattr(instance, k, v)
+        if moved:
+            resolve_party_location(instance)
         instance.save()
 
         return instance
\ No newline at end of file
@@ -1,3 +1,65 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from inventory.models import Party
+from setting.models import Area, City, GeocodeCache
+from utils.geocode import nearest_area, reset_gazetteer, resolve_party_location, reverse_geocode
+
+
+class FakeBackend:
+    calls = []
+    address = {"city": "Lahore", "suburb": "Gulberg"}
+
+    def reverse(self, lat, lon):
+        from utils.geocode import NominatimBackend
+
+        self.calls.append((lat, lon))
+        response = mock.Mock(json=lambda: {"display_name": "Somewhere", "address": self.address})
+        with mock.patch("utils.geocode.requests.get", return_value=response):
+            return NominatimBackend().reverse(lat, lon)
+
+
+@override_settings(GEOCODE_BACKEND="user.tests.FakeBackend")
+class ReverseGeocodeTests(TestCase):
+    def setUp(self):
+        FakeBackend.calls = []
+        reset_gazetteer()
+        city = City.objects.create(name="Karachi")
+        self.area = Area.objects.create(name="Clifton", city=city)
+        for lon in ("67.030", "67.032"):
+            Party.objects.create(
+                name="c", address="a", phone="1", party_type="customer", area=self.area, latitude="24.810", longitude=lon
+            )
+
+    def test_known_area_resolves_offline(self):
+        geo = reverse_geocode(24.812, 67.034)
+        self.assertEqual((geo["source"], geo["area_id"], geo["city"]), ("gazetteer", self.area.pk, "Karachi"))
+        self.assertIsNone(nearest_area(25.5, 67.031))
+        self.assertEqual(FakeBackend.calls, [])
+
+        party = Party.objects.create(name="n", address="a", phone="1", latitude="24.8105", longitude="67.0315")
+        self.assertEqual(resolve_party_location(party), ["city", "area"])
+        self.assertEqual(party.area_id, self.area.pk)
+
+    def test_remote_answer_is_cached_and_tolerates_missing_district(self):
+        geo = reverse_geocode(31.5204, 74.3587)
+        self.assertEqual((geo["source"], geo["city"], geo["area"]), ("remote", "Lahore", "Gulberg"))
+        self.assertEqual(GeocodeCache.objects.count(), 1)
+
+        geo = reverse_geocode(31.52041, 74.35869)  # same rounded point
+        self.assertEqual((geo["source"], geo["city"]), ("cache", "Lahore"))
+        self.assertEqual(len(FakeBackend.calls), 1)
+
+        with mock.patch.object(FakeBackend, "address", {}):
+            geo = reverse_geocode(10, 10)
+        self.assertTrue(geo["ok"])
+        self.assertIsNone(geo["city"])
+
+    def test_registration_defers_remote_lookup(self):
+        party = Party.objects.create(name="r", address="a", phone="1", latitude="31.520400", longitude="74.358700")
+        with mock.patch("utils.geocode._get_executor") as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(resolve_party_location(party), [])
+                self.assertEqual(FakeBackend.calls, [])
+        executor.return_value.submit.assert_called_once()
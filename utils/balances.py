@@ -0,0 +1,110 @@
+"""Party running balances.
+
+``Party.current_balance`` is changed by documents with
+:func:`adjust_party_balance`, a single ``UPDATE ... SET current_balance =
+current_balance + delta``. The database applies it atomically, so two
+invoices posted at once for the same customer cannot lose an update, and
+no row lock is held beyond the statement itself.
+
+The ledger is the source of truth: :func:`reconcile_party_balances`
+recomputes balances from the party's own ``chart_of_account``.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django_ledger.models import TransactionModel
+
+from inventory.models import Party
+
+_CENT = Decimal("0.01")
+
+
+def adjust_party_balance(party, delta):
+    """Add ``delta`` to ``party``'s balance in the database and refresh it."""
+    if not delta:
+        return
+    Party.objects.filter(pk=party.pk).update(
+        current_balance=F("current_balance") + delta, updated_at=timezone.now()
+    )
+    party.refresh_from_db(fields=["current_balance", "updated_at"])
+
+
+def apply_party_balance_deltas(deltas):
+    """Apply ``{party_id: delta}`` in one ``bulk_update`` of ``F()`` expressions."""
+    timestamp = timezone.now()
+    rows = [
+        Party(pk=party_id, current_balance=F("current_balance") + delta, updated_at=timestamp)
+        for party_id, delta in deltas.items()
+        if delta
+    ]
+    if rows:
+        Party.objects.bulk_update(rows, ["current_balance", "updated_at"])
+
+
+def ledger_party_balances():
+    """Return ``({party_id: ledger balance}, [skipped party ids])``.
+
+    Only parties whose ``chart_of_account`` belongs to them alone can be
+    reconciled; parties sharing an account are skipped. The balance follows
+    the account's own debit/credit nature.
+    """
+    shared = set(
+        Party.objects.exclude(chart_of_account=None)
+        .values("chart_of_account")
+        .annotate(parties=Count("id"))
+        .filter(parties__gt=1)
+        .values_list("chart_of_account", flat=True)
+    )
+    parties = {}
+    skipped = []
+    for pk, account_id in Party.objects.exclude(chart_of_account=None).values_list("pk", "chart_of_account"):
+        if account_id in shared:
+            skipped.append(pk)
+        else:
+            parties[account_id] = pk
+
+    zero = Decimal("0")
+    sums = (
+        TransactionModel.objects.filter(account_id__in=parties)
+        .values("account_id", "account__balance_type")
+        .annotate(
+            debit=Coalesce(Sum("amount", filter=Q(tx_type=TransactionModel.DEBIT)), zero),
+            credit=Coalesce(Sum("amount", filter=Q(tx_type=TransactionModel.CREDIT)), zero),
+        )
+    )
+    balances = {pk: zero for pk in parties.values()}
+    for row in sums:
+        balance = row["debit"] - row["credit"]
+        if row["account__balance_type"] == "credit":
+            balance = -balance
+        balances[parties[row["account_id"]]] = Decimal(balance).quantize(_CENT)
+    return balances, skipped
+
+
+def reconcile_party_balances(fix=True):
+    """Compare stored balances with the ledger and, with ``fix``, correct them.
+
+    Returns ``(drift, skipped)`` where ``drift`` lists
+    ``{"party_id", "name", "stored", "ledger"}`` for every mismatch.
+    """
+    balances, skipped = ledger_party_balances()
+    drift = [
+        {"party_id": pk, "name": name, "stored": stored, "ledger": balances[pk]}
+        for pk, name, stored in Party.objects.filter(pk__in=balances).values_list("pk", "name", "current_balance")
+        if stored != balances[pk]
+    ]
+    if fix:
+        # Corrected by delta, so documents posted meanwhile are not overwritten.
+        apply_party_balance_deltas({row["party_id"]: row["ledger"] - row["stored"] for row in drift})
+    return drift, skipped
+
+
+__all__ = [
+    "adjust_party_balance",
+    "apply_party_balance_deltas",
+    "ledger_party_balances",
+    "reconcile_party_balances",
+]
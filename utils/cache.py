@@ -0,0 +1,87 @@
+"""In-process caches shared by the apps.
+
+:class:`LRUCache` is a bounded, thread-safe mapping for per-worker caches
+such as resolved prices and route distances. ``get`` returns :data:`MISSING`
+for an absent key unless a default is given, so ``None`` can be cached as a
+real value.
+
+:class:`VersionKey` invalidates such caches in every worker: a writer bumps
+a version number in the Django cache after commit, and a worker that reads
+a new number drops its copy. That only reaches other processes when
+``CACHES`` is shared (Redis, Memcached, database); the default LocMemCache
+is per process. Give a ``ttl`` so copies also expire on their own there.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+#: returned by :meth:`LRUCache.get` for an absent key
+MISSING = object()
+
+
+class LRUCache:
+    """A small thread-safe least-recently-used mapping."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class VersionKey:
+    """A version number under ``key`` in the Django cache."""
+
+    def __init__(self, key, ttl=None):
+        self.key = key
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._seen = None
+        self._checked_at = 0.0
+
+    def bump(self):
+        """Make every worker's copy stale."""
+        try:
+            cache.incr(self.key)
+        except ValueError:
+            cache.set(self.key, 2, None)
+
+    def current(self):
+        return cache.get_or_set(self.key, 1, None)
+
+    def expired(self):
+        """Whether this worker's copy must be dropped; ``True`` once per bump or ``ttl``."""
+        version = self.current()
+        now = time.monotonic()
+        with self._lock:
+            stale = self.ttl is not None and now - self._checked_at > self.ttl
+            if self._seen == version and not stale:
+                return False
+            self._seen, self._checked_at = version, now
+            return True
+
+
+__all__ = ["LRUCache", "MISSING", "VersionKey"]
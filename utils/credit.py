@@ -0,0 +1,106 @@
+"""Customer credit limits.
+
+A customer's exposure is ``Party.current_balance``: the running outstanding
+that credit sales raise and returns and recoveries lower, each with one
+atomic ``UPDATE`` (see :mod:`utils.balances`). A credit check therefore
+reads two columns of one row instead of summing open invoices and payment
+schedules.
+
+A ``credit_limit`` of 0 means the customer has no limit.
+"""
+
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from inventory.models import Party
+
+#: amount by which a customer is over its limit; matched by the partial
+#: index ``party_credit_exposure_idx``
+OVER_LIMIT = F("current_balance") - F("credit_limit")
+
+
+class CreditLimitExceeded(ValidationError):
+    """Raised when a sale would take a customer past its credit limit."""
+
+    def __init__(self, party, amount, limit, exposure):
+        self.party = party
+        self.amount = amount
+        self.limit = limit
+        self.exposure = exposure
+        super().__init__(
+            f"Credit limit of {limit} exceeded for {party}: exposure {exposure}, new amount {amount}.",
+            code="credit_limit",
+        )
+
+
+def credit_status(party):
+    """Return ``{"limit", "exposure", "available"}`` for ``party`` (instance or id).
+
+    ``available`` is ``None`` for a customer without a limit.
+    """
+    party_id = getattr(party, "pk", party)
+    limit, exposure = Party.objects.filter(pk=party_id).values_list("credit_limit", "current_balance").get()
+    return {
+        "limit": limit,
+        "exposure": exposure,
+        "available": limit - exposure if limit else None,
+    }
+
+
+def check_credit(party, amount):
+    """Raise :class:`CreditLimitExceeded` if ``amount`` more would pass the limit.
+
+    A read-only check for documents that do not move the balance yet, such
+    as a pending order.
+    """
+    amount = Decimal(amount or 0)
+    status = credit_status(party)
+    if amount > 0 and status["available"] is not None and amount > status["available"]:
+        raise CreditLimitExceeded(party, amount, status["limit"], status["exposure"])
+
+
+def reserve_credit(party, amount):
+    """Add ``amount`` to ``party``'s exposure if it stays within the limit.
+
+    The limit check and the increment are one conditional ``UPDATE``, so two
+    sales confirmed at once cannot both slip under the same headroom. Raises
+    :class:`CreditLimitExceeded` and leaves the balance untouched otherwise.
+    """
+    amount = Decimal(amount or 0)
+    if not amount:
+        return
+    within_limit = Q(credit_limit=0) | Q(credit_limit__gte=F("current_balance") + amount)
+    updated = Party.objects.filter(within_limit, pk=party.pk).update(
+        current_balance=F("current_balance") + amount, updated_at=timezone.now()
+    )
+    if not updated:
+        status = credit_status(party)
+        raise CreditLimitExceeded(party, amount, status["limit"], status["exposure"])
+    party.refresh_from_db(fields=["current_balance", "updated_at"])
+
+
+def customers_over_limit(queryset=None):
+    """Customers whose exposure is above their credit limit, worst first.
+
+    Rows are annotated with ``over_limit``, the amount above the limit.
+    """
+    if queryset is None:
+        queryset = Party.objects.all()
+    return (
+        queryset.filter(party_type="customer", credit_limit__gt=0)
+        .annotate(over_limit=OVER_LIMIT)
+        .filter(over_limit__gt=0)
+        .order_by("-over_limit", "pk")
+    )
+
+
+__all__ = [
+    "CreditLimitExceeded",
+    "check_credit",
+    "credit_status",
+    "customers_over_limit",
+    "reserve_credit",
+]
@@ -1,10 +1,70 @@
+"""Reverse geocoding of customer locations.
+
+:func:`reverse_geocode` answers from, in order:
+
+1. :class:`~setting.models.GeocodeCache`, the persistent store of earlier
+   remote answers keyed by coordinates rounded to
+   ``GEOCODE_CACHE_PRECISION`` decimals (3 is about 110 m);
+2. an offline gazetteer of our own areas. Each ``Area`` is placed at the
+   mean location of its customers and indexed in a grid of
+   ``GEOCODE_GRID_DEGREES`` cells; the nearest area within
+   ``GEOCODE_GAZETTEER_MAX_KM`` wins;
+3. the remote backend (``GEOCODE_BACKEND``, Nominatim by default, empty to
+   disable), on a miss only. Its answers are cached.
+
+Registration and profile updates call :func:`resolve_party_location`, which
+only uses the local sources and leaves a remote lookup to a background
+thread after commit, so no request waits on an external round trip.
+"""
+
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import ROUND_HALF_UP, Decimal
+
 import requests
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Avg
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
 
 NOMINATIM_URL = "https://nominatim.openstreetmap.org/reverse"
 HEADERS = {"User-Agent": "pharma-erp/1.0 (support@yourdomain.com)"}
+EARTH_RADIUS_KM = 6371.0088
 
-def reverse_geocode(lat: float, lon: float) -> dict:
-    try:
+CACHE_PRECISION = getattr(settings, "GEOCODE_CACHE_PRECISION", 3)
+GRID_DEGREES = getattr(settings, "GEOCODE_GRID_DEGREES", 0.05)
+GAZETTEER_MAX_KM = getattr(settings, "GEOCODE_GAZETTEER_MAX_KM", 3.0)
+GAZETTEER_TTL = getattr(settings, "GEOCODE_GAZETTEER_TTL", 3600)
+
+ADDRESS_FIELDS = ("display", "city", "area", "road", "postcode", "state", "country", "raw")
+
+_gazetteer_lock = threading.Lock()
+_gazetteer = {"loaded_at": None, "grid": {}}
+_executor = None
+
+
+def haversine_km(a, b):
+    """Great-circle distance in km between ``(lat, lon)`` points ``a`` and ``b``."""
+    lat1, lon1 = map(math.radians, a)
+    lat2, lon2 = map(math.radians, b)
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+# --- Remote backends -------------------------------------------------------------
+
+class NominatimBackend:
+    """OpenStreetMap Nominatim reverse lookup."""
+
+    timeout = getattr(settings, "GEOCODE_TIMEOUT", 5)
+
+    def reverse(self, lat, lon):
         r = requests.get(
             NOMINATIM_URL,
             params={
@@ -13,24 +73,235 @@ def reverse_geocode(lat: float, lon: float) -> dict:
                 "lon": lon,
                 "addressdetails": 1,
                 "zoom": 18,
-                "accept-language": "en"
+                "accept-language": "en",
             },
             headers=HEADERS,
-            timeout=10,
+            timeout=self.timeout,
         )
         r.raise_for_status()
         data = r.json()
         addr = data.get("address", {})
+        city = addr.get("district") or addr.get("city") or addr.get("county")
         return {
-            "ok": True,
             "display": data.get("display_name"),
-            "city": addr.get("district").replace(' District',''),
-            "area": addr.get("town"),
+            "city": city.replace(" District", "") if city else None,
+            "area": addr.get("town") or addr.get("suburb") or addr.get("village"),
             "road": addr.get("road"),
             "postcode": addr.get("postcode"),
             "state": addr.get("state"),
             "country": addr.get("country"),
             "raw": addr,
         }
+
+
+def get_backend():
+    """The configured remote backend, or ``None`` when remote lookups are off."""
+    path = getattr(settings, "GEOCODE_BACKEND", "utils.geocode.NominatimBackend")
+    return import_string(path)() if path else None
+
+
+# --- Persistent cache ------------------------------------------------------------
+
+def _cache_key(lat, lon):
+    quantum = Decimal(1).scaleb(-CACHE_PRECISION)
+    return (
+        Decimal(str(lat)).quantize(quantum, ROUND_HALF_UP),
+        Decimal(str(lon)).quantize(quantum, ROUND_HALF_UP),
+    )
+
+
+def _cached(lat, lon):
+    from setting.models import GeocodeCache
+
+    latitude, longitude = _cache_key(lat, lon)
+    return (
+        GeocodeCache.objects.filter(latitude=latitude, longitude=longitude)
+        .values_list("result", flat=True)
+        .first()
+    )
+
+
+def _store(lat, lon, result):
+    from setting.models import GeocodeCache
+
+    latitude, longitude = _cache_key(lat, lon)
+    try:
+        with transaction.atomic():
+            GeocodeCache.objects.get_or_create(latitude=latitude, longitude=longitude, defaults={"result": result})
+    except IntegrityError:
+        pass  # stored meanwhile by another worker
+
+
+# --- Offline gazetteer -----------------------------------------------------------
+
+def _cell(lat, lon):
+    return (math.floor(lat / GRID_DEGREES), math.floor(lon / GRID_DEGREES))
+
+
+def reset_gazetteer():
+    """Drop the in-process gazetteer; it is rebuilt on the next lookup."""
+    with _gazetteer_lock:
+        _gazetteer["loaded_at"] = None
+
+
+def _load_gazetteer():
+    from inventory.models import Party
+
+    grid = {}
+    rows = (
+        Party.objects.exclude(area=None)
+        .exclude(latitude=None)
+        .exclude(longitude=None)
+        .values("area_id", "area__name", "area__city_id", "area__city__name")
+        .annotate(lat=Avg("latitude"), lon=Avg("longitude"))
+    )
+    for row in rows:
+        point = (float(row["lat"]), float(row["lon"]))
+        grid.setdefault(_cell(*point), []).append((point, row))
+    return grid
+
+
+def _grid():
+    now = time.monotonic()
+    with _gazetteer_lock:
+        loaded_at = _gazetteer["loaded_at"]
+        if loaded_at is None or now - loaded_at > GAZETTEER_TTL:
+            _gazetteer["grid"] = _load_gazetteer()
+            _gazetteer["loaded_at"] = now
+        return _gazetteer["grid"]
+
+
+def nearest_area(lat, lon, max_km=None):
+    """The gazetteer row of the area nearest ``(lat, lon)`` within ``max_km``, or ``None``.
+
+    Only the grid cells that can hold a match within ``max_km`` are scanned.
+    """
+    max_km = GAZETTEER_MAX_KM if max_km is None else max_km
+    grid = _grid()
+    point = (float(lat), float(lon))
+    row, col = _cell(*point)
+    # a degree of longitude shrinks with latitude; widen the column reach to match
+    reach_lat = math.ceil(max_km / (111.0 * GRID_DEGREES))
+    reach_lon = math.ceil(max_km / (111.0 * GRID_DEGREES * max(math.cos(math.radians(point[0])), 0.01)))
+    best, best_km = None, max_km
+    for i in range(row - reach_lat, row + reach_lat + 1):
+        for j in range(col - reach_lon, col + reach_lon + 1):
+            for centre, area in grid.get((i, j), ()):
+                km = haversine_km(point, centre)
+                if km <= best_km:
+                    best, best_km = area, km
+    return best
+
+
+# --- Lookups ---------------------------------------------------------------------
+
+def reverse_geocode(lat, lon, remote=True):
+    """Resolve ``(lat, lon)`` to an address dict with ``ok`` and ``source``.
+
+    ``source`` is ``"cache"``, ``"gazetteer"`` or ``"remote"``. Gazetteer
+    answers also carry ``area_id``/``city_id``. With ``remote=False`` a miss
+    returns ``{"ok": False, ...}`` instead of calling the backend.
+    """
+    if lat in (None, "") or lon in (None, ""):
+        return {"ok": False, "error": "Latitude and longitude are required."}
+
+    cached = _cached(lat, lon)
+    if cached is not None:
+        return {**cached, "ok": True, "source": "cache"}
+
+    area = nearest_area(lat, lon)
+    if area is not None:
+        return {
+            **dict.fromkeys(ADDRESS_FIELDS),
+            "ok": True,
+            "source": "gazetteer",
+            "city": area["area__city__name"],
+            "area": area["area__name"],
+            "city_id": area["area__city_id"],
+            "area_id": area["area_id"],
+        }
+
+    backend = get_backend() if remote else None
+    if backend is None:
+        return {"ok": False, "error": "No offline match."}
+    try:
+        result = backend.reverse(lat, lon)
     except Exception as e:
+        logger.warning("Reverse geocoding %s,%s failed: %s", lat, lon, e)
         return {"ok": False, "error": str(e)}
+    _store(lat, lon, result)
+    return {**result, "ok": True, "source": "remote"}
+
+
+def apply_location(party, geo):
+    """Set ``party.city``/``party.area`` from a successful lookup; return the changed fields."""
+    from setting.models import Area, City
+
+    if not geo.get("ok"):
+        return []
+    if geo.get("area_id"):
+        party.city_id, party.area_id = geo.get("city_id"), geo["area_id"]
+        return ["city", "area"]
+    changed = []
+    # upsert City/Area by name
+    if geo.get("city"):
+        party.city, _ = City.objects.get_or_create(name=geo["city"])
+        changed.append("city")
+    if geo.get("area"):
+        party.area, _ = Area.objects.get_or_create(name=geo["area"], defaults={"city": party.city})
+        changed.append("area")
+    return changed
+
+
+def _resolve_remote(party_id, lat, lon):
+    from inventory.models import Party
+
+    try:
+        geo = reverse_geocode(lat, lon)
+        party = Party.objects.filter(pk=party_id, latitude=lat, longitude=lon).first()
+        if party is not None and apply_location(party, geo):
+            Party.objects.filter(pk=party_id).update(
+                city=party.city_id, area=party.area_id, updated_at=timezone.now()
+            )
+    except Exception:
+        logger.exception("Background geocoding of party %s failed", party_id)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, "GEOCODE_WORKERS", 2)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="geocode")
+    return _executor
+
+
+def resolve_party_location(party):
+    """Fill ``party``'s city/area from local sources; look it up remotely later on a miss.
+
+    Returns the changed field names (the caller saves them). The remote
+    lookup runs after commit in a background thread and updates the party
+    only if its coordinates are still the ones looked up.
+    """
+    if party.latitude is None or party.longitude is None:
+        return []
+    geo = reverse_geocode(party.latitude, party.longitude, remote=False)
+    if geo.get("ok"):
+        return apply_location(party, geo)
+    if get_backend() is not None:
+        args = (party.pk, party.latitude, party.longitude)
+        transaction.on_commit(lambda: _get_executor().submit(_resolve_remote, *args))
+    return []
+
+
+__all__ = [
+    "NominatimBackend",
+    "apply_location",
+    "get_backend",
+    "haversine_km",
+    "nearest_area",
+    "reset_gazetteer",
+    "resolve_party_location",
+    "reverse_geocode",
+]
@@ -0,0 +1,669 @@
+"""Bulk ingestion of sale and purchase invoices.
+
+Creating invoices through ``SaleInvoiceSerializer.create`` runs the model
+``save()`` side effects (stock, party balance, payment schedule, journal
+entry) one line and one invoice at a time. The importers below take a whole
+batch of invoices, validate them together against masters resolved with a
+handful of ``in_bulk`` lookups, and write invoices, items, stock movements,
+payment schedules and journal entries with ``bulk_create``.
+
+Each importer returns one result dict per input invoice::
+
+    {"index": 0, "invoice_no": "INV-1", "status": "created", "id": 12, "errors": {}}
+    {"index": 1, "invoice_no": "INV-2", "status": "error", "id": None, "errors": {...}}
+
+Invalid invoices are skipped; the valid ones are written in one transaction.
+"""
+
+import csv
+import io
+import json
+from collections import OrderedDict, defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from finance.models import PaymentTerm
+from inventory.models import Batch, Party, Product
+from purchase.models import PurchaseInvoice, PurchaseInvoiceItem
+from sale.models import SaleInvoice, SaleInvoiceItem
+from setting.constants import TAX_PAYABLE_ACCOUNT_CODE, TAX_RECEIVABLE_ACCOUNT_CODE
+from setting.models import Warehouse
+from utils.balances import apply_party_balance_deltas
+from utils.ledger import bulk_create_journal_entries, ledger_poster
+from utils.pdf import schedule_prerender
+from utils.schedules import create_payment_schedules
+from utils.stock import bulk_stock_in, take_fefo, write_stock_out
+
+ITEM_PREFIX = "item_"
+PAYMENT_METHODS = ("Cash", "Credit")
+
+
+# --- Loading -----------------------------------------------------------------
+
+def load_invoices(content, fmt="json"):
+    """Parse invoices from JSON or CSV text (``str`` or ``bytes``).
+
+    JSON may be a list of invoices or ``{"invoices": [...]}``. CSV has one
+    row per line item: invoice columns are repeated on every row and item
+    columns are prefixed with ``item_`` (``item_product``, ``item_quantity``
+    ...). Rows are grouped into invoices by ``invoice_no`` in file order.
+    """
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig")
+
+    if fmt == "json":
+        payload = json.loads(content)
+        if isinstance(payload, dict):
+            payload = payload.get("invoices", [])
+        return payload
+
+    if fmt != "csv":
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    invoices = OrderedDict()
+    for row in csv.DictReader(io.StringIO(content)):
+        header = {k: v for k, v in row.items() if k and not k.startswith(ITEM_PREFIX) and v != ""}
+        item = {
+            k[len(ITEM_PREFIX):]: v
+            for k, v in row.items()
+            if k and k.startswith(ITEM_PREFIX) and v != ""
+        }
+        invoice = invoices.setdefault(header.get("invoice_no"), {**header, "items": []})
+        if item:
+            invoice["items"].append(item)
+    return list(invoices.values())
+
+
+# --- Field cleaning ----------------------------------------------------------
+
+def _decimal(data, field, errors, default=None):
+    value = data.get(field, default)
+    if value in (None, ""):
+        if default is None:
+            errors[field] = "This field is required."
+        return default
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        errors[field] = "A valid number is required."
+
+
+def _integer(data, field, errors, default=None, minimum=0):
+    value = data.get(field, default)
+    if value in (None, ""):
+        if default is None:
+            errors[field] = "This field is required."
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        errors[field] = "A valid integer is required."
+        return None
+    if value < minimum:
+        errors[field] = f"Ensure this value is greater than or equal to {minimum}."
+    return value
+
+
+def _date(data, field, errors):
+    value = data.get(field)
+    parsed = parse_date(str(value)) if value else None
+    if not parsed:
+        errors[field] = "A valid date (YYYY-MM-DD) is required."
+    return parsed
+
+
+def _pk(data, field, errors, required=True):
+    value = data.get(field)
+    if value in (None, ""):
+        if required:
+            errors[field] = "This field is required."
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        errors[field] = "A valid primary key is required."
+
+
+def _not_a_dict(value):
+    return f"Invalid data. Expected a dictionary, but got {type(value).__name__}."
+
+
+def _items(raw):
+    items = raw.get("items")
+    return items if isinstance(items, list) else []
+
+
+def _clean_header(raw, party_field, statuses):
+    errors = {}
+    clean = {
+        "invoice_no": str(raw.get("invoice_no") or "").strip(),
+        "company_invoice_number": raw.get("company_invoice_number") or None,
+        "date": _date(raw, "date", errors),
+        "party_id": _pk(raw, party_field, errors),
+        "warehouse_id": _pk(raw, "warehouse", errors),
+        "payment_term_id": _pk(raw, "payment_term", errors, required=False),
+        "payment_method": raw.get("payment_method") or "Cash",
+        "discount": _decimal(raw, "discount", errors, Decimal("0")),
+        "tax": _decimal(raw, "tax", errors, Decimal("0")),
+        "paid_amount": _decimal(raw, "paid_amount", errors, Decimal("0")),
+        "status": raw.get("status") or "Pending",
+    }
+    if not clean["invoice_no"]:
+        errors["invoice_no"] = "This field is required."
+    if clean["payment_method"] not in PAYMENT_METHODS:
+        errors["payment_method"] = f"Must be one of {', '.join(PAYMENT_METHODS)}."
+    if clean["status"] not in dict(statuses):
+        errors["status"] = f"Must be one of {', '.join(dict(statuses))}."
+    if not raw.get("items"):
+        errors["items"] = "At least one item is required."
+    elif not isinstance(raw["items"], list):
+        errors["items"] = "Expected a list of items."
+    return clean, errors
+
+
+def _check_masters(clean, errors, parties, warehouses, terms, party_field):
+    if clean["party_id"] is not None and clean["party_id"] not in parties:
+        errors[party_field] = f"Invalid pk \"{clean['party_id']}\" - object does not exist."
+    if clean["warehouse_id"] is not None and clean["warehouse_id"] not in warehouses:
+        errors["warehouse"] = f"Invalid pk \"{clean['warehouse_id']}\" - object does not exist."
+    if clean["payment_term_id"] is not None and clean["payment_term_id"] not in terms:
+        errors["payment_term"] = f"Invalid pk \"{clean['payment_term_id']}\" - object does not exist."
+
+
+def _check_products(lines, item_errors, products):
+    for line, line_errors in zip(lines, item_errors):
+        if line["product_id"] is not None and line["product_id"] not in products:
+            line_errors["product"] = f"Invalid pk \"{line['product_id']}\" - object does not exist."
+
+
+def _check_batches(clean, batches):
+    """Flag given batches that are not of the line's product in the invoice warehouse."""
+    for line, line_errors in zip(clean["lines"], clean["item_errors"]):
+        if line["batch_id"] is None or "batch" in line_errors:
+            continue
+        if batches.get(line["batch_id"]) != (line["product_id"], clean["warehouse_id"]):
+            line_errors["batch"] = (
+                f"Batch \"{line['batch_id']}\" does not belong to this product and warehouse."
+            )
+
+
+def _duplicate_numbers(cleaned, model):
+    numbers = [clean["invoice_no"] for clean, _, _ in cleaned if clean["invoice_no"]]
+    existing = set(model.objects.filter(invoice_no__in=numbers).values_list("invoice_no", flat=True))
+    seen = set()
+    for clean, _, errors in cleaned:
+        number = clean["invoice_no"]
+        if number in existing or number in seen:
+            errors["invoice_no"] = "Invoice with this invoice no already exists."
+        seen.add(number)
+
+
+def _total_amount(raw, lines, errors):
+    if raw.get("total_amount") in (None, ""):
+        return sum((line["amount"] or 0 for line in lines), Decimal("0"))
+    return _decimal(raw, "total_amount", errors)
+
+
+def _tax_account(code):
+    return ledger_poster.get_account(code)
+
+
+def _result(index, clean, errors, invoice=None):
+    return {
+        "index": index,
+        "invoice_no": clean.get("invoice_no"),
+        "status": "error" if errors else "created",
+        "id": invoice.pk if invoice else None,
+        "errors": errors,
+    }
+
+
+# --- Sale invoices -------------------------------------------------------------
+
+def _take_batch(queue, batch, quantity):
+    """Draw ``quantity`` from one locked ``batch`` of a FEFO ``queue``, like ``take_fefo``."""
+    batch.quantity -= quantity
+    if not batch.quantity:
+        queue.remove(batch)
+    return [(batch, quantity)]
+
+
+def _clean_sale_items(raw):
+    lines, item_errors = [], []
+    for raw_item in _items(raw):
+        errors = {}
+        item = raw_item if isinstance(raw_item, dict) else {}
+        amount = _decimal(item, "amount", errors)
+        lines.append(
+            {
+                "product_id": _pk(item, "product", errors),
+                "batch_id": _pk(item, "batch", errors, required=False),
+                "quantity": _integer(item, "quantity", errors, minimum=1),
+                "bonus": _integer(item, "bonus", errors, default=0),
+                "packing": _integer(item, "packing", errors, default=0),
+                "rate": _decimal(item, "rate", errors),
+                "discount1": _decimal(item, "discount1", errors, Decimal("0")),
+                "discount2": _decimal(item, "discount2", errors, Decimal("0")),
+                "amount": amount,
+                "net_amount": _decimal(item, "net_amount", errors, amount),
+                "bid_amount": _decimal(item, "bid_amount", errors, Decimal("0")),
+            }
+        )
+        if item is not raw_item:
+            errors = {"non_field_errors": _not_a_dict(raw_item)}
+        item_errors.append(errors)
+    return lines, item_errors
+
+
+@transaction.atomic
+def import_sale_invoices(payload, check_credit_limits=False):
+    """Validate and create many sale invoices with set-based writes.
+
+    With ``check_credit_limits`` the customers are locked and an invoice
+    whose outstanding would take its customer past ``credit_limit`` is
+    rejected, as ``SaleInvoice.save`` does for a single invoice.
+    """
+    cleaned = []
+    for raw in payload:
+        data = raw if isinstance(raw, dict) else {}
+        clean, errors = _clean_header(data, "customer", SaleInvoice.STATUS_CHOICES)
+        lines, item_errors = _clean_sale_items(data)
+        clean["lines"] = lines
+        clean["item_errors"] = item_errors
+        clean["total_amount"] = _total_amount(data, lines, errors)
+        if data is not raw:
+            errors = {"non_field_errors": _not_a_dict(raw)}
+        cleaned.append((clean, raw, errors))
+
+    customers = Party.objects.filter(party_type="customer").select_related("chart_of_account")
+    if check_credit_limits:
+        customers = customers.select_for_update(of=("self",))
+    customers = customers.in_bulk(
+        {clean["party_id"] for clean, _, _ in cleaned if clean["party_id"]}
+    )
+    warehouses = Warehouse.objects.select_related(
+        "default_sales_account", "default_cash_account", "default_bank_account"
+    ).in_bulk({clean["warehouse_id"] for clean, _, _ in cleaned if clean["warehouse_id"]})
+    terms = PaymentTerm.objects.in_bulk(
+        {clean["payment_term_id"] for clean, _, _ in cleaned if clean["payment_term_id"]}
+    )
+    products = Product.objects.in_bulk(
+        {line["product_id"] for clean, _, _ in cleaned for line in clean["lines"] if line["product_id"]}
+    )
+    batches = {
+        pk: (product_id, warehouse_id)
+        for pk, product_id, warehouse_id in Batch.objects.filter(
+            pk__in={line["batch_id"] for clean, _, _ in cleaned for line in clean["lines"] if line["batch_id"]}
+        ).values_list("pk", "product_id", "warehouse_id")
+    }
+    _duplicate_numbers(cleaned, SaleInvoice)
+
+    for clean, _, errors in cleaned:
+        _check_masters(clean, errors, customers, warehouses, terms, "customer")
+        _check_products(clean["lines"], clean["item_errors"], products)
+        _check_batches(clean, batches)
+        if any(clean["item_errors"]):
+            errors["items"] = clean["item_errors"]
+        if not errors:
+            grand_total = clean["total_amount"] - clean["discount"] + clean["tax"]
+            if clean["paid_amount"] > grand_total:
+                errors["paid_amount"] = "Paid amount cannot exceed grand total."
+
+    # Lock every candidate batch once and allocate FEFO per invoice; lines
+    # that name a batch are drawn from it first.
+    valid = [(clean, errors) for clean, _, errors in cleaned if not errors]
+    queues = defaultdict(list)
+    locked = Batch.objects.select_for_update().filter(
+        warehouse_id__in={clean["warehouse_id"] for clean, _ in valid},
+        product_id__in={line["product_id"] for clean, _ in valid for line in clean["lines"]},
+        quantity__gt=0,
+    ).order_by("warehouse_id", "product_id", "expiry_date", "id")
+    for batch in locked:
+        queues[(batch.warehouse_id, batch.product_id)].append(batch)
+    locked = {batch.pk: batch for queue in queues.values() for batch in queue}
+
+    exposure = {pk: customer.current_balance for pk, customer in customers.items()}
+    takes = {}
+    for clean, errors in valid:
+        demand, pinned = defaultdict(int), defaultdict(int)
+        for line in clean["lines"]:
+            demand[line["product_id"]] += line["quantity"] + line["bonus"]
+            if line["batch_id"]:
+                pinned[line["batch_id"]] += line["quantity"] + line["bonus"]
+        short = [
+            f"Insufficient stock for {products[product_id].name}"
+            for product_id, needed in demand.items()
+            if sum(b.quantity for b in queues[(clean["warehouse_id"], product_id)]) < needed
+        ] + [
+            f"Insufficient stock in batch {batch_id}"
+            for batch_id, needed in pinned.items()
+            if batch_id not in locked or locked[batch_id].quantity < needed
+        ]
+        if short:
+            errors["items"] = short
+            continue
+        if check_credit_limits:
+            customer = customers[clean["party_id"]]
+            outstanding = clean["total_amount"] - clean["discount"] + clean["tax"] - clean["paid_amount"]
+            if customer.credit_limit and exposure[customer.pk] + outstanding > customer.credit_limit:
+                errors["customer"] = (
+                    f"Credit limit of {customer.credit_limit} exceeded: "
+                    f"exposure {exposure[customer.pk]}, new amount {outstanding}."
+                )
+                continue
+            exposure[customer.pk] += outstanding
+        slices = {}
+        for index, line in sorted(enumerate(clean["lines"]), key=lambda pair: not pair[1]["batch_id"]):
+            queue = queues[(clean["warehouse_id"], line["product_id"])]
+            quantity = line["quantity"] + line["bonus"]
+            if line["batch_id"]:
+                slices[index] = _take_batch(queue, locked[line["batch_id"]], quantity)
+            else:
+                slices[index] = take_fefo(queue, quantity)
+        takes[id(clean)] = [(line["product_id"], slices[index]) for index, line in enumerate(clean["lines"])]
+
+    ready = [clean for clean, _, errors in cleaned if not errors]
+    invoices = SaleInvoice.objects.bulk_create(
+        [
+            SaleInvoice(
+                invoice_no=clean["invoice_no"],
+                company_invoice_number=clean["company_invoice_number"],
+                date=clean["date"],
+                customer=customers[clean["party_id"]],
+                warehouse=warehouses[clean["warehouse_id"]],
+                total_amount=clean["total_amount"],
+                sub_total=clean["total_amount"],
+                discount=clean["discount"],
+                tax=clean["tax"],
+                grand_total=clean["total_amount"] - clean["discount"] + clean["tax"],
+                paid_amount=clean["paid_amount"],
+                net_amount=clean["total_amount"] - clean["discount"] + clean["tax"] - clean["paid_amount"],
+                payment_method=clean["payment_method"],
+                payment_term=terms.get(clean["payment_term_id"]),
+                status=clean["status"],
+            )
+            for clean in ready
+        ]
+    )
+    SaleInvoiceItem.objects.bulk_create(
+        [
+            SaleInvoiceItem(
+                invoice=invoice,
+                product=products[line["product_id"]],
+                # the given batch, else the first FEFO batch the line was drawn from
+                batch_id=slices[0][0].pk,
+                quantity=line["quantity"],
+                bonus=line["bonus"],
+                packing=line["packing"],
+                rate=line["rate"],
+                discount1=line["discount1"],
+                discount2=line["discount2"],
+                amount=line["amount"],
+                net_amount=line["net_amount"],
+                bid_amount=line["bid_amount"],
+            )
+            for invoice, clean in zip(invoices, ready)
+            for line, (_, slices) in zip(clean["lines"], takes[id(clean)])
+        ]
+    )
+    write_stock_out(
+        [
+            {
+                "product": products[product_id],
+                "batch": batch,
+                "quantity": quantity,
+                "reason": f"Sale Invoice {invoice.invoice_no}",
+                "ref_model": "SaleInvoice",
+                "ref_id": invoice.pk,
+            }
+            for invoice, clean in zip(invoices, ready)
+            for product_id, slices in takes[id(clean)]
+            for batch, quantity in slices
+        ]
+    )
+
+    balances = defaultdict(Decimal)
+    outstanding = [(invoice, invoice.grand_total - invoice.paid_amount) for invoice in invoices]
+    for invoice, amount in outstanding:
+        balances[invoice.customer_id] += amount
+    apply_party_balance_deltas(balances)
+    create_payment_schedules(outstanding, "sale_invoice")
+
+    tax_account = _tax_account(TAX_PAYABLE_ACCOUNT_CODE) if any(i.tax for i in invoices) else None
+    posted = [
+        invoice
+        for invoice in invoices
+        if invoice.warehouse.default_sales_account and invoice.customer.chart_of_account
+    ]
+    journal_entries = bulk_create_journal_entries(
+        [
+            (invoice.date, f"Sale Invoice {invoice.invoice_no}", invoice.journal_transactions(tax_account))
+            for invoice in posted
+        ]
+    )
+    for invoice, je in zip(posted, journal_entries):
+        invoice.journal_entry = je
+    SaleInvoice.objects.bulk_update([i for i in posted if i.journal_entry], ["journal_entry"])
+
+    schedule_prerender(*invoices)
+
+    created = {id(clean): invoice for clean, invoice in zip(ready, invoices)}
+    return [
+        _result(index, clean, errors, created.get(id(clean)))
+        for index, (clean, _, errors) in enumerate(cleaned)
+    ]
+
+
+# --- Purchase invoices -------------------------------------------------------
+
+def _clean_purchase_items(raw):
+    lines, item_errors = [], []
+    for raw_item in _items(raw):
+        errors = {}
+        item = raw_item if isinstance(raw_item, dict) else {}
+        lines.append(
+            {
+                "product_id": _pk(item, "product", errors),
+                "batch_number": str(item.get("batch_number") or "").strip(),
+                "expiry_date": _date(item, "expiry_date", errors),
+                "quantity": _integer(item, "quantity", errors, minimum=1),
+                "bonus": _integer(item, "bonus", errors, default=0),
+                "purchase_price": _decimal(item, "purchase_price", errors),
+                "sale_price": _decimal(item, "sale_price", errors),
+                "discount": _decimal(item, "discount", errors, Decimal("0")),
+                "amount": _decimal(item, "amount", errors),
+            }
+        )
+        if not lines[-1]["batch_number"]:
+            errors["batch_number"] = "This field is required."
+        if item is not raw_item:
+            errors = {"non_field_errors": _not_a_dict(raw_item)}
+        item_errors.append(errors)
+    return lines, item_errors
+
+
+def _duplicate_batches(cleaned):
+    numbers = {line["batch_number"] for clean, _, _ in cleaned for line in clean["lines"]}
+    taken = set(
+        PurchaseInvoiceItem.objects.filter(batch_number__in=numbers).values_list("batch_number", flat=True)
+    )
+    existing = set(Batch.objects.filter(batch_number__in=numbers).values_list("product_id", "batch_number"))
+    seen = set()
+    for clean, _, _ in cleaned:
+        for line, errors in zip(clean["lines"], clean["item_errors"]):
+            number = line["batch_number"]
+            if number in taken or number in seen or (line["product_id"], number) in existing:
+                errors["batch_number"] = f"Batch {number} already exists."
+            seen.add(number)
+
+
+@transaction.atomic
+def import_purchase_invoices(payload):
+    """Validate and create many purchase invoices with set-based writes."""
+    cleaned = []
+    for raw in payload:
+        data = raw if isinstance(raw, dict) else {}
+        clean, errors = _clean_header(data, "supplier", PurchaseInvoice.STATUS_CHOICES)
+        lines, item_errors = _clean_purchase_items(data)
+        clean["lines"] = lines
+        clean["item_errors"] = item_errors
+        clean["total_amount"] = _total_amount(data, lines, errors)
+        if data is not raw:
+            errors = {"non_field_errors": _not_a_dict(raw)}
+        cleaned.append((clean, raw, errors))
+
+    suppliers = Party.objects.filter(party_type="supplier").select_related("chart_of_account").in_bulk(
+        {clean["party_id"] for clean, _, _ in cleaned if clean["party_id"]}
+    )
+    warehouses = Warehouse.objects.select_related(
+        "default_purchase_account", "default_cash_account", "default_bank_account"
+    ).in_bulk({clean["warehouse_id"] for clean, _, _ in cleaned if clean["warehouse_id"]})
+    terms = PaymentTerm.objects.in_bulk(
+        {clean["payment_term_id"] for clean, _, _ in cleaned if clean["payment_term_id"]}
+    )
+    products = Product.objects.in_bulk(
+        {line["product_id"] for clean, _, _ in cleaned for line in clean["lines"] if line["product_id"]}
+    )
+    _duplicate_numbers(cleaned, PurchaseInvoice)
+    _duplicate_batches(cleaned)
+
+    for clean, _, errors in cleaned:
+        _check_masters(clean, errors, suppliers, warehouses, terms, "supplier")
+        _check_products(clean["lines"], clean["item_errors"], products)
+        if any(clean["item_errors"]):
+            errors["items"] = clean["item_errors"]
+        if not errors:
+            grand_total = clean["total_amount"] - clean["discount"] + clean["tax"]
+            if clean["paid_amount"] > grand_total:
+                errors["paid_amount"] = "Paid amount cannot exceed grand total."
+
+    ready = [clean for clean, _, errors in cleaned if not errors]
+    invoices = PurchaseInvoice.objects.bulk_create(
+        [
+            PurchaseInvoice(
+                invoice_no=clean["invoice_no"],
+                company_invoice_number=clean["company_invoice_number"],
+                date=clean["date"],
+                supplier=suppliers[clean["party_id"]],
+                warehouse=warehouses[clean["warehouse_id"]],
+                total_amount=clean["total_amount"],
+                discount=clean["discount"],
+                tax=clean["tax"],
+                grand_total=clean["total_amount"] - clean["discount"] + clean["tax"],
+                payment_method=clean["payment_method"],
+                payment_term=terms.get(clean["payment_term_id"]),
+                paid_amount=clean["paid_amount"],
+                status=clean["status"],
+            )
+            for clean in ready
+        ]
+    )
+    PurchaseInvoiceItem.objects.bulk_create(
+        [
+            PurchaseInvoiceItem(
+                invoice=invoice,
+                product=products[line["product_id"]],
+                batch_number=line["batch_number"],
+                expiry_date=line["expiry_date"],
+                quantity=line["quantity"],
+                bonus=line["bonus"],
+                purchase_price=line["purchase_price"],
+                sale_price=line["sale_price"],
+                discount=line["discount"],
+                amount=line["amount"],
+            )
+            for invoice, clean in zip(invoices, ready)
+            for line in clean["lines"]
+        ]
+    )
+    bulk_stock_in(
+        [
+            {
+                "product": products[line["product_id"]],
+                "warehouse": invoice.warehouse,
+                "batch_number": line["batch_number"],
+                "expiry_date": line["expiry_date"],
+                "purchase_price": line["purchase_price"],
+                "sale_price": line["sale_price"],
+                "quantity": line["quantity"],
+                "reason": f"Purchase Invoice {invoice.invoice_no}",
+                "ref_model": "PurchaseInvoice",
+                "ref_id": invoice.pk,
+            }
+            for invoice, clean in zip(invoices, ready)
+            for line in clean["lines"]
+        ]
+    )
+
+    balances = defaultdict(Decimal)
+    outstanding = [(invoice, invoice.grand_total - invoice.paid_amount) for invoice in invoices]
+    for invoice, amount in outstanding:
+        balances[invoice.supplier_id] += amount
+    apply_party_balance_deltas(balances)
+    create_payment_schedules(outstanding, "purchase_invoice")
+
+    tax_account = _tax_account(TAX_RECEIVABLE_ACCOUNT_CODE) if any(i.tax for i in invoices) else None
+    lines = [(invoice, invoice.journal_transactions(tax_account)) for invoice in invoices]
+    posted = [(invoice, txs) for invoice, txs in lines if txs]
+    journal_entries = bulk_create_journal_entries(
+        [(invoice.date, f"Purchase Invoice {invoice.invoice_no}", txs) for invoice, txs in posted]
+    )
+    for (invoice, _), je in zip(posted, journal_entries):
+        invoice.journal_entry = je
+    PurchaseInvoice.objects.bulk_update(
+        [invoice for invoice, _ in posted if invoice.journal_entry], ["journal_entry"]
+    )
+
+    schedule_prerender(*invoices)
+
+    created = {id(clean): invoice for clean, invoice in zip(ready, invoices)}
+    return [
+        _result(index, clean, errors, created.get(id(clean)))
+        for index, (clean, _, errors) in enumerate(cleaned)
+    ]
+
+
+IMPORTERS = {
+    "sale": import_sale_invoices,
+    "purchase": import_purchase_invoices,
+}
+
+
+def import_from_request(request, kind):
+    """Run an importer on an API request and return ``(summary, status_code)``.
+
+    Accepts a JSON body (list or ``{"invoices": [...]}``) or a multipart
+    ``file`` upload in JSON or CSV, guessed from the file extension or an
+    explicit ``format`` field.
+    """
+    upload = request.FILES.get("file")
+    if upload:
+        fmt = request.data.get("format") or upload.name.rsplit(".", 1)[-1].lower()
+        try:
+            invoices = load_invoices(upload.read(), fmt)
+        except ValueError as exc:
+            return {"detail": str(exc)}, 400
+    else:
+        invoices = request.data
+        if isinstance(invoices, dict):
+            invoices = invoices.get("invoices", [])
+    if not isinstance(invoices, list):
+        return {"detail": "Expected a list of invoices."}, 400
+
+    # API imports obey credit limits like single invoices do
+    options = {"check_credit_limits": True} if kind == "sale" else {}
+    results = IMPORTERS[kind](invoices, **options)
+    failed = sum(1 for result in results if result["status"] != "created")
+    summary = {"created": len(results) - failed, "failed": failed, "results": results}
+    return summary, 201 if not failed else 207
+
+
+__all__ = [
+    "load_invoices",
+    "import_sale_invoices",
+    "import_purchase_invoices",
+    "IMPORTERS",
+    "import_from_request",
+]
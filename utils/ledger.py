@@ -1,51 +1,246 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime, time
-from typing import Iterable, Optional
+from typing import Iterable, List, Optional
 
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
 from django.utils import timezone
 from django_ledger.models import (
     AccountModel,
     EntityModel,
+    EntityStateModel,
     JournalEntryModel,
     LedgerModel,
     TransactionModel,
 )
+from django_ledger.settings import (
+    DJANGO_LEDGER_DOCUMENT_NUMBER_PADDING,
+    DJANGO_LEDGER_JE_NUMBER_NO_UNIT_PREFIX,
+    DJANGO_LEDGER_JE_NUMBER_PREFIX,
+)
+
+from utils.cache import VersionKey
+
+#: Sent after :meth:`LedgerPoster.flush` writes entries, with ``entries``.
+journal_entries_posted = Signal()
+
+LEDGER_CACHE_TTL = getattr(settings, "LEDGER_CACHE_TTL", 300)
+
+
+def _reserve_je_numbers(ledger, timestamps) -> List[str]:
+    """Reserve one JE number per timestamp with a single sequence bump per fiscal year.
+
+    Mirrors ``JournalEntryModel.generate_je_number`` but claims a block of
+    numbers at once instead of locking the entity state row per entry.
+    """
+    entity = ledger.entity
+    by_year = defaultdict(list)
+    for index, ts in enumerate(timestamps):
+        by_year[entity.get_fy_for_date(dt=ts)].append(index)
+
+    numbers = [""] * len(timestamps)
+    for fiscal_year, indexes in by_year.items():
+        state, _ = EntityStateModel.objects.select_for_update().get_or_create(
+            entity_model_id=entity.uuid,
+            entity_unit_id=None,
+            fiscal_year=fiscal_year,
+            key=EntityStateModel.KEY_JOURNAL_ENTRY,
+            defaults={"sequence": 0},
+        )
+        start = state.sequence
+        state.sequence = start + len(indexes)
+        state.save(update_fields=["sequence"])
+        for offset, index in enumerate(indexes, start=1):
+            seq = str(start + offset).zfill(DJANGO_LEDGER_DOCUMENT_NUMBER_PADDING)
+            numbers[index] = (
+                f"{DJANGO_LEDGER_JE_NUMBER_PREFIX}-{fiscal_year}-"
+                f"{DJANGO_LEDGER_JE_NUMBER_NO_UNIT_PREFIX}-{seq}"
+            )
+    return numbers
+
+
+class LedgerPoster:
+    """Posts journal entries with cached lookups and batched writes.
+
+    The default ledger and accounts found by ``code`` are cached per
+    process; misses are not cached. Saving or deleting a ``LedgerModel`` or
+    ``AccountModel`` (or :meth:`invalidate`) drops them here at once and,
+    after commit, in every worker through a :class:`~utils.cache.VersionKey`.
+    They are also dropped after ``LEDGER_CACHE_TTL`` seconds, because with a
+    per-process cache backend other workers never see the bump.
+
+    :meth:`post` builds the entry in memory. Inside :meth:`unit_of_work`
+    entries are queued and written when the outermost block exits, just
+    before its transaction commits, with one ``bulk_create`` for entries and
+    one for transactions. Outside a unit of work each entry is written
+    immediately. Entry primary keys are client-side UUIDs, so callers can
+    link a queued entry (``invoice.journal_entry = je``) before it is
+    flushed; the foreign key is checked at commit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ledger = None
+        self._accounts = {}
+        self._version = VersionKey("utils:ledger:version", ttl=LEDGER_CACHE_TTL)
+        self._local = threading.local()
+
+    # --- cached lookups ---------------------------------------------------
+
+    def _clear(self):
+        with self._lock:
+            self._ledger = None
+            self._accounts = {}
+
+    def _check_version(self):
+        if self._version.expired():
+            self._clear()
+
+    def invalidate(self, *args, **kwargs):
+        """Forget the cached ledger and accounts in every worker. Usable as a signal receiver."""
+        self._clear()
+        transaction.on_commit(self._version.bump)
+
+    def get_default_ledger(self) -> Optional[LedgerModel]:
+        """Return the first ledger, creating a default one if none exist."""
+        self._check_version()
+        ledger = self._ledger
+        if ledger is not None:
+            return ledger
+        ledger = LedgerModel.objects.select_related("entity").first()
+        if not ledger:
+            entity = EntityModel.objects.first()
+            if not entity:
+                return None
+            ledger = LedgerModel.objects.create(name="Default", entity=entity)
+        with self._lock:
+            self._ledger = ledger
+        return ledger
+
+    def get_account(self, code) -> Optional[AccountModel]:
+        """Return the first account with ``code`` (cached when found, ``None`` if missing)."""
+        self._check_version()
+        try:
+            return self._accounts[code]
+        except KeyError:
+            pass
+        account = AccountModel.objects.filter(code=code).first()
+        if account is not None:
+            with self._lock:
+                self._accounts[code] = account
+        return account
+
+    # --- unit of work -----------------------------------------------------
+
+    @property
+    def _pending(self):
+        if not hasattr(self._local, "pending"):
+            self._local.pending = []
+            self._local.depth = 0
+        return self._local.pending
+
+    @contextmanager
+    def unit_of_work(self):
+        """Queue every :meth:`post` in the block and flush them together.
+
+        Nested blocks join the outermost one. If a block raises, the
+        entries it queued are discarded along with its savepoint.
+        """
+        pending = self._pending
+        mark = len(pending)
+        self._local.depth += 1
+        try:
+            with transaction.atomic():
+                yield self
+                if self._local.depth == 1:
+                    self.flush()
+        except BaseException:
+            del pending[mark:]
+            raise
+        finally:
+            self._local.depth -= 1
+
+    def post(self, date, description: str, transactions: Iterable[dict]) -> Optional[JournalEntryModel]:
+        """Create a journal entry (queued inside a unit of work)."""
+        ledger = self.get_default_ledger()
+        if not ledger:
+            return None
+        je = JournalEntryModel(
+            ledger=ledger,
+            timestamp=timezone.make_aware(datetime.combine(date, time.min)),
+            description=description,
+        )
+        self._pending.append((je, list(transactions)))
+        if not self._local.depth:
+            with transaction.atomic():
+                self.flush()
+        return je
+
+    def flush(self):
+        """Write every queued entry and its transactions in bulk."""
+        pending = self._pending
+        if not pending:
+            return
+        batch = list(pending)
+        del pending[:]
+        by_ledger = defaultdict(list)
+        for je, _ in batch:
+            by_ledger[je.ledger_id].append(je)
+        for entries in by_ledger.values():
+            numbers = _reserve_je_numbers(entries[0].ledger, [je.timestamp for je in entries])
+            for je, number in zip(entries, numbers):
+                je.je_number = number
+        JournalEntryModel.objects.bulk_create([je for je, _ in batch])
+        TransactionModel.objects.bulk_create(
+            [
+                TransactionModel(
+                    journal_entry=je,
+                    account=tx["account"],
+                    tx_type=tx["type"],
+                    amount=tx["amount"],
+                    description=tx.get("description", ""),
+                )
+                for je, transactions in batch
+                for tx in transactions
+            ]
+        )
+        journal_entries_posted.send(sender=self.__class__, entries=[je for je, _ in batch])
+
+
+ledger_poster = LedgerPoster()
+
+for _model in (LedgerModel, AccountModel, EntityModel):
+    post_save.connect(ledger_poster.invalidate, sender=_model, dispatch_uid=f"ledger_poster_{_model.__name__}_save")
+    post_delete.connect(ledger_poster.invalidate, sender=_model, dispatch_uid=f"ledger_poster_{_model.__name__}_delete")
 
 
 def get_or_create_default_ledger() -> Optional[LedgerModel]:
     """Return the first ledger or create a default one if none exist."""
-    ledger = LedgerModel.objects.first()
-    if ledger:
-        return ledger
-    entity = EntityModel.objects.first()
-    if not entity:
-        return None
-    return LedgerModel.objects.create(name="Default", entity=entity)
+    return ledger_poster.get_default_ledger()
 
 
 def create_journal_entry(date, description: str, transactions: Iterable[dict]):
     """Create a journal entry with the given transactions."""
-    ledger = get_or_create_default_ledger()
-    if not ledger:
-        return None
-    timestamp = timezone.make_aware(datetime.combine(date, time.min))
-    je = JournalEntryModel.objects.create(
-        ledger=ledger,
-        timestamp=timestamp,
-        description=description,
-    )
-    tx_objs = []
-    for tx in transactions:
-        tx_objs.append(
-            TransactionModel(
-                journal_entry=je,
-                account=tx["account"],
-                tx_type=tx["type"],
-                amount=tx["amount"],
-                description=tx.get("description", ""),
-            )
-        )
-    TransactionModel.objects.bulk_create(tx_objs)
-    return je
+    return ledger_poster.post(date, description, transactions)
+
+
+def bulk_create_journal_entries(entries) -> List[Optional[JournalEntryModel]]:
+    """Create many journal entries with one ``bulk_create`` each for entries and transactions.
+
+    ``entries`` is a sequence of ``(date, description, transactions)`` tuples
+    using the same transaction dicts as :func:`create_journal_entry`. Returns
+    the created entries in input order, or ``None`` for each one when no
+    ledger is available.
+    """
+    with ledger_poster.unit_of_work():
+        return [
+            ledger_poster.post(entry_date, description, transactions)
+            for entry_date, description, transactions in entries
+        ]
 
 
 def post_simple_entry(date, amount, narration, debit_account, credit_account):
@@ -86,7 +281,7 @@ def post_composite_sale(
         },
     ]
     if tax:
-        tax_account = AccountModel.objects.filter(code="TAX_PAYABLE").first()
+        tax_account = ledger_poster.get_account("TAX_PAYABLE")
         if tax_account:
             transactions.append(
                 {
@@ -136,7 +331,7 @@ def post_composite_purchase(
         }
     ]
     if tax:
-        tax_account = AccountModel.objects.filter(code="TAX_RECEIVABLE").first()
+        tax_account = ledger_poster.get_account("TAX_RECEIVABLE")
         if tax_account:
             transactions.append(
                 {
@@ -191,8 +386,12 @@ def post_payroll_entry(date, expense_account, payment_account, amount, narration
 
 
 __all__ = [
+    "LedgerPoster",
+    "ledger_poster",
+    "journal_entries_posted",
     "get_or_create_default_ledger",
     "create_journal_entry",
+    "bulk_create_journal_entries",
     "post_simple_entry",
     "post_composite_sale",
     "post_composite_purchase",
@@ -0,0 +1,258 @@
+"""Cached invoice PDF rendering.
+
+PDFs are stored in ``default_storage`` under a content-addressed name made
+of the invoice's model, primary key and a hash of its rendered HTML, so an
+unchanged invoice is served from the cache and any edit (items, totals,
+template) produces a new entry. Rendering ``invoices/pdf_invoice.html`` is
+cheap; the expensive ``xhtml2pdf`` step only runs on a cache miss.
+
+Invoices are pre-rendered after commit by a small background thread pool
+(``INVOICE_PDF_RENDER_WORKERS``, disabled with
+``INVOICE_PDF_PRERENDER = False``) so printing normally hits the cache.
+A new invoice has no items when its row is first saved, so creation paths
+(serializer, admin, forms, importer) call :func:`schedule_prerender` once
+the items are written; the ``post_save`` hook only covers later edits.
+
+Bulk exports render their cache misses in a process pool instead
+(``INVOICE_PDF_EXPORT_PROCESSES``, 2 by default, ``0`` renders inline):
+xhtml2pdf is pure Python and holds the GIL, so threads would not run it in
+parallel. The pool belongs to one export and is shut down when it ends.
+Starting it costs more than a few renders, so exports of at most
+``INVOICE_PDF_EXPORT_INLINE`` invoices (8) are rendered in-process.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import re
+import threading
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+from django.template.loader import render_to_string
+from pypdf import PdfWriter
+from xhtml2pdf import pisa
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "pdf_cache"
+TEMPLATE = "invoices/pdf_invoice.html"
+
+_executor = None
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+class PDFRenderError(Exception):
+    pass
+
+
+def invoice_context(invoice):
+    return {
+        "invoice": invoice,
+        "items": invoice.items.all() if hasattr(invoice, "items") else [],
+        "invoice_type": invoice.__class__.__name__,
+    }
+
+
+def render_invoice_html(invoice):
+    return render_to_string(TEMPLATE, invoice_context(invoice))
+
+
+def render_pdf(html):
+    """Run ``xhtml2pdf`` on ``html`` and return the PDF bytes."""
+    buffer = BytesIO()
+    result = pisa.CreatePDF(html, dest=buffer)
+    if result.err:
+        raise PDFRenderError(f"xhtml2pdf reported {result.err} error(s)")
+    return buffer.getvalue()
+
+
+def _cache_name(invoice, html):
+    digest = hashlib.sha256(html.encode("utf-8")).hexdigest()[:32]
+    return f"{CACHE_DIR}/{invoice._meta.label_lower}/{invoice.pk}-{digest}.pdf"
+
+
+def _prune(invoice, keep):
+    folder, _, _ = keep.rpartition("/")
+    try:
+        _, files = default_storage.listdir(folder)
+    except FileNotFoundError:
+        return
+    prefix = f"{invoice.pk}-"
+    for name in files:
+        path = f"{folder}/{name}"
+        if name.startswith(prefix) and path != keep:
+            default_storage.delete(path)
+
+
+def _read_cached(name):
+    if default_storage.exists(name):
+        with default_storage.open(name, "rb") as handle:
+            return handle.read()
+    return None
+
+
+def _store(invoice, name, pdf):
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(pdf))
+        _prune(invoice, name)
+
+
+def get_invoice_pdf(invoice):
+    """Return the PDF bytes for ``invoice``, rendering and caching on a miss."""
+    html = render_invoice_html(invoice)
+    name = _cache_name(invoice, html)
+    pdf = _read_cached(name)
+    if pdf is None:
+        pdf = render_pdf(html)
+        _store(invoice, name, pdf)
+    return pdf
+
+
+def pdf_filename(invoice):
+    """A filesystem-safe ``<invoice_no>.pdf`` name for archives."""
+    label = getattr(invoice, "invoice_no", None) or getattr(invoice, "return_no", None) or invoice.pk
+    return re.sub(r"[^\w.-]+", "_", str(label)) + ".pdf"
+
+
+def _export_processes(count):
+    processes = getattr(settings, "INVOICE_PDF_EXPORT_PROCESSES", 2)
+    if count is not None and count <= getattr(settings, "INVOICE_PDF_EXPORT_INLINE", 8):
+        return 0
+    return processes
+
+
+def _process_pool(processes):
+    # "spawn": forking a process that runs the pre-render threads and
+    # holds open database connections is not safe.
+    return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+
+
+def iter_invoice_pdfs(invoices, count=None):
+    """Yield ``(invoice, pdf_bytes)`` for ``invoices``, in order.
+
+    Cached PDFs are read from storage; misses are rendered and cached. Pass
+    ``count`` when it is known so small exports skip the process pool, which
+    is otherwise started on the first miss and shut down with the export.
+    Only ``2 * INVOICE_PDF_EXPORT_PROCESSES`` invoices are held at a time, so
+    memory stays bounded for any number of invoices.
+    """
+    processes = _export_processes(count)
+    window = deque()
+
+    def resolve(entry):
+        invoice, name, pending = entry
+        if isinstance(pending, Future):
+            pending = pending.result()
+            _store(invoice, name, pending)
+        return invoice, pending
+
+    with ExitStack() as stack:
+        pool = None
+        for invoice in invoices:
+            html = render_invoice_html(invoice)
+            name = _cache_name(invoice, html)
+            pending = _read_cached(name)
+            if pending is None:
+                if processes > 0 and pool is None:
+                    pool = stack.enter_context(_process_pool(processes))
+                if pool is None:
+                    pending = render_pdf(html)
+                    _store(invoice, name, pending)
+                else:
+                    pending = pool.submit(render_pdf, html)
+            window.append((invoice, name, pending))
+            if len(window) >= 2 * max(processes, 1):
+                yield resolve(window.popleft())
+        while window:
+            yield resolve(window.popleft())
+
+
+def write_merged_pdf(invoices, output, count=None):
+    """Write one PDF with the (cached) pages of every invoice, in order, to ``output``."""
+    writer = PdfWriter()
+    for _, pdf in iter_invoice_pdfs(invoices, count):
+        writer.append(BytesIO(pdf))
+    writer.write(output)
+
+
+def merge_invoice_pdfs(invoices, count=None):
+    """Return one PDF with the (cached) pages of every invoice, in order."""
+    output = BytesIO()
+    write_merged_pdf(invoices, output, count)
+    return output.getvalue()
+
+
+def _prerender(model, pk):
+    try:
+        invoice = model._default_manager.filter(pk=pk).first()
+        if invoice is not None:
+            get_invoice_pdf(invoice)
+    except Exception:
+        logger.exception("Pre-rendering %s %s failed", model._meta.label, pk)
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard((model, pk))
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, "INVOICE_PDF_RENDER_WORKERS", 2)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf-render")
+    return _executor
+
+
+def schedule_prerender(*invoices):
+    """Render ``invoices`` in the background once the current transaction commits."""
+    if not getattr(settings, "INVOICE_PDF_PRERENDER", True):
+        return
+    keys = [(type(invoice), invoice.pk) for invoice in invoices]
+
+    def submit():
+        for key in keys:
+            with _in_flight_lock:
+                if key in _in_flight:
+                    continue
+                _in_flight.add(key)
+            _get_executor().submit(_prerender, *key)
+
+    if keys:
+        transaction.on_commit(submit)
+
+
+def _on_invoice_saved(sender, instance, created=False, raw=False, **kwargs):
+    # new invoices are scheduled by their creation path once the items exist
+    if not raw and not created:
+        schedule_prerender(instance)
+
+
+def connect_prerender(*models):
+    """Pre-render PDFs of ``models`` whenever an existing instance is saved."""
+    for model in models:
+        post_save.connect(
+            _on_invoice_saved, sender=model, dispatch_uid=f"pdf_prerender_{model._meta.label_lower}"
+        )
+
+
+__all__ = [
+    "PDFRenderError",
+    "connect_prerender",
+    "get_invoice_pdf",
+    "iter_invoice_pdfs",
+    "merge_invoice_pdfs",
+    "pdf_filename",
+    "render_invoice_html",
+    "render_pdf",
+    "schedule_prerender",
+    "write_merged_pdf",
+]
@@ -0,0 +1,80 @@
+"""Installment schedules for invoices on a :class:`~finance.models.PaymentTerm`.
+
+The outstanding amount is split in whole cents: every installment gets the
+same share and the last one also takes the residue, so the schedule always
+adds up to the outstanding exactly. Rows for one invoice or for a whole
+import batch are written with a single ``bulk_create``.
+
+Collections query schedules by ``(status, due_date)``; see
+:func:`overdue_schedules` and :func:`schedules_due_within`.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from finance.models import PaymentSchedule
+
+_CENT = Decimal("0.01")
+
+
+def split_installments(amount, installments):
+    """Split ``amount`` into ``installments`` cent amounts, residue last."""
+    installments = max(installments or 1, 1)
+    cents = int((Decimal(amount) / _CENT).to_integral_value())
+    share = int(cents / installments)  # truncates towards zero, also for credits
+    amounts = [share] * installments
+    amounts[-1] += cents - share * installments
+    return [Decimal(value) * _CENT for value in amounts]
+
+
+def schedule_rows(invoice, outstanding, invoice_field, term=None):
+    """Unsaved ``PaymentSchedule`` rows for ``invoice`` (``sale_invoice`` or ``purchase_invoice``)."""
+    term = term or invoice.payment_term
+    return [
+        PaymentSchedule(
+            term=term,
+            due_date=invoice.date + timedelta(days=term.interval_days * (i + 1)),
+            amount=amount,
+            **{invoice_field: invoice},
+        )
+        for i, amount in enumerate(split_installments(outstanding, term.installments))
+    ]
+
+
+def create_payment_schedules(entries, invoice_field):
+    """Create the schedules of ``(invoice, outstanding)`` pairs in one ``bulk_create``.
+
+    Invoices without a payment term are skipped.
+    """
+    rows = [
+        row
+        for invoice, outstanding in entries
+        if invoice.payment_term
+        for row in schedule_rows(invoice, outstanding, invoice_field)
+    ]
+    return PaymentSchedule.objects.bulk_create(rows)
+
+
+def overdue_schedules(today, queryset=None):
+    """Pending installments due before ``today``, oldest first."""
+    if queryset is None:
+        queryset = PaymentSchedule.objects.all()
+    return queryset.filter(status="Pending", due_date__lt=today).order_by("due_date", "pk")
+
+
+def schedules_due_within(today, days=7, queryset=None):
+    """Pending installments due from ``today`` up to ``days`` later."""
+    if queryset is None:
+        queryset = PaymentSchedule.objects.all()
+    return queryset.filter(
+        status="Pending", due_date__gte=today, due_date__lt=today + timedelta(days=days)
+    ).order_by("due_date", "pk")
+
+
+__all__ = [
+    "create_payment_schedules",
+    "overdue_schedules",
+    "schedule_rows",
+    "schedules_due_within",
+    "split_installments",
+]
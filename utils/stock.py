@@ -1,4 +1,8 @@
-from inventory.models import Batch, StockMovement
+from collections import OrderedDict, defaultdict
+
+from inventory.models import Batch, StockBalance, StockMovement
+from django.db import transaction
+from django.db.models import F, Sum
 from django.utils.timezone import now
 from django.core.exceptions import ValidationError
 import logging
@@ -8,7 +12,7 @@ logger = logging.getLogger(__name__)
 LOW_STOCK_THRESHOLD = 5  # you can make this configurable
 
 # Stock In
-def stock_in(product, quantity, batch_number, expiry_date, purchase_price, sale_price, reason):
+def stock_in(product, quantity, batch_number, expiry_date, purchase_price, sale_price, reason, warehouse=None):
     # Check for duplicate batch
     if Batch.objects.filter(product=product, batch_number=batch_number).exists():
         raise ValidationError(f"Batch {batch_number} for {product.name} already exists.")
@@ -22,8 +26,10 @@ def stock_in(product, quantity, batch_number, expiry_date, purchase_price, sale_
         expiry_date=expiry_date,
         purchase_price=purchase_price,
         sale_price=sale_price,
-        quantity=quantity
+        quantity=quantity,
+        warehouse=warehouse,
     )
+    apply_balance_deltas({(product.pk, batch.warehouse_id): quantity})
 
     StockMovement.objects.create(
         batch=batch,
@@ -34,29 +40,174 @@ def stock_in(product, quantity, batch_number, expiry_date, purchase_price, sale_
     )
     return batch
 
+def bulk_stock_in(rows):
+    """Create many batches and their ``IN`` movements in bulk.
+
+    ``rows`` are dicts with the :func:`stock_in` arguments plus ``warehouse``
+    and optional ``ref_model``/``ref_id``. Duplicate batch numbers must be
+    rejected by the caller beforehand. Returns the created batches.
+    """
+    if not rows:
+        return []
+    batches = Batch.objects.bulk_create(
+        [
+            Batch(
+                product=row["product"],
+                batch_number=row["batch_number"],
+                expiry_date=row["expiry_date"],
+                purchase_price=row["purchase_price"],
+                sale_price=row["sale_price"],
+                quantity=row["quantity"],
+                warehouse=row["warehouse"],
+            )
+            for row in rows
+        ]
+    )
+    timestamp = now()
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(
+                batch=batch,
+                movement_type='IN',
+                quantity=row["quantity"],
+                reason=row.get("reason", ""),
+                timestamp=timestamp,
+                ref_model=row.get("ref_model", ""),
+                ref_id=row.get("ref_id"),
+            )
+            for batch, row in zip(batches, rows)
+        ]
+    )
+    deltas = defaultdict(int)
+    for batch in batches:
+        deltas[(batch.product_id, batch.warehouse_id)] += batch.quantity
+    apply_balance_deltas(deltas)
+    return batches
+
 # Stock Out (for Sale or Return)
-def stock_out(product, quantity, reason):
-    batches = Batch.objects.filter(product=product, quantity__gte=quantity).order_by('expiry_date')
+def stock_out(product, quantity, reason, warehouse=None):
+    """Remove ``quantity`` of ``product`` from stock, FEFO across batches.
 
-    if not batches.exists():
-        logger.error(f"Out of stock: {product.name}")
-        raise ValidationError(f"Insufficient stock for {product.name}")
+    Thin wrapper around :func:`allocate_stock` for single-line callers.
+    Returns the first batch the quantity was drawn from.
+    """
+    allocations = allocate_stock([(product, quantity)], reason, warehouse=warehouse)
+    return allocations[0]["batch"] if allocations else None
 
-    batch = batches.first()
-    batch.quantity -= quantity
-    batch.save()
 
-    if batch.quantity < LOW_STOCK_THRESHOLD:
-        logger.warning(f"Low stock alert: {product.name} in batch {batch.batch_number}")
+def allocate_stock(lines, reason, warehouse=None, ref_model="", ref_id=None):
+    """Allocate stock for many lines at once in first-expiry-first-out order.
 
-    StockMovement.objects.create(
-        batch=batch,
-        movement_type='OUT',
-        quantity=quantity,
-        reason=reason,
-        timestamp=now()
+    ``lines`` is an iterable of ``(product, quantity)`` pairs. A product may
+    appear more than once; its quantities are drawn in line order. All
+    candidate batches are locked with a single ``select_for_update`` query
+    (restricted to ``warehouse`` when given) and each line is split across as
+    many batches as needed. Batch decrements and ``StockMovement`` rows are
+    written with one ``bulk_update`` and one ``bulk_create``.
+
+    Returns a list of ``{"product", "batch", "quantity"}`` dicts, one per
+    batch slice, in line order. Raises ``ValidationError`` without touching
+    any row if a product does not have enough stock in total.
+    """
+    lines = [(product, int(quantity)) for product, quantity in lines if quantity]
+    if not lines:
+        return []
+
+    products = OrderedDict((product.pk, product) for product, _ in lines)
+    batches = Batch.objects.select_for_update().filter(
+        product_id__in=list(products), quantity__gt=0
     )
-    return batch
+    if warehouse is not None:
+        batches = batches.filter(warehouse=warehouse)
+
+    available = {pk: [] for pk in products}
+    for batch in batches.order_by("product_id", "expiry_date", "id"):
+        available[batch.product_id].append(batch)
+
+    demand = {pk: 0 for pk in products}
+    for product, quantity in lines:
+        demand[product.pk] += quantity
+    for pk, needed in demand.items():
+        on_hand = sum(batch.quantity for batch in available[pk])
+        if on_hand < needed:
+            logger.error(f"Out of stock: {products[pk].name}")
+            raise ValidationError(f"Insufficient stock for {products[pk].name}")
+
+    allocations = []
+    for product, quantity in lines:
+        for batch, take in take_fefo(available[product.pk], quantity):
+            allocations.append(
+                {
+                    "product": product,
+                    "batch": batch,
+                    "quantity": take,
+                    "reason": reason,
+                    "ref_model": ref_model,
+                    "ref_id": ref_id,
+                }
+            )
+    write_stock_out(allocations)
+    return allocations
+
+
+def take_fefo(queue, quantity):
+    """Draw ``quantity`` from a FEFO-ordered list of locked batches.
+
+    Decrements the in-memory batches, drops emptied ones from ``queue`` and
+    returns ``(batch, quantity)`` slices. The caller checks availability
+    first and persists the result with :func:`write_stock_out`.
+    """
+    slices = []
+    remaining = quantity
+    while remaining:
+        batch = queue[0]
+        take = min(batch.quantity, remaining)
+        batch.quantity -= take
+        remaining -= take
+        slices.append((batch, take))
+        if not batch.quantity:
+            queue.pop(0)
+    return slices
+
+
+def write_stock_out(allocations):
+    """Persist allocations made with :func:`take_fefo` in bulk.
+
+    Each allocation is a dict with ``product``, ``batch`` and ``quantity``
+    plus optional ``reason``/``ref_model``/``ref_id`` for the movement row.
+    """
+    if not allocations:
+        return
+    timestamp = now()
+    touched = {alloc["batch"].pk: alloc["batch"] for alloc in allocations}
+    for batch in touched.values():
+        batch.updated_at = timestamp
+    Batch.objects.bulk_update(list(touched.values()), ["quantity", "updated_at"])
+    deltas = defaultdict(int)
+    for alloc in allocations:
+        deltas[(alloc["product"].pk, alloc["batch"].warehouse_id)] -= alloc["quantity"]
+    apply_balance_deltas(deltas)
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(
+                batch=alloc["batch"],
+                movement_type='OUT',
+                quantity=alloc["quantity"],
+                reason=alloc.get("reason", ""),
+                timestamp=timestamp,
+                ref_model=alloc.get("ref_model", ""),
+                ref_id=alloc.get("ref_id"),
+            )
+            for alloc in allocations
+        ]
+    )
+
+    names = {alloc["product"].pk: alloc["product"].name for alloc in allocations}
+    for batch in touched.values():
+        if batch.quantity < LOW_STOCK_THRESHOLD:
+            logger.warning(
+                f"Low stock alert: {names[batch.product_id]} in batch {batch.batch_number}"
+            )
 
 # Return Handling (adds stock back)
 def stock_return(product, quantity, batch_number, reason):
@@ -67,6 +218,7 @@ def stock_return(product, quantity, batch_number, reason):
 
     batch.quantity += quantity
     batch.save()
+    apply_balance_deltas({(product.pk, batch.warehouse_id): quantity})
 
     StockMovement.objects.create(
         batch=batch,
@@ -76,3 +228,87 @@ def stock_return(product, quantity, batch_number, reason):
         timestamp=now()
     )
     return batch
+
+
+# Materialized balances
+@transaction.atomic
+def apply_balance_deltas(deltas):
+    """Add ``{(product_id, warehouse_id): delta}`` to the ``StockBalance`` rows.
+
+    Missing rows are inserted first, then every affected row is locked and
+    incremented with an ``F()`` expression, so concurrent postings for the
+    same product never overwrite each other. Costs three queries regardless
+    of how many keys are passed.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    StockBalance.objects.bulk_create(
+        [
+            StockBalance(product_id=product_id, warehouse_id=warehouse_id, quantity=0)
+            for product_id, warehouse_id in deltas
+        ],
+        ignore_conflicts=True,
+    )
+    rows = StockBalance.objects.select_for_update().filter(
+        product_id__in={product_id for product_id, _ in deltas},
+        warehouse_id__in={warehouse_id for _, warehouse_id in deltas},
+    )
+    timestamp = now()
+    changed = []
+    for row in rows:
+        delta = deltas.get((row.product_id, row.warehouse_id))
+        if delta:
+            row.quantity = F("quantity") + delta
+            row.updated_at = timestamp
+            changed.append(row)
+    StockBalance.objects.bulk_update(changed, ["quantity", "updated_at"])
+
+
+def _batch_totals():
+    totals = (
+        Batch.objects.values("product_id", "warehouse_id")
+        .annotate(total=Sum("quantity"))
+        .order_by()
+    )
+    return {(row["product_id"], row["warehouse_id"]): row["total"] or 0 for row in totals}
+
+
+def stock_balance_drift():
+    """Compare ``StockBalance`` against the ``Batch`` sums.
+
+    Returns a list of ``{"product_id", "warehouse_id", "balance", "batches"}``
+    dicts for every key where the two disagree; an empty list means the
+    table is in sync.
+    """
+    expected = _batch_totals()
+    actual = {
+        (row.product_id, row.warehouse_id): row.quantity
+        for row in StockBalance.objects.all()
+    }
+    drift = []
+    for key in sorted(set(expected) | set(actual)):
+        batches = expected.get(key, 0)
+        balance = actual.get(key, 0)
+        if batches != balance:
+            drift.append(
+                {
+                    "product_id": key[0],
+                    "warehouse_id": key[1],
+                    "balance": balance,
+                    "batches": batches,
+                }
+            )
+    return drift
+
+
+@transaction.atomic
+def rebuild_stock_balances():
+    """Recompute every ``StockBalance`` row from the ``Batch`` table."""
+    StockBalance.objects.all().delete()
+    rows = [
+        StockBalance(product_id=product_id, warehouse_id=warehouse_id, quantity=total)
+        for (product_id, warehouse_id), total in _batch_totals().items()
+    ]
+    StockBalance.objects.bulk_create(rows)
+    return len(rows)
@@ -0,0 +1,120 @@
+"""Streaming JSON and ZIP responses for large querysets.
+
+Rows are pulled with ``queryset.iterator(chunk_size=...)`` and written out
+as they are encoded, so memory stays flat however big the table is. The
+output matches DRF's ``JSONRenderer`` (compact separators, unicode, DRF's
+encoder for decimals/dates/UUIDs), so switching a view from ``Response`` to
+:class:`StreamingJSONResponse` does not change what clients receive.
+"""
+
+import json
+import zipfile
+
+from django.db.models.query import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+DEFAULT_CHUNK_SIZE = 2000
+
+_encoder = JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+class StreamedArray:
+    """A lazily encoded JSON array over ``rows``.
+
+    ``rows`` may be a queryset (model instances or ``.values()`` dicts),
+    which is consumed with ``iterator(chunk_size)``, or any iterable.
+    ``transform`` maps each row to the JSON-serialisable item to emit.
+    """
+
+    def __init__(self, rows, transform=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.rows = rows
+        self.transform = transform
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        rows = self.rows
+        if isinstance(rows, QuerySet):
+            rows = rows.iterator(chunk_size=self.chunk_size)
+        yield "["
+        buffer = []
+        for index, row in enumerate(rows):
+            if self.transform is not None:
+                row = self.transform(row)
+            buffer.append(("," if index else "") + _encoder.encode(row))
+            if len(buffer) >= self.chunk_size:
+                yield "".join(buffer)
+                buffer = []
+        if buffer:
+            yield "".join(buffer)
+        yield "]"
+
+
+def iter_json(data):
+    """Encode ``data`` incrementally.
+
+    Dicts and lists are walked so that any :class:`StreamedArray` nested
+    inside them is streamed; every other value is encoded in one go.
+    """
+    if isinstance(data, StreamedArray):
+        yield from data
+    elif isinstance(data, dict):
+        yield "{"
+        for index, (key, value) in enumerate(data.items()):
+            yield ("," if index else "") + _encoder.encode(str(key)) + ":"
+            yield from iter_json(value)
+        yield "}"
+    elif isinstance(data, (list, tuple)):
+        yield "["
+        for index, value in enumerate(data):
+            if index:
+                yield ","
+            yield from iter_json(value)
+        yield "]"
+    else:
+        yield _encoder.encode(data)
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """Stream ``data`` (which may contain :class:`StreamedArray` parts) as JSON."""
+
+    def __init__(self, data, status=None, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__((chunk.encode("utf-8") for chunk in iter_json(data)), status=status, **kwargs)
+
+
+class _ChunkBuffer:
+    """Write-only, non-seekable sink; :class:`zipfile.ZipFile` then emits data descriptors."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_zip(files):
+    """Yield a ZIP archive of ``files`` (``(name, bytes)`` pairs) as it is built.
+
+    Entries are stored uncompressed (PDFs and images already are) and each
+    one is written out as soon as it is added, so only one file is in
+    memory at a time.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+__all__ = ["DEFAULT_CHUNK_SIZE", "StreamedArray", "StreamingJSONResponse", "iter_json", "iter_zip"]